@@ -0,0 +1,256 @@
+"""
+Benchmark Suite (Scaling + Regression Check)
+For each scale (1x = shipped sample size), generates synthetic shards (synthetic_data.py)
+into a sandbox copy of the project layout and times the core stages on them:
+    aggregate_data -> zero_day_cleaner -> run_time_machine -> run_route_optimizer -> run_visuals
+Each stage runs in a fresh process (clean peak RSS) with every CONFIG path of the
+pipeline modules pointed at the sandbox, REPEATS times; the median wall time is kept.
+Recorded per (scale, stage): wall / CPU seconds, peak RSS, throughput (input rows/s)
+and the slowest profiler steps (see profiler.py).
+Results go to data/outputs/benchmarks/:
+1. bench_<commit>_<run>.json -> full results (commit, host, settings, per-stage metrics).
+2. bench_history.csv         -> one row per (run, scale, stage) across commits.
+The run is compared with the latest run of another commit (or --compare <file>);
+stages slower / heavier than REGRESSION_RATIO x the baseline are flagged and exit with code 1.
+Fixed seed + fixed stage settings (cold model cache, no warm start, warm geocode index)
+keep numbers comparable across commits.
+Usage: python bench_suite.py [--scales 1,10,100] [--repeats 3] [--compare <file>]
+"""
+
+import csv
+import glob
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import synthetic_data
+from pipeline import profiler
+
+# CONFIG
+PROJECT_ROOT = r"C:\Users\SachinGupta\Downloads\SatatAadhar" # Prefix of every CONFIG path in the pipeline
+WORK_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\bench_work"
+RESULTS_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\benchmarks"
+
+SCALES = [1, 10, 100]
+REPEATS = 3
+SEED = 42
+REGRESSION_RATIO = 1.25       # Flag stages slower / heavier than this x the baseline
+MIN_DELTA_S = 0.05            # ...and at least this many seconds slower (timer noise)
+TOP_STEPS = 5
+RESULTS_VERSION = 1
+
+BENCH_STAGES = ['ingestion', 'zero_day', 'time_machine', 'optimizer', 'visuals']
+STAGE_KWARGS = {'optimizer': {'warm_start': False}, # Same start every run
+                'visuals': {'force': True}}          # Time the render, not the output cache
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FIELDS = ['run_id', 'commit', 'dirty', 'scale', 'stage', 'status', 'units', 'wall_s', 'cpu_s',
+                  'rss_peak_mb', 'throughput']
+
+
+def _rows(path):
+    with open(path, 'rb') as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def retarget(root):
+    """Points every CONFIG path of the loaded pipeline modules from PROJECT_ROOT to `root`."""
+    prefix = PROJECT_ROOT # This module's own CONFIG gets rewritten too
+    for mod in list(sys.modules.values()):
+        if not str(getattr(mod, '__file__', None) or "").startswith(SRC_DIR):
+            continue
+        for name, value in list(vars(mod).items()):
+            if name.isupper() and isinstance(value, str) and value.startswith(prefix):
+                rel = value[len(prefix):].lstrip("\\/").replace("\\", os.sep)
+                setattr(mod, name, os.path.join(root, rel) if rel else root)
+
+
+def run_worker(stage, root, work_dir):
+    """Runs one stage on the sandbox `root` (in its own process) and prints its metrics."""
+    from engines import model_cache
+    from pipeline import geocode_cache, orchestrator
+
+    spec = {s['name']: s for s in orchestrator.STAGES}[stage]
+    module = importlib.import_module(spec['module'])
+    retarget(root)
+    geocode_cache.GEO_DIR = os.path.join(work_dir, "geocode") # Shared, pre-warmed index
+    if stage == 'time_machine':
+        shutil.rmtree(model_cache.CACHE_DIR, ignore_errors=True) # Time the fit, not a cache hit
+
+    rss_base = profiler.rss_peak_mb()
+    profiler.start_run()
+    t0, c0 = time.perf_counter(), time.process_time()
+    with profiler.stage(stage):
+        getattr(module, spec['func'])(**STAGE_KWARGS.get(stage, {}))
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+
+    inputs = [p for p in orchestrator._paths(spec, 'inputs', module) if p.endswith(".csv")]
+    steps = [s for s in profiler.summarize() if s['depth'] > 0][:TOP_STEPS]
+    print("BENCH_RESULT " + json.dumps({
+        'wall_s': wall, 'cpu_s': cpu, 'rss_base_mb': rss_base, 'rss_peak_mb': profiler.rss_peak_mb(),
+        'units': _rows(inputs[0]) if stage != 'ingestion' and inputs else None,
+        'steps': [{k: s[k] for k in ('path', 'calls', 'wall_s')} for s in steps],
+    }))
+
+
+def _spawn(stage, root, work_dir):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", stage, root, work_dir],
+                          capture_output=True, text=True, encoding='utf-8', errors='replace')
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-3:]
+    print(f"     ❌ {stage} failed (exit {proc.returncode}): {' | '.join(tail)}")
+    return None
+
+
+def prepare_sandbox(scale, seed=SEED):
+    """Synthetic shards + dashboard template under WORK_DIR/x<scale>; returns (root, generator manifest)."""
+    root = os.path.join(WORK_DIR, f"x{scale:g}")
+    manifest = synthetic_data.generate(root, scale, seed)
+    for sub in (("data", "processed"), ("data", "outputs")):
+        os.makedirs(os.path.join(root, *sub), exist_ok=True)
+    template = os.path.join(PROJECT_ROOT, "src", "visuals", "dashboard_template.html")
+    os.makedirs(os.path.join(root, "src", "visuals"), exist_ok=True)
+    shutil.copy(template, os.path.join(root, "src", "visuals", "dashboard_template.html"))
+    return root, manifest
+
+
+def warm_geocode(pincodes):
+    """Fills the shared geocode index once, so zero_day is timed like a nightly (warm) run."""
+    from pipeline import geocode_cache
+    geocode_cache.GEO_DIR = os.path.join(WORK_DIR, "geocode")
+    geocode_cache.lookup(pincodes)
+
+
+def git_commit():
+    try:
+        cwd = os.path.dirname(SRC_DIR)
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "-uno"], cwd=cwd, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def latest_baseline(commit):
+    """Most recent results file from a different commit (None if there is none)."""
+    for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "bench_*.json")), key=os.path.getmtime, reverse=True):
+        with open(path, 'r') as f:
+            other = json.load(f)
+        if other.get('commit') != commit:
+            return path
+    return None
+
+
+def compare(current, baseline_path):
+    """Prints per-stage ratios vs a baseline results file; returns the regressed (scale, stage) pairs."""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    base = {(r['scale'], r['stage']): r for r in baseline['results'] if r['status'] == "ok"}
+    print(f"   📏 Compared with {baseline.get('commit')} ({os.path.basename(baseline_path)})")
+    regressions = []
+    for r in current['results']:
+        b = base.get((r['scale'], r['stage']))
+        if b is None or r['status'] != "ok":
+            continue
+        t_ratio = r['wall_s'] / max(b['wall_s'], 1e-9)
+        m_ratio = r['rss_peak_mb'] / b['rss_peak_mb'] if r['rss_peak_mb'] and b['rss_peak_mb'] else 1.0
+        slow = t_ratio > REGRESSION_RATIO and r['wall_s'] - b['wall_s'] > MIN_DELTA_S
+        heavy = m_ratio > REGRESSION_RATIO
+        flag = "⚠️ REGRESSION" if slow or heavy else ""
+        print(f"     x{r['scale']:<5g} {r['stage']:<14} time x{t_ratio:5.2f}  memory x{m_ratio:5.2f}  {flag}")
+        if flag:
+            regressions.append((r['scale'], r['stage']))
+    return regressions
+
+
+def run_benchmarks(scales=None, repeats=REPEATS, seed=SEED, baseline=None):
+    print("🚀 [Benchmark] Starting Scaling Benchmark...")
+    scales = scales or SCALES
+    commit, dirty = git_commit()
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results = []
+
+    for i, scale in enumerate(scales):
+        t0 = time.perf_counter()
+        root, manifest = prepare_sandbox(scale, seed)
+        print(f"   🧪 x{scale:g}: {manifest['total_rows']:,} rows in {len(manifest['files'])} shards "
+              f"(ready in {time.perf_counter() - t0:.1f}s)")
+        if i == 0:
+            warm_geocode(synthetic_data.load_universe()['pincode'].astype(int).unique())
+
+        for stage in BENCH_STAGES:
+            runs = [r for r in (_spawn(stage, root, WORK_DIR) for _ in range(repeats)) if r is not None]
+            if len(runs) < repeats:
+                results.append({'scale': scale, 'stage': stage, 'status': "failed"})
+                break # Later stages need this stage's outputs
+            wall = statistics.median(r['wall_s'] for r in runs)
+            units = manifest['total_rows'] if stage == 'ingestion' else runs[0]['units']
+            row = {
+                'scale': scale,
+                'stage': stage,
+                'status': "ok",
+                'units': units,
+                'wall_s': round(wall, 4),
+                'wall_runs': [round(r['wall_s'], 4) for r in runs],
+                'cpu_s': round(statistics.median(r['cpu_s'] for r in runs), 4),
+                'rss_peak_mb': max(r['rss_peak_mb'] for r in runs) if runs[0]['rss_peak_mb'] is not None else None,
+                'rss_base_mb': runs[0]['rss_base_mb'],
+                'throughput': round(units / wall, 1) if units and wall > 0 else None,
+                'steps': runs[len(runs) // 2]['steps'],
+            }
+            results.append(row)
+            print(f"     {stage:<14} {wall:8.2f}s  {row['throughput'] or 0:>12,.0f} rows/s  "
+                  f"peak {row['rss_peak_mb'] or 0:,.0f} MB")
+
+    report = {
+        'version': RESULTS_VERSION,
+        'run_id': run_id,
+        'commit': commit,
+        'dirty': dirty,
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'settings': {'scales': scales, 'repeats': repeats, 'seed': seed,
+                     'generator_version': synthetic_data.GENERATOR_VERSION, 'stage_kwargs': STAGE_KWARGS},
+        'results': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    baseline = baseline or latest_baseline(commit)
+    out_path = os.path.join(RESULTS_DIR, f"bench_{commit}_{run_id}.json")
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    history = os.path.join(RESULTS_DIR, "bench_history.csv")
+    new_file = not os.path.exists(history)
+    with open(history, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS, extrasaction='ignore')
+        if new_file:
+            writer.writeheader()
+        for r in results:
+            writer.writerow({'run_id': run_id, 'commit': commit, 'dirty': dirty, **r})
+    print(f"   💾 Saved {os.path.basename(out_path)}")
+
+    regressions = compare(report, baseline) if baseline else []
+    if not baseline:
+        print("   ℹ️ No earlier run from another commit to compare with.")
+    return report, regressions
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        run_worker(*sys.argv[2:5])
+        sys.exit(0)
+
+    def arg(flag, default=None):
+        return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv else default
+
+    scales = [float(s) for s in arg("--scales").split(",")] if arg("--scales") else None
+    _, regressions = run_benchmarks(scales, int(arg("--repeats", REPEATS)), baseline=arg("--compare"))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,133 @@
+"""
+Synthetic OGD Shards (Benchmark Input Generator)
+Writes enrolment / demographic / biometric shards with the real feed headers
+    date,state,district,pincode,age_0_5,age_5_17,age_18_greater
+    date,state,district,pincode,demo_age_5_17,demo_age_17_
+    date,state,district,pincode,bio_age_5_17,bio_age_17_
+at `scale` x the row counts of the shipped sample (BASE_ROWS), split into
+SHARD_ROWS-row files named like the real ones (api_data_aadhar_<feed>_<start>_<end>.csv).
+Realism:
+1. (state, district, pincode) triples come from the shipped shards, so every pincode geocodes.
+2. Per-pincode activity is log-normal; a LAGGING_SHARE of pincodes barely update (ULI > 0.3).
+3. Dates span MONTHS months of days with a trend and a yearly cycle (ARIMA has a signal).
+4. Per-column means match the shipped sample.
+Same (scale, seed) -> byte-identical shards, so runs are comparable across commits.
+"""
+
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.schema import FEEDS, DATE_FORMAT
+
+# CONFIG
+SOURCE_ROOT = r"C:\Users\SachinGupta\Downloads\SatatAadhar" # Shipped shards (pincode universe)
+
+GENERATOR_VERSION = 1
+BASE_ROWS = {'enrol': 6_029, 'demo': 71_700, 'bio': 71_700} # 1x = shipped sample (bio sized like demo)
+SHARD_ROWS = 500_000
+MONTHS = 24
+START_DATE = "2024-01-01"
+LAGGING_SHARE = 0.15          # Pincodes whose residents rarely update
+
+FILE_PREFIX = {'enrol': 'api_data_aadhar_enrolment', 'demo': 'api_data_aadhar_demographic',
+               'bio': 'api_data_aadhar_biometric'}
+COLUMN_MEANS = {              # Mean count per row in the shipped sample
+    'age_0_5': 3.6, 'age_5_17': 3.5, 'age_18_greater': 0.1,
+    'demo_age_5_17': 1.3, 'demo_age_17_': 12.4,
+    'bio_age_5_17': 1.3, 'bio_age_17_': 12.4,
+}
+
+
+def load_universe(source_root=None):
+    """Unique (state, district, pincode) triples from the shipped shards."""
+    source_root = source_root or SOURCE_ROOT
+    parts = []
+    for spec in FEEDS.values():
+        for f in glob.glob(os.path.join(source_root, spec['dir'], "**", "*.csv"), recursive=True):
+            parts.append(pd.read_csv(f, usecols=['state', 'district', 'pincode'], dtype=str))
+    if not parts:
+        raise FileNotFoundError(f"No shipped shards under {source_root} to take pincodes from.")
+    universe = pd.concat(parts).dropna().drop_duplicates()
+    universe = universe[universe['pincode'].str.fullmatch(r"\d{6}")]
+    return universe.sort_values(['pincode', 'state', 'district']).reset_index(drop=True)
+
+
+def _date_weights(days):
+    # Rising trend plus a yearly cycle, so monthly totals look like a real update series
+    t = np.arange(len(days))
+    month = days.month.to_numpy() - 1
+    return (1 + t / len(days)) * (1 + 0.3 * np.sin(2 * np.pi * month / 12))
+
+
+def generate(out_root, scale=1, seed=42, source_root=None, shard_rows=SHARD_ROWS):
+    """
+    Writes the synthetic shards under out_root/<feed dir>/<feed dir>/ (same layout as the OGD download).
+    Skips the work when out_root already holds the same (version, scale, seed).
+    Returns the manifest {'rows': {feed: n}, 'files': [...], ...}.
+    """
+    manifest_path = os.path.join(out_root, "synthetic_manifest.json")
+    key = {'version': GENERATOR_VERSION, 'scale': scale, 'seed': seed, 'shard_rows': shard_rows}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('key') == key and all(os.path.exists(os.path.join(out_root, p)) for p in manifest['files']):
+            return manifest
+
+    rng = np.random.default_rng(seed)
+    universe = load_universe(source_root)
+    n_pins = len(universe)
+    activity = rng.lognormal(0.0, 1.0, n_pins)
+    activity /= activity.sum()
+    lagging = rng.random(n_pins) < LAGGING_SHARE
+    propensity = np.where(lagging, rng.uniform(0.0, 0.02, n_pins), rng.lognormal(0.0, 0.4, n_pins))
+
+    days = pd.date_range(START_DATE, periods=MONTHS, freq='MS')
+    days = pd.date_range(days[0], days[-1] + pd.offsets.MonthEnd(0), freq='D')
+    day_p = _date_weights(days)
+    day_p /= day_p.sum()
+    day_text = np.asarray(days.strftime(DATE_FORMAT))
+
+    files, rows = [], {}
+    for feed, spec in FEEDS.items():
+        total = int(BASE_ROWS[feed] * scale)
+        rows[feed] = total
+        out_dir = os.path.join(out_root, spec['dir'], spec['dir'])
+        os.makedirs(out_dir, exist_ok=True)
+        # Update feeds are skewed towards pincodes that update; enrolment is not
+        pin_p = activity if spec['target'] == 'enrol' else activity * propensity
+        pin_p = pin_p / pin_p.sum()
+        for start in range(0, total, shard_rows):
+            n = min(shard_rows, total - start)
+            pin = rng.choice(n_pins, size=n, p=pin_p)
+            day = np.sort(rng.choice(len(days), size=n, p=day_p))[::-1] # Shards list newest first
+            shard = pd.DataFrame({
+                'date': day_text[day],
+                'state': universe['state'].to_numpy()[pin],
+                'district': universe['district'].to_numpy()[pin],
+                'pincode': universe['pincode'].to_numpy()[pin],
+            })
+            for col in spec['counts']:
+                # Gamma-Poisson (negative binomial): heavy-tailed like the real counts
+                shard[col] = rng.poisson(rng.gamma(0.5, COLUMN_MEANS[col] / 0.5, n))
+            name = f"{FILE_PREFIX[feed]}_{start}_{start + n}.csv"
+            shard.to_csv(os.path.join(out_dir, name), index=False)
+            files.append(os.path.relpath(os.path.join(out_dir, name), out_root))
+
+    manifest = {'key': key, 'rows': rows, 'total_rows': sum(rows.values()), 'pincodes': n_pins, 'files': files}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python synthetic_data.py <out_root> [scale] [seed]")
+        sys.exit(1)
+    m = generate(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 1,
+                 int(sys.argv[3]) if len(sys.argv) > 3 else 42)
+    print(f"✅ {m['total_rows']:,} rows in {len(m['files'])} shards ({m['pincodes']} pincodes)")
@@ -0,0 +1,164 @@
+"""
+Forecast Model Cache (Warm-Start Refits)
+Persists fitted ARIMA parameters per series so nightly reruns do not refit from scratch.
+Layout (under data/outputs/forecast_models/):
+1. cache.pkl -> series_id -> {order, seasonal_order, n, hash, params, mae, forecast, full_fit_n}
+Per series and run:
+1. Same data (hash of all n points) -> "reuse": cached forecast, no fitting.
+2. Same first n points + new months -> "extend": the state-space model is re-filtered
+   over the longer series with the cached params (no optimizer run).
+3. Otherwise -> "refit", warm-started from the cached params when the order matches.
+   Extends turn into refits when the cached forecast missed the new months by more than
+   DRIFT_RATIO x the in-sample MAE, or REFIT_EVERY months arrived since the last full fit.
+Several stages share the cache (time_machine, hierarchy_forecast, possibly at the same time):
+save_cache() merges the series a caller wrote into the cache on disk under a lock
+(thread lock + cache.lock file), through a per-writer tmp file.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+
+# CONFIG
+CACHE_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\forecast_models"
+CACHE_VERSION = 1
+REFIT_EVERY = 6               # Months appended since the last full fit before a scheduled refit
+DRIFT_RATIO = 3.0             # Refit when the error on new months exceeds this x the in-sample MAE
+LOCK_TIMEOUT_S = 60           # A cache.lock older than this is treated as left by a crashed writer
+
+NO_SEASON = (0, 0, 0, 0)
+
+_LOCK = threading.Lock() # Stages of one orchestrator run share the process
+
+
+def series_hash(y):
+    return hashlib.sha1(np.ascontiguousarray(y, dtype=np.float64).tobytes()).hexdigest()
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        cache = pickle.load(f)
+    if cache.get('version') != CACHE_VERSION:
+        return None
+    return cache['series']
+
+
+def load_cache(cache_dir=None):
+    path = os.path.join(cache_dir or CACHE_DIR, "cache.pkl")
+    if not os.path.exists(path):
+        return {}
+    try:
+        series = _read(path)
+        if series is None:
+            print("     ⚠️ Forecast cache version changed. Refitting from scratch.")
+            return {}
+        return series
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError) as e:
+        print(f"     ⚠️ Unreadable forecast cache ({e}). Refitting from scratch.")
+        return {}
+
+
+@contextmanager
+def _cache_lock(cache_dir):
+    """Exclusive access to cache.pkl across threads (lock) and processes (O_EXCL lock file)."""
+    path = os.path.join(cache_dir, "cache.lock")
+    with _LOCK:
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(path).st_mtime > LOCK_TIMEOUT_S:
+                        os.remove(path) # Stale: its writer died
+                except OSError:
+                    pass
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+
+def save_cache(series, cache_dir=None, keys=None):
+    """
+    Writes the entries `keys` of `series` (all if None) into the cache on disk, keeping every
+    other entry already there, so concurrent writers never drop each other's series.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, "cache.pkl")
+    keys = list(series) if keys is None else list(keys)
+    with _cache_lock(cache_dir):
+        merged = {}
+        if os.path.exists(path):
+            try:
+                merged = _read(path) or {}
+            except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+                merged = {} # Unreadable: rewritten below
+        merged.update({k: series[k] for k in keys if k in series})
+        # Write-then-rename so a crash never leaves a half-written cache
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'series': merged}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+
+def same_model(entry, order, seasonal_order=NO_SEASON):
+    return (entry is not None and tuple(entry['order']) == tuple(order)
+            and tuple(entry.get('seasonal_order', NO_SEASON)) == tuple(seasonal_order))
+
+
+def plan_fit(entry, y, order, horizon, seasonal_order=NO_SEASON):
+    """Returns "reuse", "extend" or "refit" for series `y` given its cache entry (or None)."""
+    if not same_model(entry, order, seasonal_order) or len(y) < entry['n']:
+        return "refit"
+    if series_hash(y[:entry['n']]) != entry['hash']:
+        return "refit" # History was revised
+    new = len(y) - entry['n']
+    if new == 0:
+        return "reuse" if len(entry['forecast']) >= horizon else "extend"
+    if new > len(entry['forecast']) or len(y) - entry['full_fit_n'] >= REFIT_EVERY:
+        return "refit"
+    err = np.mean(np.abs(y[entry['n']:] - entry['forecast'][:new]))
+    return "refit" if err > DRIFT_RATIO * max(entry['mae'], 1e-9) else "extend"
+
+
+def fit_series(y, order, horizon, entry=None, seasonal_order=NO_SEASON):
+    """
+    Forecast for one series through the cache. Returns (forecast, new_entry, action).
+    Raises like ARIMA.fit() does; callers keep their own fallback.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    action = plan_fit(entry, y, order, horizon, seasonal_order)
+    if action == "reuse":
+        return np.asarray(entry['forecast'][:horizon]), entry, action
+
+    model = ARIMA(y, order=order, seasonal_order=seasonal_order)
+    if action == "extend":
+        res = model.filter(entry['params'])
+    else:
+        warm = entry['params'] if same_model(entry, order, seasonal_order) else None
+        res = model.fit(start_params=warm)
+
+    forecast = np.asarray(res.forecast(steps=horizon))
+    # The first d + D*s residuals are just the initial levels
+    resid = np.asarray(res.resid)[order[1] + seasonal_order[1] * seasonal_order[3]:]
+    new_entry = {
+        'order': tuple(order),
+        'seasonal_order': tuple(seasonal_order),
+        'n': len(y),
+        'hash': series_hash(y),
+        'params': np.asarray(res.params),
+        'mae': float(np.mean(np.abs(resid))) if len(resid) else 0.0,
+        'forecast': forecast,
+        'full_fit_n': len(y) if action == "refit" else entry['full_fit_n'],
+    }
+    return forecast, new_entry, action
@@ -3,27 +3,461 @@ Engine 2: The "Route Optimizer" (Geospatial Machine Learning)
 Model: Weighted K-Means Clustering.
 Input: Aggregated Pincode Data.
 Logic: Clusters Pincodes, weighted by the number of missing updates.
+Backends: "kmeans" (full batch), "minibatch" (MiniBatchKMeans),
+"streaming" (partial_fit over shuffled batches), "auto" (minibatch once pincodes x routes is large).
+Warm-starts from the previous run's route_clusters.json centers.
+Van count: N_VANS if set, else one van per LAG_PER_VAN missing updates (K_MIN..K_MAX).
+USE_SWEEP (or --use-sweep) takes the knee of the van-count sweep (sweep_van_counts) instead.
+Sweep: K_MIN..K_MAX evaluated as contiguous warm-start chains of at least SWEEP_CHAIN_MIN
+van counts each, one chain per worker process (spawned, so safe under the orchestrator's threads).
+Each k starts from k-1's centers plus the pincode with the largest weighted squared distance to its
+stop, so one short refit replaces a cold k-means++ fit. Duplicate coordinates are merged
+(weights summed) and unit-sphere vectors for the travel distances are computed once, up front.
+Per k: weighted inertia, demand-weighted mean / max km to the assigned stop, demand per van.
+Output: data/outputs/van_sweep.json (reused until master_table or the sweep settings change).
+Incremental re-optimization: master_table is diffed against the snapshot of the last run
+(table_diff, keyed by Pincode). Only routes that lose, gain or hold a changed pincode are
+reassigned and recentred (local Lloyd over those routes); every other van stop stays put.
+A full refit runs only when the changed demand exceeds DRIFT_MAX or a route empties.
+Route IDs are stable: a full refit matches new stops to the previous ones (nearest, one-to-one).
 """
 
 import pandas as pd
 import json
+import multiprocessing
 import os
 import sys
-from sklearn.cluster import KMeans
+import time
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.store import load_table, save_table, store_dir
+from pipeline.table_diff import diff_tables
+from engines.geo import chord_to_km, haversine_km, unit_vectors
+
 # CONFIG
 INPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
 OUTPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
+SWEEP_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\van_sweep.json"
+SNAPSHOT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\optimizer_snapshot.csv" # Column store only
 
-def run_route_optimizer():
-    print("🚀 [Engine 2] Starting 'Route Optimizer' (Weighted K-Means)...")
+CLUSTER_BACKEND = "auto"      # "kmeans" | "minibatch" | "streaming" | "auto"
+AUTO_MINIBATCH_WORK = 10_000_000  # "auto" uses MiniBatchKMeans above this many pincodes x routes
+BATCH_SIZE = 4096
+STREAM_EPOCHS = 3
+WARM_START = True
+N_VANS = None                 # Fixed van count; None = one van per LAG_PER_VAN missing updates
+LAG_PER_VAN = 5000
+USE_SWEEP = False             # True = van count from the knee of the van-count sweep (opt-in)
+K_MIN, K_MAX = 3, 20          # Van count bounds (and the range the sweep evaluates)
+SWEEP_WORKERS = None          # Process pool size for sweep chains (None = all cores)
+SWEEP_CHAIN_MIN = 4           # Consecutive van counts per chain (each warm-starts from k-1)
+SWEEP_VERSION = 1
+INCREMENTAL = True            # Re-optimize only the routes touched by the master_table diff
+DRIFT_MAX = 0.15              # Full refit once changed demand exceeds this share of the routed demand
+LOCAL_ITERS = 20              # Lloyd iterations over the affected routes
+SNAPSHOT_COLUMNS = ['Pincode', 'Latitude', 'Longitude', 'Enrolment_Count', 'Update_Count', 'Risk_Category', 'ULI']
+RISK_SET = ['CRITICAL', 'WARNING']
+
+
+def previous_routes():
+    """Routes of the last route_clusters.json ([] if there is no readable previous run)."""
+    if not os.path.exists(OUTPUT_FILE):
+        return []
+    try:
+        with open(OUTPUT_FILE, 'r') as f:
+            return json.load(f).get('routes', [])
+    except (OSError, ValueError):
+        return []
+
+
+def previous_centers(n_clusters, coord, weights, seed=42):
+    """
+    Initial centers from the last route_clusters.json (highest-demand routes first).
+    Missing centers are filled with demand-weighted random pincodes. None if there is no previous run.
+    """
+    routes = previous_routes()
+    if not routes:
+        return None
+
+    routes = sorted(routes, key=lambda r: r.get('demand_size', 0), reverse=True)
+    centers = np.array([[r['lat'], r['lng']] for r in routes[:n_clusters]], dtype=float)
+    if len(centers) < n_clusters:
+        rng = np.random.default_rng(seed)
+        extra = rng.choice(len(coord), size=n_clusters - len(centers), replace=False, p=weights / weights.sum())
+        centers = np.vstack([centers, coord[extra]])
+    return centers
+
+
+def default_vans(total_lag):
+    """Heuristic fleet size: one van per LAG_PER_VAN missing updates, within K_MIN..K_MAX."""
+    return max(K_MIN, min(K_MAX, int(total_lag / LAG_PER_VAN)))
+
+
+def weighted_inertia(coord, weights, centers, labels):
+    d = coord - centers[labels]
+    return float((weights * (d * d).sum(axis=1)).sum())
+
+
+def fit_clusters(coord, weights, n_clusters, backend=CLUSTER_BACKEND, init_centers=None, seed=42):
+    """
+    Weighted clustering. Returns (centers, labels, backend_used).
+    Labels come straight from the fit (no second predict pass) except for "streaming".
+    """
+    if backend == "auto":
+        backend = "minibatch" if len(coord) * n_clusters > AUTO_MINIBATCH_WORK else "kmeans"
+    init = init_centers if init_centers is not None else 'k-means++'
+    n_init = 1 if init_centers is not None else 'auto'
+
+    if backend == "kmeans":
+        model = KMeans(n_clusters=n_clusters, init=init, n_init=n_init, random_state=seed)
+        with profiler.step("kmeans.fit", n=len(coord), k=n_clusters) as meta:
+            model.fit(coord, sample_weight=weights)
+            meta['iterations'] = int(model.n_iter_)
+        return model.cluster_centers_, model.labels_, backend
+
+    if backend == "minibatch":
+        model = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=n_init,
+                                batch_size=BATCH_SIZE, random_state=seed)
+        with profiler.step("minibatch.fit", n=len(coord), k=n_clusters) as meta:
+            model.fit(coord, sample_weight=weights)
+            meta['iterations'] = int(model.n_iter_)
+        return model.cluster_centers_, model.labels_, backend
+
+    if backend == "streaming":
+        # Feeds shuffled batches through partial_fit, e.g. when pincodes arrive from a chunked reader
+        model = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, batch_size=BATCH_SIZE, random_state=seed)
+        rng = np.random.default_rng(seed)
+        first = max(BATCH_SIZE, n_clusters)
+        with profiler.step("streaming.partial_fit", n=len(coord), k=n_clusters, epochs=STREAM_EPOCHS):
+            for _ in range(STREAM_EPOCHS):
+                order = rng.permutation(len(coord))
+                # The first partial_fit initialises centers, so it needs >= n_clusters points
+                batches = [order[:first]] + [order[i:i + BATCH_SIZE] for i in range(first, len(order), BATCH_SIZE)]
+                for idx in batches:
+                    if len(idx): model.partial_fit(coord[idx], sample_weight=weights[idx])
+        return model.cluster_centers_, model.predict(coord), backend
+
+    raise ValueError(f"Unknown clustering backend: {backend}")
 
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ Error: processed data not found.")
-        sys.exit(1)
 
-    df = pd.read_csv(INPUT_FILE)
+def benchmark_backends(n_clusters=None, repeats=3):
+    """Wall time + weighted inertia of each backend vs the original full-batch KMeans path."""
+    coord, weights, _ = load_risk_points()
+    if n_clusters is None:
+        n_clusters = default_vans(weights.sum())
+    print(f"   ⏱️ Benchmark: {len(coord)} pincodes, k={n_clusters}, best of {repeats}")
+
+    def baseline():
+        # Original path: default KMeans + a second predict() pass
+        km = KMeans(n_clusters=n_clusters, random_state=42).fit(coord, sample_weight=weights)
+        return km.cluster_centers_, km.predict(coord)
+
+    runs = [("kmeans (original)", baseline)]
+    for b in ["kmeans", "minibatch", "streaming"]:
+        runs.append((b, lambda b=b: fit_clusters(coord, weights, n_clusters, b)[:2]))
+    warm = previous_centers(n_clusters, coord, weights)
+    if warm is not None:
+        runs.append(("minibatch (warm)", lambda: fit_clusters(coord, weights, n_clusters, "minibatch", warm)[:2]))
+
+    rows = []
+    for name, fn in runs:
+        best = float('inf')
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            centers, labels = fn()
+            best = min(best, time.perf_counter() - t0)
+        rows.append({'backend': name, 'seconds': round(best, 4),
+                     'inertia': round(weighted_inertia(coord, weights, centers, labels), 2)})
+
+    result = pd.DataFrame(rows)
+    base = result.loc[0, 'inertia']
+    result['inertia_vs_original'] = (result['inertia'] / base).round(4) if base else np.nan
+    print(result.to_string(index=False))
+    return result
+
+
+def _signature(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime]
+
+
+def merge_duplicates(coord, weights):
+    """Pincodes sharing a coordinate become one point with the summed weight (same weighted objective)."""
+    unique, inverse = np.unique(coord, axis=0, return_inverse=True)
+    return unique, np.bincount(inverse.ravel(), weights=weights, minlength=len(unique))
+
+
+def _sweep_chain(task):
+    """
+    Pool task: fits the van counts `ks` (ascending) as one warm-start chain.
+    Returns one metrics row per k (with its centers).
+    """
+    coord, weights, vectors, ks, backend, seed = task
+    rows, centers, d2 = [], None, None
+    for k in ks:
+        t0 = time.perf_counter()
+        init = None
+        if centers is not None:
+            # k-1 solution + the worst-served point (greedy k-means++ step)
+            init = np.vstack([centers[:k - 1], coord[np.argmax(weights * d2)]])
+        centers, labels, used = fit_clusters(coord, weights, k, backend, init, seed)
+        d = coord - centers[labels]
+        d2 = (d * d).sum(axis=1)
+        km = chord_to_km(np.linalg.norm(vectors - unit_vectors(centers[:, 0], centers[:, 1])[labels], axis=1))
+        demand = np.bincount(labels, weights=weights, minlength=k)
+        rows.append({
+            'k': int(k),
+            'inertia': round(float((weights * d2).sum()), 4),
+            'mean_km': round(float((weights * km).sum() / weights.sum()), 3),
+            'max_km': round(float(km.max()), 3),
+            'demand_per_van': round(float(demand.mean()), 1),
+            'max_demand_per_van': int(demand.max()),
+            'backend': used,
+            'warm': init is not None,
+            'seconds': round(time.perf_counter() - t0, 4),
+            'centers': centers.round(6).tolist(),
+        })
+    return rows
+
+
+def knee_point(ks, inertia):
+    """
+    Knee of the (decreasing, convex) inertia curve: the k farthest below the chord joining
+    the first and last points, both axes scaled to [0, 1] (Kneedle).
+    """
+    ks, inertia = np.asarray(ks, dtype=float), np.asarray(inertia, dtype=float)
+    if len(ks) < 3 or inertia[0] == inertia[-1]:
+        return int(ks[0])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertia - inertia[-1]) / (inertia[0] - inertia[-1])
+    return int(ks[np.argmax((1 - x) - y)])
+
+
+def sweep_van_counts(k_min=K_MIN, k_max=K_MAX, workers=SWEEP_WORKERS, backend=CLUSTER_BACKEND, seed=42):
+    """
+    Evaluates every van count in k_min..k_max and recommends the knee.
+    The range is cut into one contiguous chain per worker; chains run in parallel.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    print(f"🚀 [Engine 2] Sweeping van counts {k_min}-{k_max} (warm-start chains)...")
+    coord, weights, risk_df = load_risk_points()
+    with profiler.step("sweep.precompute", n=len(coord)) as meta:
+        points, point_weights = merge_duplicates(coord, weights)
+        vectors = unit_vectors(points[:, 0], points[:, 1])
+        meta['unique'] = len(points)
+    k_max = min(k_max, len(points))
+    k_min = min(k_min, k_max)
+    ks = list(range(k_min, k_max + 1))
+
+    # Few long chains beat many short ones: a chain's first k is the only cold fit
+    n = max(1, min(workers or os.cpu_count() or 1, len(ks) // SWEEP_CHAIN_MIN))
+    chains = [c.tolist() for c in np.array_split(ks, n)]
+    tasks = [(points, point_weights, vectors, c, backend, seed) for c in chains]
+    with profiler.step("sweep.fit", ks=len(ks), chains=n):
+        if n <= 1:
+            results = [_sweep_chain(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(_sweep_chain, tasks))
+    rows = [r for chain in results for r in chain]
+
+    best = knee_point([r['k'] for r in rows], [r['inertia'] for r in rows])
+    print(f"   {'vans':>5} {'inertia':>12} {'mean km':>9} {'max km':>9} {'demand/van':>11}")
+    for r in rows:
+        mark = " <- knee" if r['k'] == best else ""
+        print(f"   {r['k']:>5} {r['inertia']:>12,.1f} {r['mean_km']:>9.1f} {r['max_km']:>9.1f} "
+              f"{r['demand_per_van']:>11,.0f}{mark}")
+
+    payload = {
+        'version': SWEEP_VERSION,
+        'source': _signature(INPUT_FILE),
+        'settings': {'k_min': k_min, 'k_max': k_max, 'backend': backend, 'seed': seed},
+        'timestamp': pd.Timestamp.now().isoformat(),
+        'pincodes': int(len(coord)),
+        'unique_points': int(len(points)),
+        'total_demand': int(weights.sum()),
+        'recommended_vans': best,
+        'sweep': rows,
+    }
+    os.makedirs(os.path.dirname(SWEEP_FILE), exist_ok=True)
+    with open(SWEEP_FILE, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"   🎯 Recommended fleet: {best} vans (knee of the inertia curve). Saved sweep.")
+    return payload
+
+
+def load_sweep(k_min=K_MIN, k_max=K_MAX, backend=CLUSTER_BACKEND):
+    """Last sweep if it was run on the current master_table with the same settings, else None."""
+    if not os.path.exists(SWEEP_FILE):
+        return None
+    try:
+        with open(SWEEP_FILE, 'r') as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    settings = payload.get('settings', {})
+    if (payload.get('version') != SWEEP_VERSION or payload.get('source') != _signature(INPUT_FILE)
+            or settings.get('k_min') != k_min or settings.get('k_max') != k_max or settings.get('backend') != backend):
+        return None
+    return payload
+
+
+def load_snapshot():
+    """master_table columns as of the last optimizer run, or None."""
+    if not os.path.exists(os.path.join(store_dir(SNAPSHOT_FILE), "schema.json")):
+        return None
+    try:
+        return load_table(SNAPSHOT_FILE, columns=SNAPSHOT_COLUMNS)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _route_weight(merged, suffix):
+    """Routed demand per pincode on one side of the diff (0 outside the CRITICAL/WARNING set)."""
+    lag = (merged[f"Enrolment_Count{suffix}"] - merged[f"Update_Count{suffix}"]).clip(lower=1)
+    in_set = merged[f"Risk_Category{suffix}"].astype(object).isin(RISK_SET)
+    return lag.where(in_set, 0).fillna(0).to_numpy(dtype=float)
+
+
+def stable_ids(centers, routes):
+    """
+    cluster_id per center: each previous route's id goes to the nearest new center (one-to-one,
+    minimum total km); centers left over get fresh ids after the highest one used so far.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    if not routes:
+        return np.arange(len(centers)) + 101 # ID 101, 102...
+    old = np.array([[r['lat'], r['lng']] for r in routes], dtype=float)
+    km = haversine_km(centers[:, None, 0], centers[:, None, 1], old[None, :, 0], old[None, :, 1])
+    rows, cols = linear_sum_assignment(km)
+    ids = np.full(len(centers), -1, dtype=np.int64)
+    ids[rows] = [routes[c]['cluster_id'] for c in cols]
+    fresh = np.flatnonzero(ids < 0)
+    ids[fresh] = max(max(r['cluster_id'] for r in routes), 100) + 1 + np.arange(len(fresh))
+    return ids
+
+
+def incremental_update(risk_df, current, n_vans=N_VANS, max_drift=DRIFT_MAX):
+    """
+    Re-optimizes only the routes touched by the master_table diff since the last run.
+    Returns (centers, labels, ids, info), or None when a full refit is needed.
+    """
+    routes = previous_routes()
+    snapshot = load_snapshot()
+    if not routes or snapshot is None:
+        print("   🆕 No previous routes / snapshot: full refit.")
+        return None
+    if n_vans is not None and int(n_vans) != len(routes):
+        print(f"   🔁 Van count changed ({len(routes)} -> {int(n_vans)}): full refit.")
+        return None
+    if not risk_df['Risk_Category'].astype(str).isin(RISK_SET).all():
+        return None # Fallback "raw df" clustering (too few risk points)
+
+    with profiler.step("diff_master_table", rows=len(current)) as meta:
+        diff = diff_tables(snapshot, current, key='Pincode', columns=SNAPSHOT_COLUMNS[1:])
+        meta.update(added=len(diff['added']), removed=len(diff['removed']), changed=len(diff['changed']))
+    merged = diff['merged']
+    old_w, new_w = _route_weight(merged, "_old"), _route_weight(merged, "_new")
+    drift = float(np.abs(new_w - old_w).sum() / max(old_w.sum(), 1.0))
+    print(f"   🔎 Diff: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+          f"{len(diff['changed'])} changed pincodes (demand drift {drift:.1%}).")
+    if drift > max_drift:
+        print(f"   🔁 Drift above {max_drift:.0%}: full refit.")
+        return None
+
+    ids = np.array([r['cluster_id'] for r in routes], dtype=np.int64)
+    centers = np.array([[r['lat'], r['lng']] for r in routes], dtype=float)
+    member = pd.Series(np.repeat(np.arange(len(routes)), [len(r.get('pincodes', [])) for r in routes]),
+                       index=np.array([p for r in routes for p in r.get('pincodes', [])], dtype=np.int64))
+    member = member[~member.index.duplicated(keep='last')]
+
+    pins = risk_df['Pincode'].to_numpy(dtype=np.int64)
+    coord = risk_df[['Latitude', 'Longitude']].to_numpy(dtype=float)
+    weights = risk_df['Weight'].to_numpy(dtype=float)
+    labels = member.reindex(pins).fillna(-1).to_numpy(dtype=np.int64)
+
+    # Routes touched: lost a member, hold a changed member, or gain a newly routed pincode
+    dropped = member[~member.index.isin(pins)].to_numpy()
+    changed = labels[np.isin(pins, diff['changed']) & (labels >= 0)]
+    new_rows = np.flatnonzero(labels < 0)
+    if len(new_rows):
+        d = coord[new_rows, None, :] - centers[None, :, :]
+        labels[new_rows] = np.argmin((d * d).sum(axis=2), axis=1)
+    affected = np.unique(np.concatenate([dropped, changed, labels[new_rows]])).astype(np.int64)
+
+    with profiler.step("local_lloyd", routes=len(affected)) as meta:
+        rows = np.flatnonzero(np.isin(labels, affected))
+        iterations = 0
+        for iterations in range(1, LOCAL_ITERS + 1 if len(affected) else 1):
+            # Assign among the affected stops only, then recentre them
+            d = coord[rows, None, :] - centers[None, affected, :]
+            new_labels = affected[np.argmin((d * d).sum(axis=2), axis=1)]
+            demand = np.bincount(new_labels, weights=weights[rows], minlength=len(centers))[affected]
+            if (demand <= 0).any():
+                print("   🔁 A route lost all its pincodes: full refit.")
+                return None
+            for j in range(2):
+                sums = np.bincount(new_labels, weights=weights[rows] * coord[rows, j], minlength=len(centers))
+                centers[affected, j] = sums[affected] / demand
+            stable = np.array_equal(new_labels, labels[rows])
+            labels[rows] = new_labels
+            if stable:
+                break
+        meta['iterations'] = iterations
+
+    print(f"   🧩 Re-optimized {len(affected)} of {len(routes)} routes locally ({iterations} iterations).")
+    info = {'added': len(diff['added']), 'removed': len(diff['removed']), 'changed': len(diff['changed']),
+            'drift': round(drift, 4), 'affected_routes': [int(i) for i in ids[affected]]}
+    return centers, labels, ids, info
+
+
+def cluster_stats(risk_df, labels, centers):
+    """
+    Per-route stats in one pass (bincount / sorted split, no per-cluster filtering):
+    demand, member pincodes, demand-weighted mean distance to the stop (weighted radius),
+    max distance to the stop and demand per risk category.
+    """
+    k = len(centers)
+    labels = np.asarray(labels)
+    w = risk_df['Weight'].to_numpy(dtype=float)
+    lat = risk_df['Latitude'].to_numpy(dtype=float)
+    lng = risk_df['Longitude'].to_numpy(dtype=float)
+    dist = haversine_km(lat, lng, centers[labels, 0], centers[labels, 1])
+
+    demand = np.bincount(labels, weights=w, minlength=k)
+    counts = np.bincount(labels, minlength=k)
+    w_dist = np.bincount(labels, weights=w * dist, minlength=k)
+    max_dist = np.zeros(k)
+    np.maximum.at(max_dist, labels, dist)
+
+    cats = pd.Categorical(risk_df['Risk_Category'].astype(str))
+    n_cat = len(cats.categories)
+    by_cat = np.bincount(labels * n_cat + cats.codes, weights=w, minlength=k * n_cat).reshape(k, n_cat)
+
+    # Member lists: stable sort by label, then split at the cluster boundaries
+    order = np.argsort(labels, kind='stable')
+    members = np.split(risk_df['Pincode'].to_numpy()[order], np.cumsum(counts)[:-1])
+
+    return [{
+        'demand': float(demand[i]),
+        'n_pincodes': int(counts[i]),
+        'weighted_radius_km': float(w_dist[i] / demand[i]) if demand[i] > 0 else 0.0,
+        'max_distance_km': float(max_dist[i]),
+        'demand_by_risk': {str(c): int(by_cat[i, j]) for j, c in enumerate(cats.categories)},
+        'pincodes': [int(p) for p in members[i]],
+    } for i in range(k)]
+
+
+def load_risk_points():
+    """Returns (coord, weights, risk_df) for the CRITICAL/WARNING pincodes."""
+    df = load_table(INPUT_FILE, columns=['Pincode', 'Enrolment_Count', 'Update_Count', 'Risk_Category', 'Latitude', 'Longitude'])
     
     # Filter for Critical Zones only? 
     # Or cluster everyone but prioritize Critical?
@@ -42,52 +476,103 @@ def run_route_optimizer():
         risk_df = df.copy()
         risk_df['Weight'] = 1
 
-    coord = risk_df[['Latitude', 'Longitude']].values
-    weights = risk_df['Weight'].values
+    coord = risk_df[['Latitude', 'Longitude']].to_numpy(dtype=float)
+    weights = risk_df['Weight'].to_numpy(dtype=float)
+    return coord, weights, risk_df
+
+
+def run_route_optimizer(backend=CLUSTER_BACKEND, warm_start=WARM_START, n_vans=N_VANS, incremental=INCREMENTAL,
+                        use_sweep=USE_SWEEP):
+    print("🚀 [Engine 2] Starting 'Route Optimizer' (Weighted K-Means)...")
+
+    if not os.path.exists(INPUT_FILE):
+        print(f"❌ Error: processed data not found.")
+        sys.exit(1)
+
+    coord, weights, risk_df = load_risk_points()
     
-    # Number of Vans
-    # Heuristic: 1 Van per 10,000 missing updates? Or fixed 10 vans for District?
     total_lag = weights.sum()
-    n_clusters = max(3, min(20, int(total_lag / 5000))) 
-    
-    print(f"   🚚 Clustering {len(risk_df)} Pincodes (Total Lag: {int(total_lag)}) into {n_clusters} Routes...")
-    
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    # Weighted K-Means!
-    kmeans.fit(coord, sample_weight=weights)
+    current = load_table(INPUT_FILE, columns=SNAPSHOT_COLUMNS)
+    local = incremental_update(risk_df, current, n_vans) if incremental else None
+    update = {'mode': "incremental"} if local is not None else {'mode': "full"}
+
+    if local is not None:
+        centers, labels, ids, info = local
+        update.update(info)
+        n_clusters, used = len(centers), "local"
+        inertia = weighted_inertia(coord, weights, centers, labels)
+    else:
+        # Number of Vans: fixed, lag heuristic, or the knee of the coverage-vs-fleet-size sweep (opt-in)
+        sweep = None
+        if n_vans is not None:
+            n_clusters = int(n_vans)
+        elif use_sweep:
+            sweep = load_sweep(backend=backend) or sweep_van_counts(backend=backend)
+            n_clusters = int(sweep['recommended_vans'])
+        else:
+            n_clusters = default_vans(total_lag)
+        
+        print(f"   🚚 Clustering {len(risk_df)} Pincodes (Total Lag: {int(total_lag)}) into {n_clusters} Routes...")
+        
+        init_centers = previous_centers(n_clusters, coord, weights) if warm_start else None
+        if init_centers is not None:
+            print(f"   ♻️ Warm-starting from previous route centers.")
+        elif sweep is not None:
+            # The sweep already fitted this k: start from its centers
+            init_centers = np.array(next(r['centers'] for r in sweep['sweep'] if r['k'] == n_clusters))
+        # Weighted K-Means!
+        centers, labels, used = fit_clusters(coord, weights, n_clusters, backend, init_centers)
+        inertia = weighted_inertia(coord, weights, centers, labels)
+        print(f"   🧮 Backend: {used} (weighted inertia {inertia:,.1f})")
+        
+        # Previous route IDs follow their nearest new stop
+        ids = stable_ids(centers, previous_routes())
     
-    centers = kmeans.cluster_centers_
-    # Labels for each pincode
-    risk_df['Cluster'] = kmeans.predict(coord)
+    # Labels for each pincode (reused from the fit)
+    risk_df['Cluster'] = labels
     
-    # Aggregate stats per cluster
+    # Aggregate stats per cluster (single grouped pass)
     clusters_output = []
     
-    for i in range(n_clusters):
-        cluster_grp = risk_df[risk_df['Cluster'] == i]
-        total_demand = cluster_grp['Weight'].sum()
+    for i, stats in enumerate(cluster_stats(risk_df, labels, centers)):
+        total_demand = stats['demand']
         
         clusters_output.append({
-            "cluster_id": int(i + 101), # ID 101, 102...
+            "cluster_id": int(ids[i]),
             "lat": float(centers[i][0]),
             "lng": float(centers[i][1]),
             "demand_size": int(total_demand),
-            "status": "CRITICAL" if total_demand > 10000 else "HIGH"
+            "status": "CRITICAL" if total_demand > 10000 else "HIGH",
+            "n_pincodes": stats['n_pincodes'],
+            "weighted_radius_km": round(stats['weighted_radius_km'], 3),
+            "max_distance_km": round(stats['max_distance_km'], 3),
+            "demand_by_risk": stats['demand_by_risk'],
+            "pincodes": stats['pincodes']
         })
         
     full_payload = {
         "algorithm": "Weighted K-Means",
+        "backend": used,
+        "inertia": round(inertia, 4),
         "timestamp": pd.Timestamp.now().isoformat(),
         "total_demand": int(total_lag),
         "deployed_vans": int(n_clusters),
+        "update": update,
         "routes": clusters_output
     }
     
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     with open(OUTPUT_FILE, 'w') as f:
         json.dump(full_payload, f, indent=4)
+    # Baseline for the next run's diff
+    save_table(current, SNAPSHOT_FILE, write_csv=False)
         
     print(f"   💾 Saved Route Clusters.")
 
 if __name__ == "__main__":
-    run_route_optimizer()
+    if "--benchmark" in sys.argv:
+        benchmark_backends()
+    elif "--sweep" in sys.argv:
+        sweep_van_counts()
+    else:
+        run_route_optimizer(use_sweep="--use-sweep" in sys.argv or USE_SWEEP)
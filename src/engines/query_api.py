@@ -0,0 +1,444 @@
+"""
+Engine 3: Risk Query API (Local HTTP / JSON Service)
+Input: master_table + master_time_series + route_clusters.json, loaded once into memory.
+Indexes (rebuilt on every load):
+1. Pincode -> row (sorted int64 keys, one searchsorted per lookup).
+2. District / State / Risk_Category / route -> sorted row arrays (case-insensitive keys).
+   Filters intersect the smallest arrays first; ULI ranges are one mask over the survivors.
+Endpoints (GET, all answer JSON):
+    /pincode/<pin>                         -> one pincode (+ its route)
+    /pincodes?district=&state=&risk=&route=&min_uli=&max_uli=&limit=&offset=
+    /top?n=20&by=ULI|Gap|Enrolment_Count|Update_Count&asc=0 (+ the same filters)
+    /aggregate?by=district|state|risk|route (+ filters) -> totals and mean ULI per group
+    /summary (+ filters)                   -> the dashboard headline metrics
+    /timeseries?start=YYYY-MM-DD&end=YYYY-MM-DD
+    /routes, /health
+Responses are cached per (path, query) in an LRU of encoded bodies; the common ones
+are precomputed on load. A watcher thread polls the source files and, once a changed
+file has settled, loads a fresh snapshot in the background and swaps it in (the cache
+is dropped with the old snapshot), so pipeline reruns show up without a restart.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.schema import DATE_FORMAT
+from pipeline.store import load_table
+
+# CONFIG
+TABLE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+SERIES_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_time_series.csv"
+CLUSTERS_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 512              # Encoded responses kept per snapshot
+RELOAD_INTERVAL_S = 2.0       # How often the watcher stats the source files
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 5000
+
+FIELDS = ['Pincode', 'District', 'State', 'Enrolment_Count', 'Update_Count', 'Gap', 'ULI',
+          'Risk_Category', 'Latitude', 'Longitude', 'Route']
+INDEXED = {'district': 'District', 'state': 'State', 'risk': 'Risk_Category', 'route': 'Route'}
+RANKABLE = ['ULI', 'Gap', 'Enrolment_Count', 'Update_Count']
+UNASSIGNED = "unassigned"    # Route key of pincodes outside every route
+
+
+def _signature(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime)
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _records(frame):
+    """JSON-ready rows (NaN -> null, numpy scalars -> Python)."""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+class RiskSnapshot:
+    """
+    One immutable, indexed load of the processed outputs.
+    Query methods take the parsed query string ({name: [values]}) and return JSON-ready dicts.
+    """
+
+    def __init__(self, table, series, clusters, sources):
+        self.table = table
+        self.series = series
+        self.clusters = clusters
+        self.sources = sources
+        self.loaded = datetime.now().isoformat(timespec='seconds')
+        self.pins = table['Pincode'].to_numpy(dtype=np.int64)
+        self.uli = table['ULI'].to_numpy(dtype=float)
+        self.index = {}
+        rows = pd.Series(np.arange(len(table)))
+        for key, col in INDEXED.items():
+            keys = table[col].astype(object).fillna(UNASSIGNED).astype(str).str.strip().str.lower().to_numpy()
+            self.index[key] = {k: np.sort(v) for k, v in rows.groupby(keys).indices.items()}
+
+    @classmethod
+    def load(cls):
+        sources = {p: _signature(p) for p in (TABLE_FILE, SERIES_FILE, CLUSTERS_FILE)}
+        wanted = ['Pincode', 'Enrolment_Count', 'Update_Count', 'ULI', 'Risk_Category',
+                  'Latitude', 'Longitude', 'District', 'State']
+        try:
+            table = load_table(TABLE_FILE, columns=wanted)
+        except (KeyError, ValueError):
+            # Tables written before zero_day kept the State column
+            table = load_table(TABLE_FILE, columns=wanted[:-1])
+            table['State'] = 'Unknown'
+        for col in ('District', 'State', 'Risk_Category'):
+            table[col] = table[col].astype(str).replace({'nan': 'Unknown'})
+        table['Pincode'] = table['Pincode'].astype(np.int64)
+        table['Gap'] = (table['Enrolment_Count'] - table['Update_Count']).clip(lower=0)
+
+        clusters = {'routes': []}
+        if os.path.exists(CLUSTERS_FILE):
+            with open(CLUSTERS_FILE, 'r') as f:
+                clusters = json.load(f)
+        member, route = [], []
+        for r in clusters.get('routes', []):
+            member.extend(r.get('pincodes', []))
+            route.extend([r['cluster_id']] * len(r.get('pincodes', [])))
+        routes = pd.Series(route, index=pd.Index(member, dtype=np.int64), dtype='Int64')
+        table['Route'] = routes[~routes.index.duplicated()].reindex(table['Pincode']).array
+
+        table = table.sort_values('Pincode', kind='stable').drop_duplicates('Pincode', keep='last')
+        table = table[FIELDS].reset_index(drop=True)
+
+        series = pd.DataFrame(columns=['date', 'enrolment_count', 'update_count'])
+        if os.path.exists(SERIES_FILE):
+            series = load_table(SERIES_FILE, columns=['date', 'enrolment_count', 'update_count'])
+            series['date'] = pd.to_datetime(series['date'].astype(str), format=DATE_FORMAT)
+            series = series.sort_values('date').reset_index(drop=True)
+        return cls(table, series, clusters, sources)
+
+    # ---------- filtering ----------
+
+    def select(self, q):
+        """Row positions matching the filters in `q` (sorted)."""
+        sets = []
+        for key in INDEXED:
+            if key in q:
+                wanted = [v.strip().lower() for value in q[key] for v in value.split(",") if v.strip()]
+                hits = [self.index[key].get(v, np.array([], dtype=np.int64)) for v in wanted]
+                if not hits:
+                    hits = [np.array([], dtype=np.int64)] # Only empty values (e.g. district=,) match nothing
+                sets.append(np.unique(np.concatenate(hits)) if len(hits) > 1 else hits[0])
+        if sets:
+            sets.sort(key=len)
+            rows = sets[0]
+            for s in sets[1:]:
+                rows = np.intersect1d(rows, s, assume_unique=True)
+        else:
+            rows = np.arange(len(self.table))
+        lo, hi = _float(q, 'min_uli'), _float(q, 'max_uli')
+        if lo is not None or hi is not None:
+            u = self.uli[rows]
+            rows = rows[(u >= (-np.inf if lo is None else lo)) & (u <= (np.inf if hi is None else hi))]
+        return rows
+
+    # ---------- endpoints ----------
+
+    def pincode(self, pin):
+        pos = np.searchsorted(self.pins, pin)
+        if pos >= len(self.pins) or self.pins[pos] != pin:
+            raise LookupError(f"Pincode {pin} not found")
+        return _records(self.table.iloc[[pos]])[0]
+
+    def pincodes(self, q):
+        rows = self.select(q)
+        limit = min(_int(q, 'limit', DEFAULT_LIMIT), MAX_LIMIT)
+        offset = _int(q, 'offset', 0)
+        return {'total': int(len(rows)), 'offset': offset, 'limit': limit,
+                'rows': _records(self.table.iloc[rows[offset:offset + limit]])}
+
+    def top(self, q):
+        by = q.get('by', ['ULI'])[0]
+        if by not in RANKABLE:
+            raise ValueError(f"by must be one of {RANKABLE}")
+        n = min(_int(q, 'n', 20), MAX_LIMIT)
+        asc = q.get('asc', ['0'])[0] in ('1', 'true')
+        rows = self.select(q)
+        values = self.table[by].to_numpy(dtype=float)[rows]
+        values = np.where(np.isnan(values), np.inf if asc else -np.inf, values)
+        key = values if asc else -values
+        if n < len(rows):
+            part = np.argpartition(key, n)[:n]
+            rows, key = rows[part], key[part]
+        order = np.lexsort((self.pins[rows], key))[:n] # Ties broken by pincode
+        return {'by': by, 'ascending': asc, 'rows': _records(self.table.iloc[rows[order]])}
+
+    def aggregate(self, q):
+        by = q.get('by', ['state'])[0]
+        if by not in INDEXED:
+            raise ValueError(f"by must be one of {list(INDEXED)}")
+        sub = self.table.iloc[self.select(q)]
+        g = sub.groupby(INDEXED[by], observed=True, dropna=False)
+        out = pd.DataFrame({
+            'pincodes': g.size(),
+            'enrolment': g['Enrolment_Count'].sum(),
+            'updates': g['Update_Count'].sum(),
+            'gap': g['Gap'].sum(),
+            'mean_uli': g['ULI'].mean().round(4),
+            'critical': g['Risk_Category'].agg(lambda s: int((s == 'CRITICAL').sum())),
+        }).sort_values('gap', ascending=False)
+        out.index = out.index.astype(object).fillna(UNASSIGNED).astype(str)
+        return {'by': by, 'groups': _records(out.rename_axis('group').reset_index())}
+
+    def summary(self, q):
+        """Same metrics as render_dashboard, for any filter."""
+        sub = self.table.iloc[self.select(q)]
+        avg_uli = sub['ULI'].mean()
+        score = 0 if np.isnan(avg_uli) else max(0, min(100, int((1 - avg_uli) * 100)))
+        return {
+            'pincodes': int(len(sub)),
+            'total_pending': int(sub['Gap'].sum()),
+            'critical_count': int(sub.loc[sub['Risk_Category'] == 'CRITICAL', 'Gap'].sum()),
+            'inclusion_score': score,
+            'risk_counts': {str(k): int(v) for k, v in sub['Risk_Category'].value_counts().items()},
+            'routes': int(sub['Route'].nunique()),
+            'active_vans': self.clusters.get('deployed_vans', 0),
+        }
+
+    def timeseries(self, q):
+        s = self.series
+        if 'start' in q:
+            s = s[s['date'] >= pd.Timestamp(q['start'][0])]
+        if 'end' in q:
+            s = s[s['date'] <= pd.Timestamp(q['end'][0])]
+        return {'dates': s['date'].dt.strftime('%Y-%m-%d').tolist(),
+                'enrolment': s['enrolment_count'].tolist(), 'updates': s['update_count'].tolist()}
+
+    def routes(self, q):
+        return {k: v for k, v in self.clusters.items() if k != 'routes'} | {
+            'routes': [{k: v for k, v in r.items() if k != 'pincodes'} for r in self.clusters.get('routes', [])]}
+
+    def health(self, q):
+        return {'loaded': self.loaded, 'pincodes': int(len(self.table)), 'series_days': int(len(self.series)),
+                'routes': len(self.clusters.get('routes', [])),
+                'sources': {os.path.basename(p): s for p, s in self.sources.items()}}
+
+
+def _int(q, name, default):
+    """Non-negative integer parameter (ValueError -> 400 otherwise)."""
+    value = int(q[name][0]) if name in q else default
+    if value < 0:
+        raise ValueError(f"{name} must be >= 0")
+    return value
+
+
+def _float(q, name):
+    return float(q[name][0]) if name in q else None
+
+
+class LRUCache:
+    """Thread-safe LRU of encoded response bodies."""
+
+    def __init__(self, size):
+        self.size, self.hits, self.misses = size, 0, 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+ROUTES = [
+    (re.compile(r"^/pincode/(\d{6})$"), lambda s, m, q: s.pincode(int(m.group(1)))),
+    (re.compile(r"^/pincodes$"), lambda s, m, q: s.pincodes(q)),
+    (re.compile(r"^/top$"), lambda s, m, q: s.top(q)),
+    (re.compile(r"^/aggregate$"), lambda s, m, q: s.aggregate(q)),
+    (re.compile(r"^/summary$"), lambda s, m, q: s.summary(q)),
+    (re.compile(r"^/timeseries$"), lambda s, m, q: s.timeseries(q)),
+    (re.compile(r"^/routes$"), lambda s, m, q: s.routes(q)),
+]
+PRECOMPUTE = ["/summary", "/top", "/aggregate?by=state", "/aggregate?by=district", "/aggregate?by=risk",
+              "/aggregate?by=route", "/timeseries", "/routes"]
+
+
+class QueryService:
+    """Current snapshot + its response cache + the reload watcher."""
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self.reloads = 0
+        self._swap(RiskSnapshot.load())
+
+    def _swap(self, snapshot):
+        cache = LRUCache(self.cache_size)
+        for url in PRECOMPUTE:
+            self._answer(snapshot, cache, url)
+        self.current = (snapshot, cache) # One assignment, so a request never mixes two snapshots
+
+    @property
+    def snapshot(self):
+        return self.current[0]
+
+    def _answer(self, snapshot, cache, url):
+        """(status, body bytes, cache hit) for a request URL against one snapshot."""
+        parsed = urlparse(url)
+        q = parse_qs(parsed.query)
+        key = (parsed.path, tuple(sorted((k, tuple(v)) for k, v in q.items())))
+        body = cache.get(key)
+        if body is not None:
+            return 200, body, True
+        if parsed.path == "/health":
+            payload = snapshot.health(q) | {'cache': {'entries': len(cache), 'hits': cache.hits,
+                                                      'misses': cache.misses}, 'reloads': self.reloads}
+            return 200, json.dumps(payload, default=_json_default).encode(), False
+        for pattern, handler in ROUTES:
+            m = pattern.match(parsed.path)
+            if m:
+                try:
+                    body = json.dumps(handler(snapshot, m, q), default=_json_default).encode()
+                except LookupError as e:
+                    return 404, json.dumps({'error': str(e)}).encode(), False
+                except ValueError as e:
+                    return 400, json.dumps({'error': str(e)}).encode(), False
+                except Exception as e: # Answer instead of dropping the connection
+                    return 500, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode(), False
+                cache.put(key, body)
+                return 200, body, False
+        return 404, json.dumps({'error': f"Unknown endpoint {parsed.path}"}).encode(), False
+
+    def answer(self, url):
+        snapshot, cache = self.current
+        return self._answer(snapshot, cache, url)
+
+    def watch(self, interval=RELOAD_INTERVAL_S):
+        """Background thread: reload once changed source files have stopped changing."""
+        def loop():
+            pending = None
+            while True:
+                time.sleep(interval)
+                current = {p: _signature(p) for p in self.snapshot.sources}
+                if current == self.snapshot.sources:
+                    pending = None
+                elif current != pending:
+                    pending = current # Still being written; check again next tick
+                else:
+                    try:
+                        self._swap(RiskSnapshot.load())
+                        self.reloads += 1
+                        print(f"   ♻️ Reloaded processed outputs ({len(self.snapshot.table)} pincodes).")
+                    except Exception as e: # Keep serving the old snapshot
+                        print(f"   ⚠️ Reload failed, keeping the previous data: {e}")
+                    pending = None
+
+        thread = threading.Thread(target=loop, name="reload-watcher", daemon=True)
+        thread.start()
+        return thread
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body, hit = service.answer(self.path)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*") # The static dashboard fetches from file://
+            self.send_header("X-Cache", "hit" if hit else "miss")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # One line per request is too chatty for a dashboard poll
+
+    return Handler
+
+
+def benchmark_queries(n=2000, seed=42):
+    """Latency of uncached and cached answers for a mix of officer-style queries."""
+    service = QueryService(cache_size=n + len(PRECOMPUTE))
+    snap = service.snapshot
+    rng = np.random.default_rng(seed)
+    districts = list(snap.index['district'])
+    pins = snap.pins
+    urls = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            urls.append(f"/pincode/{pins[rng.integers(len(pins))]}")
+        elif kind == 1:
+            urls.append(f"/pincodes?district={districts[rng.integers(len(districts))]}&min_uli=0.3")
+        elif kind == 2:
+            urls.append(f"/top?n=10&district={districts[rng.integers(len(districts))]}")
+        else:
+            urls.append(f"/summary?district={districts[rng.integers(len(districts))]}")
+    rows = []
+    for label in ("uncached", "cached"):
+        t0 = time.perf_counter()
+        for url in urls:
+            service.answer(url)
+        rows.append({'pass': label, 'n': n, 'ms_per_query': round((time.perf_counter() - t0) / n * 1e3, 3)})
+    result = pd.DataFrame(rows)
+    print(result.to_string(index=False))
+    return result
+
+
+def run_query_api(host=HOST, port=PORT):
+    print("🚀 [Engine 3] Starting 'Risk Query API' (in-memory indexes, LRU cache)...")
+
+    if not os.path.exists(TABLE_FILE):
+        print(f"❌ Error: processed data not found. Run the pipeline first.")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    service = QueryService()
+    print(f"   📚 Indexed {len(service.snapshot.table)} pincodes, "
+          f"{len(service.snapshot.index['district'])} districts in {time.perf_counter() - t0:.2f}s.")
+    service.watch()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"   🌐 Serving on http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("   🛑 Stopped.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark_queries()
+    else:
+        run_query_api(port=int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else PORT)
@@ -0,0 +1,301 @@
+"""
+Engine 2b: The "Route Planner" (Capacity-Constrained Van Assignment)
+Input: route_clusters.json (K-Means routes + member pincodes) + master_table.
+Logic:
+1. Capacity: every van serves at most VAN_DAILY_CAPACITY x CAMPAIGN_DAYS families.
+   Oversized clusters are split (recursive weighted-median bisection), small
+   neighbouring ones merged (BallTree over van centers).
+2. Sequencing: each van's pincodes are ordered into a closed tour from its stop
+   (nearest-neighbour construction on a haversine BallTree + 2-opt improvement).
+Output: van_routes.json
+"""
+
+import pandas as pd
+import numpy as np
+import json
+import math
+import os
+import sys
+from sklearn.neighbors import BallTree
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engines.geo import EARTH_RADIUS_KM, haversine_km, pairwise_km
+from engines.optimizer import load_risk_points
+from pipeline import profiler
+
+# CONFIG
+INPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
+OUTPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\van_routes.json"
+
+VAN_DAILY_CAPACITY = 200      # Families one van can update per day
+CAMPAIGN_DAYS = 30
+MERGE_BELOW = 0.25            # Vans under this share of capacity try to merge with a neighbour
+MERGE_MAX_KM = 50             # ...but only if that neighbour's stop is this close
+MAX_2OPT_FULL = 800           # Above this many stops, use kNN neighbour lists instead of a full distance matrix
+NN_CANDIDATES = 12
+TWO_OPT_PASSES = 20
+
+
+def split_by_capacity(idx, lat, lng, w, cap):
+    """
+    Recursively bisects a set of pincodes at the demand-weighted median of its widest axis
+    until every part fits `cap`. A single pincode above cap stays alone (served over several days).
+    """
+    parts, stack = [], [idx]
+    while stack:
+        cur = stack.pop()
+        if w[cur].sum() <= cap or len(cur) == 1:
+            parts.append(cur)
+            continue
+        # Widest axis in km (longitude shrinks with latitude)
+        span_lat = np.ptp(lat[cur])
+        span_lng = np.ptp(lng[cur]) * np.cos(np.radians(lat[cur].mean()))
+        key = lat[cur] if span_lat >= span_lng else lng[cur]
+        order = cur[np.argsort(key, kind='stable')]
+        cum = np.cumsum(w[order])
+        cut = int(np.clip(np.searchsorted(cum, cum[-1] / 2), 1, len(order) - 1))
+        stack += [order[:cut], order[cut:]]
+    return parts
+
+
+def part_centers(parts, lat, lng, w):
+    """Demand-weighted center and total demand of every part in one bincount pass."""
+    owner = np.repeat(np.arange(len(parts)), [len(p) for p in parts])
+    flat = np.concatenate(parts)
+    demand = np.bincount(owner, weights=w[flat], minlength=len(parts))
+    c_lat = np.bincount(owner, weights=w[flat] * lat[flat], minlength=len(parts)) / demand
+    c_lng = np.bincount(owner, weights=w[flat] * lng[flat], minlength=len(parts)) / demand
+    return np.column_stack([c_lat, c_lng]), demand
+
+
+def merge_small(parts, lat, lng, w, cap):
+    """Greedily merges under-filled vans into a nearby (<= MERGE_MAX_KM) neighbour van while it stays within cap."""
+    centers, demand = part_centers(parts, lat, lng, w)
+    alive = np.ones(len(parts), dtype=bool)
+    if len(parts) < 2:
+        return parts
+
+    tree = BallTree(np.radians(centers), metric='haversine')
+    k = min(len(parts), 8)
+    gaps, nbrs = tree.query(np.radians(centers), k=k)
+    gaps = gaps * EARTH_RADIUS_KM
+
+    for i in np.argsort(demand):
+        if not alive[i] or demand[i] >= MERGE_BELOW * cap:
+            continue
+        for gap, j in zip(gaps[i][1:], nbrs[i][1:]):
+            if gap > MERGE_MAX_KM:
+                break
+            if alive[j] and j != i and demand[i] + demand[j] <= cap:
+                parts[j] = np.concatenate([parts[j], parts[i]])
+                demand[j] += demand[i]
+                alive[i] = False
+                break
+    return [p for p, a in zip(parts, alive) if a]
+
+
+def nearest_neighbour_tour(pts, dist=None):
+    """
+    Closed tour from node 0 (the van stop), always moving to the nearest unvisited node.
+    Small tours use the distance matrix; large ones a haversine BallTree with one batched
+    kNN query (the tree is only re-queried when a node's neighbour list is exhausted).
+    """
+    n = len(pts)
+    if n <= 2:
+        return np.arange(n)
+    visited = np.zeros(n, dtype=bool)
+    tour = np.empty(n, dtype=int)
+    tour[0] = cur = 0
+    visited[0] = True
+
+    if dist is not None:
+        for step in range(1, n):
+            row = np.where(visited, np.inf, dist[cur])
+            cur = int(np.argmin(row))
+            visited[cur] = True
+            tour[step] = cur
+        return tour
+
+    rad = np.radians(pts)
+    tree = BallTree(rad, metric='haversine')
+    k = min(n, NN_CANDIDATES)
+    _, knn = tree.query(rad, k=k)
+    for step in range(1, n):
+        nxt = -1
+        for c in knn[cur]:
+            if not visited[c]:
+                nxt = c
+                break
+        if nxt < 0: # Neighbourhood exhausted: one wider query for this node
+            _, cand = tree.query(rad[cur:cur + 1], k=n)
+            nxt = next(c for c in cand[0] if not visited[c])
+        cur = int(nxt)
+        visited[cur] = True
+        tour[step] = cur
+    return tour
+
+
+def _hav(p, u, v):
+    # Scalar haversine for the neighbour-list loop (math is ~10x cheaper than NumPy on scalars)
+    la1, lo1, la2, lo2 = map(math.radians, (p[u][0], p[u][1], p[v][0], p[v][1]))
+    a = math.sin((la2 - la1) / 2) ** 2 + math.cos(la1) * math.cos(la2) * math.sin((lo2 - lo1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def two_opt(tour, pts, dist=None, knn=None, knn_km=None):
+    """
+    2-opt on a closed tour with node 0 fixed.
+    With a distance matrix: steepest descent, every (i, j) move scored in one NumPy pass.
+    Otherwise only the NN_CANDIDATES nearest neighbours of each node are tried (neighbour lists).
+    """
+    n = len(tour)
+    if n < 4:
+        return tour
+    tour = tour.copy()
+
+    if dist is not None:
+        I, J = np.triu_indices(n, k=1)
+        keep = I >= 1 # Position 0 is the depot
+        I, J = I[keep], J[keep]
+        J1 = (J + 1) % n
+        flat = dist.ravel() # take() on flat indices is ~2x faster than 2-D fancy indexing
+        for _ in range(TWO_OPT_PASSES * n):
+            a, b, c, e = tour[I - 1] * n, tour[I], tour[J], tour[J1]
+            gain = flat.take(a + b) + flat.take(c * n + e) - flat.take(a + c) - flat.take(b * n + e)
+            best = int(np.argmax(gain))
+            if gain[best] <= 1e-9:
+                break
+            i, j = I[best], J[best]
+            tour[i:j + 1] = tour[i:j + 1][::-1]
+        return tour
+
+    p = pts.tolist()
+    knn, knn_km = knn.tolist(), knn_km.tolist()
+    pos = np.empty(n, dtype=int)
+    for _ in range(TWO_OPT_PASSES):
+        improved = False
+        pos[tour] = np.arange(n)
+        for i in range(n):
+            a, b = tour[i], tour[(i + 1) % n]
+            d_ab = _hav(p, a, b)
+            for c, d_ac in zip(knn[a][1:], knn_km[a][1:]):
+                if d_ac >= d_ab:
+                    break # Neighbours are sorted: no closer candidate left
+                j = pos[c]
+                e = tour[(j + 1) % n]
+                if c == b or e == a:
+                    continue
+                if d_ab + _hav(p, c, e) - d_ac - _hav(p, b, e) > 1e-9:
+                    # Reverse the segment between b and c (keeping node 0 in place)
+                    lo, hi = sorted((i + 1, j)) if i < j else sorted((j + 1, i))
+                    if lo < 1:
+                        continue
+                    tour[lo:hi + 1] = tour[lo:hi + 1][::-1]
+                    pos[tour[lo:hi + 1]] = np.arange(lo, hi + 1)
+                    improved = True
+                    break
+        if not improved:
+            break
+    return tour
+
+
+def sequence_stops(pts):
+    """NN construction + 2-opt. Returns the tour as node indices (node 0 = depot)."""
+    if len(pts) <= MAX_2OPT_FULL:
+        dist = pairwise_km(pts)
+        return two_opt(nearest_neighbour_tour(pts, dist), pts, dist=dist)
+    rad = np.radians(pts)
+    knn_rad, knn = BallTree(rad, metric='haversine').query(rad, k=min(len(pts), NN_CANDIDATES))
+    return two_opt(nearest_neighbour_tour(pts), pts, knn=knn, knn_km=knn_rad * EARTH_RADIUS_KM)
+
+
+def tour_length(tour, pts):
+    p = pts[tour]
+    q = pts[np.roll(tour, -1)]
+    return float(haversine_km(p[:, 0], p[:, 1], q[:, 0], q[:, 1]).sum())
+
+
+def run_route_planner(van_capacity=None):
+    print("🚀 [Engine 2b] Starting 'Route Planner' (Capacity + Stop Sequencing)...")
+
+    if not os.path.exists(INPUT_FILE):
+        print(f"❌ Error: route clusters not found. Run the optimizer first.")
+        sys.exit(1)
+
+    with open(INPUT_FILE, 'r') as f:
+        cluster_data = json.load(f)
+    routes = cluster_data.get('routes', [])
+    if routes and 'pincodes' not in routes[0]:
+        print(f"❌ Error: route_clusters.json has no member pincodes. Re-run the optimizer.")
+        sys.exit(1)
+
+    cap = float(van_capacity or VAN_DAILY_CAPACITY * CAMPAIGN_DAYS)
+    _, _, risk_df = load_risk_points()
+    risk_df = risk_df.drop_duplicates('Pincode').set_index('Pincode')
+    lat = risk_df['Latitude'].to_numpy(dtype=float)
+    lng = risk_df['Longitude'].to_numpy(dtype=float)
+    w = risk_df['Weight'].to_numpy(dtype=float)
+    pins = risk_df.index.to_numpy()
+    pos_of = pd.Series(np.arange(len(pins)), index=pins)
+
+    # 1. Capacity: split oversized clusters, remember which route each part came from
+    with profiler.step("capacity_split", routes=len(routes)):
+        parts, source = [], []
+        for r in routes:
+            idx = pos_of.reindex(r['pincodes']).dropna().to_numpy(dtype=int)
+            if len(idx) == 0:
+                continue
+            for p in split_by_capacity(idx, lat, lng, w, cap):
+                parts.append(p)
+                source.append(r['cluster_id'])
+        n_split = len(parts)
+
+    # ...then merge under-filled neighbours (tracking merged route ids by member lookup)
+    route_of = np.zeros(len(pins), dtype=int)
+    for p, rid in zip(parts, source):
+        route_of[p] = rid
+    with profiler.step("merge_small", parts=len(parts)):
+        parts = merge_small(parts, lat, lng, w, cap)
+    print(f"   🚐 {len(routes)} clusters -> {n_split} capacity parts -> {len(parts)} vans (cap {int(cap):,} families)")
+
+    # 2. Sequencing: depot = demand-weighted center, then NN tour + 2-opt
+    vans = []
+    total_km = 0.0
+    centers, demands = part_centers(parts, lat, lng, w)
+    with profiler.step("sequence_stops", vans=len(parts)):
+        for v, k in enumerate(np.argsort(-demands, kind='stable')):
+            p, depot, demand = parts[k], centers[k], float(demands[k])
+            pts = np.vstack([depot, np.column_stack([lat[p], lng[p]])])
+            tour = sequence_stops(pts)
+            km = tour_length(tour, pts)
+            total_km += km
+            stops = p[tour[1:] - 1] # Drop depot (node 0), map back to pincode rows
+            vans.append({
+                "van_id": v + 1,
+                "source_routes": sorted({int(x) for x in route_of[p]}),
+                "lat": float(depot[0]),
+                "lng": float(depot[1]),
+                "demand_size": int(demand),
+                "days_needed": int(np.ceil(demand / (cap / CAMPAIGN_DAYS))),
+                "over_capacity": bool(demand > cap),
+                "tour_km": round(km, 2),
+                "stops": pins[stops].astype(int).tolist() # Visiting order (coordinates live in master_table)
+            })
+
+    payload = {
+        "algorithm": "Capacity split/merge + NN tour + 2-opt (haversine)",
+        "timestamp": pd.Timestamp.now().isoformat(),
+        "van_capacity": int(cap),
+        "deployed_vans": len(vans),
+        "total_tour_km": round(total_km, 2),
+        "vans": vans
+    }
+
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump(payload, f) # Compact: can hold 100k+ stops
+
+    print(f"   💾 Saved {len(vans)} Van Routes ({total_km:,.0f} km total).")
+
+if __name__ == "__main__":
+    run_route_planner()
@@ -0,0 +1,369 @@
+"""
+Spatial Index Service ("nearest van stop" / "pincodes within X km")
+Input: master_table (Pincode | Latitude | Longitude | ULI | Risk_Category)
+       + route_clusters.json / van_routes.json for the van stops.
+Index: KD-tree (scipy cKDTree) over unit-sphere vectors of all geocoded pincodes,
+persisted under data/index/. Chord length is monotonic in great-circle distance,
+so kNN/radius results match a haversine BallTree at ~10x lower query cost.
+Distances returned are haversine km.
+Incremental rebuild (when master_table changes):
+1. Pincodes that are new or whose coordinates moved go into a small "delta" set
+   (brute-force haversine); removed/moved base points are tombstoned.
+2. Attribute-only changes (ULI, risk) never touch the tree.
+3. Once delta + tombstones exceed DELTA_MAX of the table, the tree is rebuilt.
+Queries are batched: pass arrays of lat/lng (or pincodes) and get arrays back.
+"""
+
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.store import load_table
+from engines.geo import chord_to_km, haversine_km, km_to_chord, unit_vectors
+
+# CONFIG
+MASTER_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+ROUTES_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
+VANS_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\van_routes.json"
+INDEX_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\index"
+
+INDEX_VERSION = 1
+DELTA_MAX = 0.05              # Rebuild the tree once delta + tombstones exceed this share of pincodes
+LEAF_SIZE = 40
+DELTA_CHUNK = 2048            # Query rows per brute-force block over the delta set
+
+COLUMNS = ['Pincode', 'Latitude', 'Longitude', 'ULI', 'Risk_Category']
+
+
+def _signature(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime': st.st_mtime}
+
+
+def _lookup(keys, values):
+    """Positions of `values` in sorted `keys` (-1 where absent)."""
+    values = np.asarray(values, dtype=np.int64)
+    if len(keys) == 0:
+        return np.full(len(values), -1)
+    pos = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+    return np.where(keys[pos] == values, pos, -1)
+
+
+class SpatialIndex:
+    """
+    Pincode point index. Build/refresh with SpatialIndex.sync(); query with
+    nearest(), within(), nearest_stop() and pincodes_near().
+    """
+
+    def __init__(self):
+        self.base_pins = np.array([], dtype=np.int64)   # Tree order
+        self.base_pts = np.empty((0, 2))                # Degrees
+        self.dead = np.array([], dtype=bool)            # Tombstones over base points
+        self.delta_pins = np.array([], dtype=np.int64)
+        self.delta_pts = np.empty((0, 2))               # Degrees
+        self.tree = None
+        self.source = None
+        self._stops = None
+        # Attributes (sorted by pincode), refreshed on every sync
+        self.pins = np.array([], dtype=np.int64)
+        self.lat = self.lng = self.uli = np.array([])
+        self.risk = pd.Categorical([])
+
+    # ---------- build / persist ----------
+
+    @classmethod
+    def sync(cls, index_dir=None, force=False):
+        """
+        Loads the persisted index and brings it up to date with master_table.
+        Unchanged table -> pure load. Changed table -> delta update (or rebuild past DELTA_MAX).
+        """
+        index_dir = index_dir or INDEX_DIR
+        idx = None if force else cls.load(index_dir)
+        sig = _signature(MASTER_FILE)
+
+        if idx is not None and idx.source == sig:
+            return idx
+
+        table = cls._read_master()
+        if idx is None:
+            idx = cls()
+            idx._rebuild(table)
+            print(f"     🗺️ Spatial index built: {len(idx.base_pins)} pincodes.")
+        else:
+            idx._apply(table)
+        idx.source = sig
+        idx.save(index_dir)
+        return idx
+
+    @staticmethod
+    def _read_master():
+        df = load_table(MASTER_FILE, columns=COLUMNS)
+        pins = df['Pincode'].to_numpy(dtype=np.int64)
+        lat = df['Latitude'].to_numpy(dtype=float)
+        lng = df['Longitude'].to_numpy(dtype=float)
+        ok = np.isfinite(lat) & np.isfinite(lng)
+        # One row per pincode, sorted (last row wins like a dict update)
+        order = np.argsort(pins[ok], kind='stable')
+        p = pins[ok][order]
+        last = np.r_[p[1:] != p[:-1], True]
+        rows = np.flatnonzero(ok)[order][last]
+        return {
+            'pins': pins[rows],
+            'lat': lat[rows],
+            'lng': lng[rows],
+            'uli': df['ULI'].to_numpy(dtype=float)[rows],
+            'risk': pd.Categorical(np.asarray(df['Risk_Category'].astype(str))[rows]),
+        }
+
+    def _set_attributes(self, table):
+        self.pins, self.lat, self.lng = table['pins'], table['lat'], table['lng']
+        self.uli, self.risk = table['uli'], table['risk']
+
+    def _rebuild(self, table):
+        self._set_attributes(table)
+        self.base_pins = table['pins'].copy()
+        self.base_pts = np.column_stack([table['lat'], table['lng']])
+        self.dead = np.zeros(len(self.base_pins), dtype=bool)
+        self.delta_pins = np.array([], dtype=np.int64)
+        self.delta_pts = np.empty((0, 2))
+        self.tree = cKDTree(unit_vectors(table['lat'], table['lng']), leafsize=LEAF_SIZE) if len(self.base_pins) else None
+
+    def _apply(self, table):
+        """Diffs the new table against the indexed points and updates delta/tombstones."""
+        pins, new_pts = table['pins'], np.column_stack([table['lat'], table['lng']])
+
+        # Base points: tombstone anything removed or moved
+        pos = _lookup(pins, self.base_pins)
+        found = pos >= 0
+        moved = np.zeros(len(self.base_pins), dtype=bool)
+        moved[found] = np.any(new_pts[pos[found]] != self.base_pts[found], axis=1)
+        self.dead |= ~found | moved
+
+        # Everything live in the new table that the live base does not already cover goes to delta
+        covered = np.zeros(len(pins), dtype=bool)
+        live = ~self.dead
+        covered[pos[live & found]] = True
+        add = ~covered
+        self.delta_pins = pins[add]
+        self.delta_pts = np.column_stack([table['lat'][add], table['lng'][add]])
+
+        self._set_attributes(table)
+        churn = int(self.dead.sum()) + len(self.delta_pins)
+        if churn > DELTA_MAX * max(len(pins), 1):
+            print(f"     🗺️ Spatial index: {churn} changed points > {DELTA_MAX:.0%}. Rebuilding tree.")
+            self._rebuild(table)
+        else:
+            print(f"     🗺️ Spatial index: {len(self.delta_pins)} delta points, {int(self.dead.sum())} tombstones.")
+
+    def save(self, index_dir=None):
+        index_dir = index_dir or INDEX_DIR
+        os.makedirs(index_dir, exist_ok=True)
+        state = {k: v for k, v in self.__dict__.items() if k != '_stops'}
+        tmp = os.path.join(index_dir, "spatial_index.pkl.tmp")
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(index_dir, "spatial_index.pkl"))
+        with open(os.path.join(index_dir, "spatial_index.json"), 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'source': self.source,
+                       'base_points': int(len(self.base_pins)), 'tombstones': int(self.dead.sum()),
+                       'delta_points': int(len(self.delta_pins))}, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir=None):
+        """Persisted index, or None if missing / unreadable / from another version."""
+        index_dir = index_dir or INDEX_DIR
+        try:
+            with open(os.path.join(index_dir, "spatial_index.json"), 'r') as f:
+                if json.load(f).get('version') != INDEX_VERSION:
+                    return None
+            with open(os.path.join(index_dir, "spatial_index.pkl"), 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        idx = cls()
+        idx.__dict__.update(state)
+        return idx
+
+    # ---------- point queries ----------
+
+    def coords(self, pincodes):
+        """(n, 2) lat/lng for pincodes (NaN where unknown)."""
+        pos = _lookup(self.pins, pincodes)
+        out = np.full((len(pos), 2), np.nan)
+        hit = pos >= 0
+        out[hit, 0], out[hit, 1] = self.lat[pos[hit]], self.lng[pos[hit]]
+        return out
+
+    def attributes(self, pincodes):
+        """ULI and Risk_Category for result pincodes (aligned)."""
+        pos = _lookup(self.pins, pincodes)
+        hit = pos >= 0
+        uli = np.full(len(pos), np.nan)
+        risk = np.full(len(pos), None, dtype=object)
+        uli[hit] = self.uli[pos[hit]]
+        risk[hit] = np.asarray(self.risk, dtype=object)[pos[hit]]
+        return uli, risk
+
+    def _delta_km(self, q):
+        # Brute force is fine: delta stays under DELTA_MAX of the table
+        return haversine_km(q[:, None, 0], q[:, None, 1], self.delta_pts[None, :, 0], self.delta_pts[None, :, 1])
+
+    def nearest(self, lat, lng, k=1):
+        """
+        Batched kNN. Returns (pincodes, km), both (n, k); -1 / inf pad when fewer than k points exist.
+        """
+        q = np.column_stack([np.atleast_1d(lat), np.atleast_1d(lng)]).astype(float)
+        n = len(q)
+        pins = np.full((n, k), -1, dtype=np.int64)
+        km = np.full((n, k), np.inf)
+
+        if self.tree is not None:
+            n_dead = int(self.dead.sum())
+            kk = min(len(self.base_pins), k + min(n_dead, k)) # A few spares absorb most tombstones
+            rows = np.arange(n)
+            while len(rows):
+                d, i = self.tree.query(unit_vectors(q[rows, 0], q[rows, 1]), k=kk)
+                d, i = d.reshape(len(rows), kk), i.reshape(len(rows), kk) # k=1 comes back 1-D
+                alive = ~self.dead[i]
+                short = alive.sum(axis=1) < min(k, len(self.base_pins) - n_dead)
+                if kk >= len(self.base_pins):
+                    short[:] = False # Whole tree returned: nothing more to find
+                done = rows[~short]
+                # Keep the first k live hits per row (results are sorted by distance)
+                rank = np.cumsum(alive[~short], axis=1) - 1
+                keep = alive[~short] & (rank < k)
+                r, c = np.nonzero(keep)
+                pins[done[r], rank[~short][r, c]] = self.base_pins[i[~short][r, c]]
+                km[done[r], rank[~short][r, c]] = chord_to_km(d[~short][r, c])
+                rows, kk = rows[short], min(len(self.base_pins), kk * 2)
+
+        if len(self.delta_pins):
+            for s in range(0, n, DELTA_CHUNK):
+                dk = self._delta_km(q[s:s + DELTA_CHUNK])
+                all_km = np.hstack([km[s:s + DELTA_CHUNK], dk])
+                all_pins = np.hstack([pins[s:s + DELTA_CHUNK], np.broadcast_to(self.delta_pins, dk.shape)])
+                top = np.argsort(all_km, axis=1, kind='stable')[:, :k]
+                km[s:s + DELTA_CHUNK] = np.take_along_axis(all_km, top, axis=1)
+                pins[s:s + DELTA_CHUNK] = np.take_along_axis(all_pins, top, axis=1)
+        return pins, km
+
+    def within(self, lat, lng, radius_km, min_uli=None, sort=True):
+        """
+        Batched radius query. Returns a list (one entry per query point) of (pincodes, km) arrays,
+        optionally filtered to ULI >= min_uli and sorted by distance.
+        """
+        q = np.column_stack([np.atleast_1d(lat), np.atleast_1d(lng)]).astype(float)
+        radius = np.broadcast_to(np.asarray(radius_km, dtype=float), (len(q),))
+        if self.tree is not None:
+            ind = self.tree.query_ball_point(unit_vectors(q[:, 0], q[:, 1]), r=km_to_chord(radius))
+        else:
+            ind = [[] for _ in range(len(q))]
+
+        out = []
+        for row in range(len(q)):
+            i = np.asarray(ind[row], dtype=int)
+            i = i[~self.dead[i]]
+            p = self.base_pins[i]
+            d = haversine_km(q[row, 0], q[row, 1], self.base_pts[i, 0], self.base_pts[i, 1])
+            if len(self.delta_pins):
+                dk = self._delta_km(q[row:row + 1])[0]
+                near = dk <= radius[row]
+                p, d = np.concatenate([p, self.delta_pins[near]]), np.concatenate([d, dk[near]])
+            if min_uli is not None:
+                keep = self.attributes(p)[0] >= min_uli
+                p, d = p[keep], d[keep]
+            if sort:
+                order = np.argsort(d, kind='stable')
+                p, d = p[order], d[order]
+            out.append((p, d))
+        return out
+
+    def pincodes_near(self, pincodes, radius_km, min_uli=None):
+        """Radius query around pincodes (e.g. a camp's own pincode)."""
+        c = self.coords(pincodes)
+        return self.within(c[:, 0], c[:, 1], radius_km, min_uli=min_uli)
+
+    # ---------- van stops ----------
+
+    def stops(self):
+        """Van stops from van_routes.json if present, else route_clusters.json (cached per instance)."""
+        if self._stops is None:
+            for path, key, id_key in [(VANS_FILE, 'vans', 'van_id'), (ROUTES_FILE, 'routes', 'cluster_id')]:
+                if os.path.exists(path):
+                    with open(path, 'r') as f:
+                        items = json.load(f).get(key, [])
+                    if items:
+                        ids = np.array([r[id_key] for r in items], dtype=np.int64)
+                        pts = np.array([[r['lat'], r['lng']] for r in items], dtype=float)
+                        self._stops = (id_key, ids, pts, cKDTree(unit_vectors(pts[:, 0], pts[:, 1])))
+                        break
+            else:
+                raise FileNotFoundError("No van stops found. Run the optimizer / route planner first.")
+        return self._stops
+
+    def nearest_stop(self, pincodes):
+        """Serving van stop per pincode: DataFrame (Pincode, <van_id|cluster_id>, Distance_km)."""
+        id_key, ids, _, tree = self.stops()
+        c = self.coords(pincodes)
+        ok = ~np.isnan(c[:, 0])
+        stop = np.full(len(c), -1, dtype=np.int64)
+        km = np.full(len(c), np.nan)
+        if ok.any():
+            d, i = tree.query(unit_vectors(c[ok, 0], c[ok, 1]), k=1)
+            stop[ok], km[ok] = ids[i], chord_to_km(d)
+        return pd.DataFrame({'Pincode': np.asarray(pincodes, dtype=np.int64), id_key: stop, 'Distance_km': km})
+
+
+def benchmark_queries(n_queries=10_000, radius_km=10, seed=42):
+    """Latency of single and batched lookups against the persisted index."""
+    idx = SpatialIndex.sync()
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(idx.pins), size=min(n_queries, len(idx.pins)))
+    lat, lng = idx.lat[sample], idx.lng[sample]
+
+    rows = []
+    for name, fn in [
+        ("kNN k=5 (batched)", lambda: idx.nearest(lat, lng, k=5)),
+        (f"radius {radius_km} km (batched)", lambda: idx.within(lat, lng, radius_km, sort=False)),
+        ("nearest stop (batched)", lambda: idx.nearest_stop(idx.pins[sample])),
+    ]:
+        t0 = time.perf_counter()
+        fn()
+        rows.append({'query': name, 'n': len(sample),
+                     'us_per_lookup': round((time.perf_counter() - t0) / len(sample) * 1e6, 2)})
+    t0 = time.perf_counter()
+    for i in range(200):
+        idx.nearest(lat[i:i + 1], lng[i:i + 1], k=5)
+    rows.append({'query': "kNN k=5 (single)", 'n': 200, 'us_per_lookup': round((time.perf_counter() - t0) / 200 * 1e6, 2)})
+
+    result = pd.DataFrame(rows)
+    print(result.to_string(index=False))
+    return result
+
+
+def run_spatial_index(force=False):
+    print("🚀 [Engine 2c] Syncing 'Spatial Index' (KD-tree, great-circle)...")
+
+    if not os.path.exists(MASTER_FILE):
+        print(f"❌ Error: processed data not found.")
+        sys.exit(1)
+
+    idx = SpatialIndex.sync(force=force)
+    print(f"   💾 Spatial index ready: {len(idx.pins)} pincodes "
+          f"({len(idx.delta_pins)} delta, {int(idx.dead.sum())} tombstones).")
+    return idx
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark_queries()
+    else:
+        run_spatial_index(force="--rebuild" in sys.argv)
@@ -0,0 +1,304 @@
+"""
+Engine 4: Map Tile Pyramid (Pre-aggregated Risk Cells for a Browser Map)
+Input: master_table (Pincode | Latitude | Longitude | ULI | Risk_Category | Enrolment/Update counts)
+       + route_clusters.json for the van-stop overlay.
+Tiles are Web Mercator z/x/y (the slippy-map scheme Leaflet / OpenLayers fetch), MIN_ZOOM..MAX_ZOOM.
+Each tile is a 2^CELL_BITS x 2^CELL_BITS grid of cells; a cell aggregates its pincodes into one
+packed 15-byte record (CELL_DTYPE):
+    cell_x u8 | cell_y u8 | pincodes u32 | total gap u32 | max ULI f32 | dominant risk u8 (index into 'risk')
+Quadtree: every pincode gets one integer cell at the finest level; a coarser level is the
+same integer shifted right, so all levels come from one vectorized group-by each.
+Output under data/outputs/tiles/:
+    {z}/{x}/{y}.bin    -> records of the occupied cells of one tile (empty tiles are not written)
+    index.json         -> zoom range, record layout, legend, tile counts
+    routes.geojson     -> van stops overlay
+    index.html         -> Leaflet viewer that fetches only the visible tiles
+                          (serve the folder, e.g. python -m http.server, and open index.html)
+Incremental rebuild: the last build's per-pincode cells/attributes are kept in pyramid_state.npz.
+Only tiles containing a pincode that was added, removed, moved or re-scored (old or new
+position) are recomputed and rewritten; every other tile file is left untouched.
+"""
+
+import json
+import math
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.store import load_table
+
+# CONFIG
+MASTER_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+CLUSTERS_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
+TILE_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\tiles"
+
+PYRAMID_VERSION = 1
+MIN_ZOOM = 3
+MAX_ZOOM = 11
+CELL_BITS = 5                 # 32 x 32 cells per tile (8 px cells on 256 px tiles)
+RISK_LEVELS = ['SAFE', 'WARNING', 'CRITICAL']
+# One packed little-endian record per occupied cell (15 bytes)
+CELL_DTYPE = np.dtype([('cell_x', '<u1'), ('cell_y', '<u1'), ('pincodes', '<u4'), ('gap', '<u4'),
+                       ('max_uli', '<f4'), ('risk', '<u1')])
+MAX_LAT = 85.05112878         # Web Mercator limit
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>Satat-Aadhaar Risk Map</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style> html, body, #map { height: 100%; margin: 0; font-family: Arial, sans-serif; } </style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const COLORS = {SAFE: '#388E3C', WARNING: '#FFA000', CRITICAL: '#D32F2F'};
+fetch('index.json').then(r => r.json()).then(index => {
+  const map = L.map('map').setView([22.5, 80.0], 5);
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+              {attribution: '&copy; OpenStreetMap contributors', opacity: 0.6}).addTo(map);
+  const n = 1 << index.cell_bits;
+  const Risk = L.GridLayer.extend({
+    createTile: function (coords, done) {
+      const tile = document.createElement('canvas');
+      const size = this.getTileSize();
+      tile.width = size.x; tile.height = size.y;
+      if (coords.z < index.min_zoom || coords.z > index.max_zoom) { setTimeout(() => done(null, tile)); return tile; }
+      fetch(`${coords.z}/${coords.x}/${coords.y}.bin`).then(r => r.ok ? r.arrayBuffer() : new ArrayBuffer(0)).then(buf => {
+        const ctx = tile.getContext('2d'), w = size.x / n, v = new DataView(buf);
+        for (let o = 0; o + index.record_size <= buf.byteLength; o += index.record_size) {
+          const gap = v.getUint32(o + 6, true);
+          ctx.globalAlpha = Math.min(0.9, 0.25 + Math.log10(1 + gap) / 4);
+          ctx.fillStyle = COLORS[index.risk[v.getUint8(o + 14)]];
+          ctx.fillRect(v.getUint8(o) * w, v.getUint8(o + 1) * w, w, w);
+        }
+        done(null, tile);
+      }).catch(() => done(null, tile));
+      return tile;
+    }
+  });
+  new Risk({minZoom: index.min_zoom, maxZoom: index.max_zoom}).addTo(map);
+  fetch('routes.geojson').then(r => r.json()).then(routes => L.geoJSON(routes, {
+    pointToLayer: (f, latlng) => L.circleMarker(latlng, {radius: 7, color: '#000', weight: 2, fillOpacity: 0.1}),
+    onEachFeature: (f, layer) => layer.bindPopup(`C-${f.properties.cluster_id}: ${f.properties.demand_size} families`)
+  }).addTo(map));
+});
+</script>
+</body>
+</html>
+"""
+
+
+def global_cells(lat, lng, level=MAX_ZOOM + CELL_BITS):
+    """Integer Web Mercator (x, y) at `level` (tile zoom + CELL_BITS) for each point."""
+    n = 1 << level
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_LAT, MAX_LAT))
+    x = (np.asarray(lng, dtype=float) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n
+    return (np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64))
+
+
+def read_points():
+    """One row per geocoded pincode, sorted: pins, finest cell x/y, gap, ULI, risk code."""
+    df = load_table(MASTER_FILE, columns=['Pincode', 'Latitude', 'Longitude', 'ULI', 'Risk_Category',
+                                          'Enrolment_Count', 'Update_Count'])
+    df = df.dropna(subset=['Latitude', 'Longitude'])
+    df = df.sort_values('Pincode', kind='stable').drop_duplicates('Pincode', keep='last')
+    gx, gy = global_cells(df['Latitude'], df['Longitude'])
+    return {
+        'pins': df['Pincode'].to_numpy(dtype=np.int64),
+        'gx': gx,
+        'gy': gy,
+        'gap': (df['Enrolment_Count'] - df['Update_Count']).clip(lower=0).to_numpy(dtype=np.int64),
+        'uli': df['ULI'].fillna(0).to_numpy(dtype=float).round(4),
+        'risk': pd.Categorical(df['Risk_Category'].astype(str), categories=RISK_LEVELS).codes.astype(np.int8),
+    }
+
+
+def _changed(old, new):
+    """(old rows, new rows) masks of pincodes that were removed/moved/re-scored and added/moved/re-scored."""
+    pos = np.zeros(len(old['pins']), dtype=np.int64)
+    found = np.zeros(len(old['pins']), dtype=bool)
+    if len(new['pins']):
+        pos = np.minimum(np.searchsorted(new['pins'], old['pins']), len(new['pins']) - 1)
+        found = new['pins'][pos] == old['pins']
+    same = np.zeros(len(old['pins']), dtype=bool)
+    if found.any():
+        p = pos[found]
+        same[found] = ((old['gx'][found] == new['gx'][p]) & (old['gy'][found] == new['gy'][p]) &
+                       (old['gap'][found] == new['gap'][p]) & (old['uli'][found] == new['uli'][p]) &
+                       (old['risk'][found] == new['risk'][p]))
+    old_dirty = ~same
+    new_dirty = np.ones(len(new['pins']), dtype=bool)
+    new_dirty[pos[found & same]] = False
+    return old_dirty, new_dirty
+
+
+def aggregate_cells(points, z, rows=None):
+    """
+    Cells of zoom z for `rows` of points (all if None) as a CELL_DTYPE record array plus the
+    (tile x, tile y) of each record, sorted by tile.
+    """
+    rows = np.arange(len(points['pins'])) if rows is None else rows
+    shift = MAX_ZOOM - z
+    cx, cy = points['gx'][rows] >> shift, points['gy'][rows] >> shift # Cell at zoom z (global)
+    mask = (1 << CELL_BITS) - 1
+    # One int64 key per cell, tile-major: [tile x | tile y | cell x | cell y]
+    key = ((((cx >> CELL_BITS) << z) | (cy >> CELL_BITS)) << (2 * CELL_BITS)) | ((cx & mask) << CELL_BITS) | (cy & mask)
+    cells, inv = np.unique(key, return_inverse=True)
+    k = len(cells)
+    count = np.bincount(inv, minlength=k)
+    gap = np.bincount(inv, weights=points['gap'][rows], minlength=k)
+    max_uli = np.full(k, -np.inf)
+    np.maximum.at(max_uli, inv, points['uli'][rows])
+    risk = points['risk'][rows].astype(np.int64)
+    ok = risk >= 0
+    by_risk = np.bincount(inv[ok] * len(RISK_LEVELS) + risk[ok], minlength=k * len(RISK_LEVELS))
+    by_risk = by_risk.reshape(k, len(RISK_LEVELS))
+
+    out = np.zeros(k, dtype=CELL_DTYPE)
+    out['cell_x'], out['cell_y'] = (cells >> CELL_BITS) & mask, cells & mask
+    out['pincodes'], out['gap'], out['max_uli'] = count, gap, max_uli
+    # Most pincodes wins; ties go to the more severe category
+    out['risk'] = len(RISK_LEVELS) - 1 - np.argmax(by_risk[:, ::-1], axis=1)
+    tile = cells >> (2 * CELL_BITS)
+    return out, tile >> z, tile & ((1 << z) - 1)
+
+
+def _tile_path(tile_dir, z, x, y):
+    return os.path.join(tile_dir, str(z), str(x), f"{y}.bin")
+
+
+def write_tiles(points, z, tile_dir, dirty_tiles=None):
+    """
+    Writes the tiles of zoom z (only `dirty_tiles` {(x, y)} if given) and deletes dirty tiles
+    that no longer hold any pincode. Returns (written, deleted).
+    """
+    shift = MAX_ZOOM - z + CELL_BITS
+    rows = None
+    if dirty_tiles is not None:
+        if not dirty_tiles:
+            return 0, 0
+        keys = ((points['gx'] >> shift) << z) | (points['gy'] >> shift)
+        wanted = np.array([(x << z) | y for x, y in dirty_tiles], dtype=np.int64)
+        rows = np.flatnonzero(np.isin(keys, wanted))
+
+    cells, tx, ty = aggregate_cells(points, z, rows)
+    starts = np.flatnonzero(np.r_[True, (tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1])]) if len(cells) else []
+    ends = np.r_[starts[1:], len(cells)] if len(cells) else []
+    written = set()
+    made = set()
+    for s, e in zip(starts, ends):
+        x, y = int(tx[s]), int(ty[s])
+        path = _tile_path(tile_dir, z, x, y)
+        if x not in made:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            made.add(x)
+        cells[s:e].tofile(path)
+        written.add((x, y))
+
+    deleted = 0
+    for x, y in (dirty_tiles or set()) - written:
+        path = _tile_path(tile_dir, z, x, y)
+        if os.path.exists(path):
+            os.remove(path)
+            deleted += 1
+    return len(written), deleted
+
+
+def write_routes(tile_dir):
+    """Van stops as a GeoJSON point layer (member pincode lists left out)."""
+    features = []
+    if os.path.exists(CLUSTERS_FILE):
+        with open(CLUSTERS_FILE, 'r') as f:
+            routes = json.load(f).get('routes', [])
+        for r in routes:
+            props = {k: v for k, v in r.items() if k not in ('pincodes', 'lat', 'lng')}
+            features.append({'type': 'Feature', 'properties': props,
+                             'geometry': {'type': 'Point', 'coordinates': [r['lng'], r['lat']]}})
+    with open(os.path.join(tile_dir, "routes.geojson"), 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f, separators=(',', ':'))
+    return len(features)
+
+
+def _layout():
+    return {'version': PYRAMID_VERSION, 'min_zoom': MIN_ZOOM, 'max_zoom': MAX_ZOOM, 'cell_bits': CELL_BITS,
+            'risk': RISK_LEVELS, 'record': [[n, CELL_DTYPE[n].str] for n in CELL_DTYPE.names]}
+
+
+def load_state(tile_dir):
+    """Per-pincode arrays of the last build, or None if missing / built with another layout."""
+    path = os.path.join(tile_dir, "pyramid_state.npz")
+    try:
+        with np.load(path, allow_pickle=False) as state:
+            if json.loads(str(state['layout'])) != _layout():
+                return None
+            return {k: state[k] for k in ('pins', 'gx', 'gy', 'gap', 'uli', 'risk')}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def run_tile_pyramid(force=False, tile_dir=None):
+    print("🚀 [Engine 4] Building 'Map Tile Pyramid' (quadtree aggregates, changed tiles only)...")
+
+    if not os.path.exists(MASTER_FILE):
+        print(f"❌ Error: processed data not found.")
+        sys.exit(1)
+
+    tile_dir = tile_dir or TILE_DIR
+    old = None if force else load_state(tile_dir)
+    if old is None and os.path.isdir(tile_dir):
+        # Layout changed or first build: nothing on disk can be trusted
+        for z in os.listdir(tile_dir):
+            if z.isdigit():
+                shutil.rmtree(os.path.join(tile_dir, z))
+    os.makedirs(tile_dir, exist_ok=True)
+
+    with profiler.step("read_points") as meta:
+        points = read_points()
+        meta['rows'] = len(points['pins'])
+
+    if old is not None:
+        old_dirty, new_dirty = _changed(old, points)
+        moved_x = np.concatenate([old['gx'][old_dirty], points['gx'][new_dirty]])
+        moved_y = np.concatenate([old['gy'][old_dirty], points['gy'][new_dirty]])
+        print(f"   🔎 {int(old_dirty.sum())} old / {int(new_dirty.sum())} new pincode rows changed.")
+
+    written = deleted = 0
+    tiles = {}
+    for z in range(MIN_ZOOM, MAX_ZOOM + 1):
+        shift = MAX_ZOOM - z + CELL_BITS
+        dirty = None
+        if old is not None:
+            dirty = set(zip((moved_x >> shift).tolist(), (moved_y >> shift).tolist()))
+        with profiler.step("write_tiles", zoom=z) as meta:
+            w, d = write_tiles(points, z, tile_dir, dirty)
+            meta.update(written=w, deleted=d)
+        written += w
+        deleted += d
+        zoom_dir = os.path.join(tile_dir, str(z))
+        tiles[z] = sum(len(files) for _, _, files in os.walk(zoom_dir)) if os.path.isdir(zoom_dir) else 0
+
+    n_routes = write_routes(tile_dir)
+    with open(os.path.join(tile_dir, "index.json"), 'w') as f:
+        json.dump(dict(_layout(), record_size=CELL_DTYPE.itemsize, tiles=tiles, pincodes=int(len(points['pins'])),
+                       routes=n_routes), f, indent=2)
+    with open(os.path.join(tile_dir, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(VIEWER_HTML)
+
+    tmp = os.path.join(tile_dir, "pyramid_state.tmp.npz")
+    np.savez(tmp, layout=np.array(json.dumps(_layout())), **points)
+    os.replace(tmp, os.path.join(tile_dir, "pyramid_state.npz"))
+    print(f"   💾 Tiles z{MIN_ZOOM}-z{MAX_ZOOM}: {sum(tiles.values())} on disk, "
+          f"{written} written, {deleted} deleted ({n_routes} van stops overlay).")
+    return {'written': written, 'deleted': deleted, 'tiles': tiles}
+
+if __name__ == "__main__":
+    run_tile_pyramid(force="--force" in sys.argv)
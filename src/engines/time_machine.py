@@ -2,18 +2,57 @@
 Engine 1: The "Time Machine" (Forecasting Engine)
 Input: master_time_series.csv (Date | Enrolment | Update)
 Model: ARIMA
+Hierarchical mode (run_hierarchical_forecast):
+Input: master_cube.csv (Date x Pincode) + master_table.csv (Pincode -> District / State)
+1. One pass builds every monthly district series as a (districts x months) matrix.
+2. District, state and national series are fitted in batches across a process pool.
+3. Forecasts are reconciled so districts add up to states and states to the national total.
+Output: forecast_hierarchy.json (one compact artifact, all series as arrays)
+Order selection: ORDER_MODE="auto" runs a stepwise AIC search over (p,d,q)(P,0,Q)[12]:
+neighbours of the best model are fitted in parallel, and the search stops when none improves.
+Series ARIMA cannot handle fall back to the best vectorized baseline (see baselines.py);
+--benchmark compares both on a holdout window per CPU-second.
 """
 
 import pandas as pd
+import numpy as np
 import json
+import multiprocessing
 import os
 import sys
-from statsmodels.tsa.arima.model import ARIMA
+import time
+import warnings
 from datetime import datetime, timedelta
+from statsmodels.tsa.arima.model import ARIMA
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.store import load_table
+from pipeline.schema import parse_dates
+from engines import baselines, model_cache
 
 # CONFIG
 INPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_time_series.csv"
 OUTPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\forecast_data.json"
+CUBE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_cube.csv"
+TABLE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+HIERARCHY_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\forecast_hierarchy.json"
+
+ARIMA_ORDER = (5, 1, 0)
+HORIZON = 12                  # Months ahead
+HISTORY_MONTHS = 24           # Months of history kept in the artifact
+MIN_ARIMA_POINTS = 12         # Shorter series fall back to the best baseline forecaster
+FIT_METHOD = "mle"            # "mle" (statsmodels, per series, process pool) | "css" (vectorized least squares, all series at once)
+RECONCILE = "ols"             # "ols" (projection over all levels) | "bottom_up" (sum of districts)
+WORKERS = None                # Process pool size (None = all cores)
+SERIES_PER_TASK = 32
+
+ORDER_MODE = "fixed"          # "fixed" (ARIMA_ORDER) | "auto" (stepwise AIC search per series)
+MAX_P, MAX_Q = 5, 2           # Search grid: p <= MAX_P, q <= MAX_Q, d from a KPSS test
+MAX_SEASONAL = 1              # Seasonal P, Q <= 1 (tried with >= 2 seasons of data)
+SEASON = 12
+STEPWISE_STEPS = 10
+BENCH_SERIES = 100            # Districts sampled by --benchmark
 
 def run_time_machine():
     print("🚀 [Engine 1] Starting 'Time Machine' Forecast...")
@@ -22,7 +61,7 @@ def run_time_machine():
         print(f"❌ Error: {INPUT_FILE} not found.")
         sys.exit(1)
 
-    df = pd.read_csv(INPUT_FILE)
+    df = load_table(INPUT_FILE, columns=['date', 'update_count'])
     # Fix Date Parsing (DD-MM-YYYY) - Explicit Format
     df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
     df.dropna(subset=['date'], inplace=True)
@@ -33,41 +72,434 @@ def run_time_machine():
     
     print(f"   📈 Time points: {len(monthly_data)}")
     
-    # Train ARIMA
+    # Train ARIMA (cached: unchanged data reuses the fit, appended months extend it)
+    y = monthly_data.to_numpy(dtype=float)
     try:
-        model = ARIMA(monthly_data, order=(5,1,0)) # Simple non-seasonal auto-regressive
-        model_fit = model.fit()
-        
-        forecast = model_fit.forecast(steps=12)
-        
-        # Prepare JSON Structure
-        history = []
-        for d, v in monthly_data.tail(24).items():
-            history.append({"date": d.strftime('%Y-%m'), "value": int(v), "type": "historical"})
-            
-        future = []
-        # forecast index is usually offset
-        last_date = monthly_data.index[-1]
-        for val in forecast:
-            last_date += timedelta(days=30)
-            future.append({"date": last_date.strftime('%Y-%m'), "value": int(val), "type": "forecast"})
-            
-        payload = {
-            "title": "Biometric Update Surge Forecast",
-            "model": "ARIMA(5,1,0)",
-            "data": history + future
-        }
-        
-        os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(payload, f, indent=4)
-        
-        print(f"   ✅ Saved Forecast JSON.")
-
+        cache = model_cache.load_cache()
+        entry = cache.get('national/update_count')
+        order, seasonal = ARIMA_ORDER, model_cache.NO_SEASON # Simple non-seasonal auto-regressive
+        if ORDER_MODE == "auto":
+            order, seasonal = cached_or_selected_order(y, entry, HORIZON, WORKERS)
+        with profiler.step("arima.fit", points=len(y)) as meta:
+            forecast, cache['national/update_count'], action = model_cache.fit_series(y, order, HORIZON, entry, seasonal)
+            meta['action'] = action
+        cache['national/update_count']['auto'] = ORDER_MODE == "auto"
+        model_cache.save_cache(cache, keys=['national/update_count'])
+        print(f"   ♻️ Model cache: {action}")
+        model_name = model_label(order, seasonal)
     except Exception as e:
-        print(f"❌ ARIMA Error: {e}")
-        # Fallback for dashboard (Empty/Mock structure if model fails?)
-        # No, better to fail loud or output empty.
+        print(f"   ⚠️ ARIMA Error: {e}. Falling back to the best baseline forecaster.")
+        forecast, names = baselines.select_baseline(y[None, :], HORIZON)
+        forecast, model_name = forecast[0], f"Baseline ({names[0]})"
+
+    # Prepare JSON Structure
+    history = []
+    for d, v in monthly_data.tail(24).items():
+        history.append({"date": d.strftime('%Y-%m'), "value": int(v), "type": "historical"})
+
+    future = []
+    # forecast index is usually offset
+    last_date = monthly_data.index[-1]
+    for val in forecast:
+        last_date += timedelta(days=30)
+        future.append({"date": last_date.strftime('%Y-%m'), "value": int(val), "type": "forecast"})
+
+    payload = {
+        "title": "Biometric Update Surge Forecast",
+        "model": model_name,
+        "data": history + future
+    }
+
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump(payload, f, indent=4)
+
+    print(f"   ✅ Saved Forecast JSON ({model_name}).")
+
+
+def model_label(order, seasonal=model_cache.NO_SEASON):
+    label = "ARIMA(" + ",".join(map(str, order)) + ")"
+    if tuple(seasonal) != model_cache.NO_SEASON:
+        label += "(" + ",".join(map(str, seasonal[:3])) + f")[{seasonal[3]}]"
+    return label
+
+
+def choose_d(y):
+    """Differencing order from a KPSS level-stationarity test (d=1 if rejected at 5%)."""
+    from statsmodels.tsa.stattools import kpss
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # p-value outside the lookup table
+        try:
+            return 1 if kpss(y, regression='c', nlags='auto')[1] < 0.05 else 0
+        except Exception:
+            return 1
+
+
+def _aic_task(args):
+    # Top-level so the pool can pickle it (Windows uses spawn)
+    y, order, seasonal = args
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            return ARIMA(y, order=order, seasonal_order=seasonal).fit().aic
+        except Exception:
+            return np.inf
+
+
+def _order_ok(n_points, order, seasonal):
+    p, d, q = order
+    P, D, Q, m = seasonal
+    if not (0 <= p <= MAX_P and 0 <= q <= MAX_Q and 0 <= P <= MAX_SEASONAL and 0 <= Q <= MAX_SEASONAL):
+        return False
+    if (P or Q) and n_points < 2 * m + 4: # Need two full seasons
+        return False
+    return n_points > p + q + d + m * (P + Q) + 3
+
+
+def _neighbours(order, seasonal):
+    p, d, q = order
+    P, D, Q, m = seasonal
+    steps = [(1, 0, 0, 0), (-1, 0, 0, 0), (0, 1, 0, 0), (0, -1, 0, 0), (1, 1, 0, 0), (-1, -1, 0, 0),
+             (0, 0, 1, 0), (0, 0, -1, 0), (0, 0, 0, 1), (0, 0, 0, -1)]
+    for dp, dq, dP, dQ in steps:
+        yield (p + dp, d, q + dq), (P + dP, D, Q + dQ, SEASON if P + dP or Q + dQ else 0)
+
+
+def select_order(y, workers=1):
+    """
+    Stepwise AIC search: a few starting models, then only the +/-1 neighbours of the current
+    best (one parallel batch per step). Pruning: stops as soon as no neighbour improves the AIC.
+    Returns (order, seasonal_order, aic, models fitted).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    d = choose_d(y)
+    S = lambda P, Q: (P, 0, Q, SEASON) if P or Q else model_cache.NO_SEASON
+    batch = [((2, d, 2), S(1, 1)), ((0, d, 0), S(0, 0)), ((1, d, 0), S(1, 0)), ((0, d, 1), S(0, 1)),
+             ((2, d, 2), S(0, 0)), ((1, d, 0), S(0, 0)), ((0, d, 1), S(0, 0))]
+    best = ((1, d, 0), model_cache.NO_SEASON, np.inf)
+    seen = set()
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    try:
+        for _ in range(STEPWISE_STEPS):
+            batch = [c for c in dict.fromkeys(batch) if c not in seen and _order_ok(len(y), *c)]
+            if not batch:
+                break
+            seen.update(batch)
+            tasks = [(y, order, seasonal) for order, seasonal in batch]
+            aics = list(pool.map(_aic_task, tasks)) if pool else [_aic_task(t) for t in tasks]
+            i = int(np.argmin(aics))
+            if aics[i] >= best[2]:
+                break # No neighbour improves: prune the rest of the grid
+            best = (batch[i][0], batch[i][1], aics[i])
+            batch = list(_neighbours(best[0], best[1]))
+    finally:
+        if pool: pool.shutdown()
+    return best[0], best[1], best[2], len(seen)
+
+
+def cached_or_selected_order(y, entry, horizon, workers=1):
+    """Keeps an auto-selected cached order until its series is due a full refit; searches otherwise."""
+    if entry is not None and entry.get('auto'):
+        seasonal = entry.get('seasonal_order', model_cache.NO_SEASON)
+        if model_cache.plan_fit(entry, y, entry['order'], horizon, seasonal) != "refit":
+            return tuple(entry['order']), tuple(seasonal)
+    order, seasonal, _, _ = select_order(y, workers)
+    return order, seasonal
+
+def build_hierarchy():
+    """
+    Monthly update counts for every (state, district) from the cube in one pass.
+    Returns (months, nodes DataFrame[State, District], matrix (districts x months)).
+    Pincodes without a geocoded district are kept under 'Unknown' so totals stay exact.
+    """
+    cube = load_table(CUBE_FILE, columns=['date', 'Pincode', 'update_count'])
+    dates, _ = parse_dates(cube['date'])
+    month = dates.to_numpy().astype('datetime64[M]')
+    ok = ~np.isnat(month)
+
+    geo_cols = ['Pincode', 'District', 'State']
+    try:
+        geo = load_table(TABLE_FILE, columns=geo_cols)
+    except (KeyError, ValueError):
+        print("   ⚠️ master_table has no State column (re-run zero_day_cleaner). States set to 'Unknown'.")
+        geo = load_table(TABLE_FILE, columns=['Pincode', 'District'])
+        geo['State'] = 'Unknown'
+    geo = pd.DataFrame({c: np.asarray(geo[c]) for c in geo_cols}).drop_duplicates('Pincode')
+    geo[['District', 'State']] = geo[['District', 'State']].fillna('Unknown').astype(str)
+
+    # Pincode -> node code (sorted lookup instead of a merge on the full cube)
+    nodes = pd.concat([geo[['State', 'District']], pd.DataFrame({'State': ['Unknown'], 'District': ['Unknown']})])
+    nodes = nodes.drop_duplicates().sort_values(['State', 'District']).reset_index(drop=True)
+    node_index = pd.MultiIndex.from_frame(nodes)
+    unknown = node_index.get_loc(('Unknown', 'Unknown'))
+    keys = geo['Pincode'].to_numpy(dtype=np.int64)
+    order = np.argsort(keys)
+    keys, node_of = keys[order], node_index.get_indexer(pd.MultiIndex.from_frame(geo[['State', 'District']]))[order]
+
+    pins = cube['Pincode'].to_numpy(dtype=np.int64)[ok]
+    node = np.full(len(pins), unknown)
+    if len(keys):
+        pos = np.minimum(np.searchsorted(keys, pins), len(keys) - 1)
+        hit = keys[pos] == pins
+        node[hit] = node_of[pos[hit]]
+
+    months = np.arange(month[ok].min(), month[ok].max() + 1) if ok.any() else np.array([], dtype='datetime64[M]')
+    col = (month[ok] - months[0]).astype(int) if len(months) else np.array([], dtype=int)
+    values = cube['update_count'].to_numpy(dtype=float)[ok]
+    matrix = np.bincount(node * len(months) + col, weights=values,
+                         minlength=len(nodes) * len(months)).reshape(len(nodes), len(months))
+
+    used = matrix.any(axis=1) # Drop districts with no activity at all (e.g. an empty 'Unknown')
+    return months, nodes[used].reset_index(drop=True), matrix[used]
+
+
+def _fit_series_block(args):
+    # Top-level so the pool can pickle it (Windows uses spawn)
+    block, horizon, order, entries, order_mode = args
+    out = np.full((len(block), horizon), np.nan) # NaN rows = "fallback", filled with baselines by the caller
+    models, new_entries = [], []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # Convergence chatter x thousands of series
+        for i, (y, entry) in enumerate(zip(block, entries)):
+            new_entry, tag = None, "fallback"
+            if len(y) >= MIN_ARIMA_POINTS and np.any(y):
+                try:
+                    seasonal = model_cache.NO_SEASON
+                    if order_mode == "auto":
+                        order, seasonal = cached_or_selected_order(y, entry, horizon)
+                    out[i], new_entry, action = model_cache.fit_series(y, order, horizon, entry, seasonal)
+                    new_entry['auto'] = order_mode == "auto"
+                    tag = model_label(order, seasonal)
+                except Exception:
+                    new_entry = None
+            models.append(tag)
+            new_entries.append((new_entry, action if new_entry is not None else None))
+    return out, models, new_entries
+
+
+def fit_arima_mle(Y, ids, horizon=HORIZON, order=ARIMA_ORDER, workers=WORKERS, order_mode=ORDER_MODE):
+    """
+    statsmodels ARIMA per series, SERIES_PER_TASK series per pool task, through the model cache
+    (series keyed by `ids`). Returns (forecasts, model tags); failed series are NaN / "fallback".
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    cache = model_cache.load_cache()
+    entries = [cache.get(i) for i in ids]
+    tasks = [(Y[i:i + SERIES_PER_TASK], horizon, order, entries[i:i + SERIES_PER_TASK], order_mode)
+             for i in range(0, len(Y), SERIES_PER_TASK)]
+    n = workers or os.cpu_count() or 1
+    if n <= 1 or len(tasks) <= 1:
+        results = [_fit_series_block(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(_fit_series_block, tasks))
+    if not results:
+        return np.empty((0, horizon)), []
+
+    actions, written = {}, []
+    for series_id, (entry, action) in zip(ids, [e for r in results for e in r[2]]):
+        if entry is not None:
+            cache[series_id] = entry
+            written.append(series_id)
+            actions[action] = actions.get(action, 0) + 1
+    model_cache.save_cache(cache, keys=written)
+    if actions:
+        print(f"   ♻️ Model cache: " + ", ".join(f"{v} {k}" for k, v in sorted(actions.items())))
+    return np.vstack([r[0] for r in results]), [m for r in results for m in r[1]]
+
+
+def fit_arima_css(Y, horizon=HORIZON, order=ARIMA_ORDER):
+    """
+    ARIMA(p, d, 0) by conditional least squares for all series at once: batched normal
+    equations on the d-times differenced series, then a vectorized recursive forecast
+    integrated back d times. q is ignored (fitted and labelled as (p, d, 0)); p = 0 is
+    a zero forecast of the differences, e.g. (0, 1, 0) = random walk.
+    """
+    p, d, _ = order
+    n, t = Y.shape
+    if t < max(MIN_ARIMA_POINTS, p + d + 2):
+        return np.full((n, horizon), np.nan), ["fallback"] * n
+
+    dy = np.diff(Y, n=d, axis=1)
+    out = _ar_forecast(dy, p, horizon) if p else np.zeros((n, horizon))
+    for k in reversed(range(d)): # Undo each difference from the last value of the (k)-th difference
+        out = np.diff(Y, n=k, axis=1)[:, -1:] + np.cumsum(out, axis=1)
+    flat = ~Y.any(axis=1)
+    out[flat] = np.nan
+    return out, ["fallback" if f else model_label((p, d, 0)) + " css" for f in flat]
+
+
+def _ar_forecast(dy, p, horizon):
+    """AR(p) coefficients per row of `dy` (conditional least squares) and the recursive forecast."""
+    n = len(dy)
+    X = np.stack([dy[:, p - k - 1:dy.shape[1] - k - 1] for k in range(p)], axis=2) # (n, T-p, p): lag 1..p
+    target = dy[:, p:]
+    XtX = np.einsum('ntp,ntq->npq', X, X) + 1e-8 * np.eye(p) # Ridge epsilon keeps flat series solvable
+    phi = np.linalg.solve(XtX, np.einsum('ntp,nt->np', X, target)[..., None])[..., 0]
+
+    hist = dy[:, -p:][:, ::-1].copy() # Most recent first
+    steps = np.empty((n, horizon))
+    for h in range(horizon):
+        steps[:, h] = (phi * hist).sum(axis=1)
+        hist = np.column_stack([steps[:, h], hist[:, :-1]])
+    return steps
+
+
+def fill_fallbacks(Y, forecasts, models, horizon=HORIZON):
+    """Replaces "fallback" rows with the best vectorized baseline (one pass over all of them)."""
+    rows = [i for i, m in enumerate(models) if m == "fallback"]
+    if rows:
+        forecasts[rows], names = baselines.select_baseline(Y[rows], horizon)
+        for i, name in zip(rows, names):
+            models[i] = name
+    return forecasts, models, len(rows)
+
+
+def reconcile(f_district, f_state, f_national, state_of, method=RECONCILE):
+    """
+    Coherent district forecasts (states / national are their sums).
+    "ols": least-squares projection of all base forecasts onto the hierarchy,
+    solved in O(districts) from the two-level structure (no summing-matrix inverse).
+    """
+    if method == "bottom_up" or len(f_district) == 0:
+        return f_district
+    if method != "ols":
+        raise ValueError(f"Unknown reconciliation method: {method}")
+
+    n = len(f_district)
+    n_s = np.bincount(state_of, minlength=len(f_state)).astype(float)[:, None]
+    # Right-hand side S'y: each district sees its own, its state's and the national base forecast
+    r = f_district + f_state[state_of] + f_national[None, :]
+    R_s = np.zeros_like(f_state)
+    np.add.at(R_s, state_of, r)
+    R = r.sum(axis=0)
+    # Solve (I + state blocks + all-ones) x = r via state sums X_s and national sum T
+    T = (R - (n_s * R_s / (1 + n_s)).sum(axis=0)) / ((1 + n) - (n_s ** 2 / (1 + n_s)).sum())
+    X_s = (R_s - n_s * T) / (1 + n_s)
+    return r - X_s[state_of] - T
+
+
+def run_hierarchical_forecast(workers=WORKERS, method=FIT_METHOD, reconcile_method=RECONCILE, order_mode=ORDER_MODE):
+    print("🚀 [Engine 1b] Starting Hierarchical Forecast (District -> State -> National)...")
+
+    if not os.path.exists(CUBE_FILE) or not os.path.exists(TABLE_FILE):
+        print(f"❌ Error: master_cube / master_table not found. Run ingestion and zero_day first.")
+        sys.exit(1)
+
+    with profiler.step("build_hierarchy"):
+        months, nodes, Y_d = build_hierarchy()
+    if len(months) == 0:
+        print(f"❌ Error: no dated rows in master_cube.")
+        sys.exit(1)
+
+    states, state_of = np.unique(nodes['State'].to_numpy(), return_inverse=True)
+    Y_s = np.zeros((len(states), len(months)))
+    np.add.at(Y_s, state_of, Y_d)
+    Y_n = Y_d.sum(axis=0, keepdims=True)
+    print(f"   📈 {len(Y_d)} districts, {len(states)} states, {len(months)} months")
+
+    # Base forecasts for every node of the hierarchy in one batch
+    Y_all = np.vstack([Y_d, Y_s, Y_n])
+    with profiler.step(f"fit_{method}", series=len(Y_all)):
+        if method == "css":
+            base, models = fit_arima_css(Y_all)
+        else:
+            ids = [f"district/{s}/{d}" for s, d in zip(nodes['State'], nodes['District'])] + \
+                  [f"state/{s}" for s in states] + ["national"]
+            base, models = fit_arima_mle(Y_all, ids, workers=workers, order_mode=order_mode)
+        base, models, n_fallback = fill_fallbacks(Y_all, base, models)
+    f_d, f_s, f_n = base[:len(Y_d)], base[len(Y_d):-1], base[-1]
+    print(f"   🧮 {n_fallback} of {len(models)} series too short/flat/failed for ARIMA (baseline fallback)")
+
+    # Reconcile, clip at zero on the districts, then aggregate up (keeps the hierarchy coherent)
+    with profiler.step("reconcile", method=reconcile_method):
+        f_d = np.clip(reconcile(f_d, f_s, f_n, state_of, reconcile_method), 0, None)
+    f_s = np.zeros_like(f_s)
+    np.add.at(f_s, state_of, f_d)
+    f_n = f_d.sum(axis=0)
+
+    hist = slice(max(0, len(months) - HISTORY_MONTHS), None)
+    future = np.arange(months[-1] + 1, months[-1] + 1 + HORIZON)
+    as_int = lambda a: np.rint(a).astype(np.int64).tolist()
+    fitted = ARIMA_ORDER[:2] + (0,) if method == 'css' else ARIMA_ORDER # css ignores q
+    payload = {
+        "title": "Biometric Update Forecast by State / District",
+        "model": f"ARIMA ({method}, {'auto order' if order_mode == 'auto' and method != 'css' else model_label(fitted)})",
+        "reconciliation": reconcile_method,
+        "timestamp": pd.Timestamp.now().isoformat(),
+        "history_months": [str(m) for m in months[hist]],
+        "forecast_months": [str(m) for m in future],
+        "national": {"history": as_int(Y_n[0, hist]), "forecast": as_int(f_n)},
+        "states": {"names": states.tolist(), "history": as_int(Y_s[:, hist]), "forecast": as_int(f_s)},
+        "districts": {
+            "names": nodes['District'].tolist(),
+            "state": state_of.tolist(), # Index into states.names
+            "model": models[:len(Y_d)],
+            "history": as_int(Y_d[:, hist]),
+            "forecast": as_int(f_d),
+        },
+    }
+
+    os.makedirs(os.path.dirname(HIERARCHY_FILE), exist_ok=True)
+    with open(HIERARCHY_FILE, 'w') as f:
+        json.dump(payload, f) # Compact: thousands of series
+
+    print(f"   ✅ Saved Hierarchical Forecast ({len(Y_d)} districts).")
+
+def benchmark_forecasters(holdout=6, n_series=BENCH_SERIES, seed=42):
+    """
+    Holdout accuracy (WAPE on the last `holdout` months) and CPU seconds of every forecaster
+    on a sample of district series. ARIMA has to beat the best baseline to justify its cost.
+    """
+    months, nodes, Y = build_hierarchy()
+    Y = Y[Y[:, :-holdout].any(axis=1)]
+    rng = np.random.default_rng(seed)
+    Y = Y[rng.choice(len(Y), size=min(n_series, len(Y)), replace=False)]
+    train, test = Y[:, :-holdout], Y[:, -holdout:]
+    print(f"   ⏱️ Benchmark: {len(Y)} district series, {train.shape[1]} months train, {holdout} holdout")
+
+    def arima_each(select):
+        out = np.full(test.shape, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for i, y in enumerate(train):
+                try:
+                    order, seasonal = select(y)
+                    out[i] = ARIMA(y, order=order, seasonal_order=seasonal).fit().forecast(steps=holdout)
+                except Exception:
+                    pass
+        return out
+
+    runs = [(name, lambda fn=fn: fn(train, holdout)) for name, fn in baselines.METHODS.items()]
+    runs += [
+        ("baseline (best per series)", lambda: baselines.select_baseline(train, holdout)[0]),
+        (model_label(ARIMA_ORDER[:2] + (0,)) + " css", lambda: fit_arima_css(train, holdout)[0]),
+        (model_label(ARIMA_ORDER) + " mle", lambda: arima_each(lambda y: (ARIMA_ORDER, model_cache.NO_SEASON))),
+        ("ARIMA auto order", lambda: arima_each(lambda y: select_order(y)[:2])),
+    ]
+
+    rows = []
+    for name, fn in runs:
+        t0 = time.process_time()
+        forecast = fn()
+        cpu = time.process_time() - t0
+        ok = ~np.isnan(forecast).any(axis=1)
+        wape = np.abs(forecast[ok] - test[ok]).sum() / max(np.abs(test[ok]).sum(), 1e-9)
+        rows.append({'forecaster': name, 'cpu_s': round(cpu, 4), 'series_ok': int(ok.sum()), 'wape': round(wape, 4)})
+
+    result = pd.DataFrame(rows)
+    best_base = result.loc[result['forecaster'].isin(list(baselines.METHODS)), 'wape'].min()
+    result['skill_vs_best_baseline'] = (1 - result['wape'] / best_base).round(4)
+    result['skill_per_cpu_s'] = (result['skill_vs_best_baseline'] / result['cpu_s'].clip(lower=1e-4)).round(3)
+    print(result.to_string(index=False))
+    return result
 
 if __name__ == "__main__":
-    run_time_machine()
+    if "--benchmark" in sys.argv:
+        benchmark_forecasters()
+    else:
+        run_time_machine()
+        run_hierarchical_forecast()
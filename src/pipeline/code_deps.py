@@ -0,0 +1,44 @@
+"""
+Code Dependencies (Source Files behind a Module)
+Static scan of in-repo imports, so caches can key on every source file that can
+change an output instead of a hand-kept list:
+    code_files(['visuals.basic_stats']) -> visuals/basic_stats.py, visuals/bins.py,
+                                           pipeline/store.py, pipeline/profiler.py
+Used by the orchestrator (stage keys) and run_visuals (figure keys).
+Only absolute imports of modules under src/ are followed; imports done at run time
+through importlib are invisible to the scan and must be listed by the caller.
+"""
+
+import ast
+import os
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def source_file(name):
+    """src/<a>/<b>.py for an in-repo dotted module name, else None (third-party / stdlib)."""
+    path = os.path.join(SRC_DIR, *name.split(".")) + ".py"
+    return path if os.path.isfile(path) else None
+
+
+def code_files(module_names):
+    """Source files of the given modules and of every in-repo module they import, transitively."""
+    files, seen, stack = set(), set(), list(module_names)
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        path = source_file(name)
+        if path is None:
+            continue
+        files.add(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                stack += [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                # "from engines import baselines" imports a module, "from pipeline.store import x" a name
+                stack += [node.module] + [f"{node.module}.{a.name}" for a in node.names]
+    return sorted(files)
@@ -0,0 +1,137 @@
+"""
+Persistent Geocode Index (Pincode -> Latitude / Longitude / District / State)
+Replaces a per-run pgeocode.Nominatim('in') load + query with an on-disk
+lookup table under data/geocode/ (column store, see store.py):
+    Pincode (sorted int) | Latitude | Longitude | District | State | Fetched (epoch days) | Found
+Lookups are one vectorized searchsorted. pgeocode is only imported and queried
+for pincodes the index has never seen (or whose entry expired).
+Eviction policy:
+- Found entries expire after MAX_AGE_DAYS (postal data changes slowly).
+- Not-found entries expire after MISS_TTL_DAYS, so new pincodes get retried.
+- refresh=True drops the whole index and re-fetches everything requested.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.store import load_table, save_table, store_dir
+
+# CONFIG
+GEO_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\geocode"
+MAX_AGE_DAYS = 365
+MISS_TTL_DAYS = 30
+
+COLUMNS = ['Pincode', 'Latitude', 'Longitude', 'District', 'State', 'Fetched', 'Found']
+TEXT_COLUMNS = ['District', 'State']
+
+
+def _index_path(geo_dir):
+    return os.path.join(geo_dir, "geocode_index.csv")
+
+
+def _today():
+    return int(time.time() // 86400)
+
+
+def load_index(geo_dir=None):
+    """Loads the index (memory-mapped); empty frame if it was never built or predates a column."""
+    path = _index_path(geo_dir or GEO_DIR)
+    if os.path.exists(path) or os.path.exists(store_dir(path)):
+        try:
+            return load_table(path, columns=COLUMNS)
+        except (KeyError, ValueError):
+            print("     ⚠️ Geocode index has an older layout. Re-fetching.")
+    return pd.DataFrame({'Pincode': np.array([], dtype=np.int64),
+                         'Latitude': np.array([], dtype=np.float64),
+                         'Longitude': np.array([], dtype=np.float64),
+                         'District': pd.Categorical([]),
+                         'State': pd.Categorical([]),
+                         'Fetched': np.array([], dtype=np.int64),
+                         'Found': np.array([], dtype=bool)})
+
+
+def _fetch(pincodes):
+    """Queries pgeocode for the given pincodes (the only place that pays its load cost)."""
+    import pgeocode
+    with profiler.step("pgeocode.load"):
+        nomi = pgeocode.Nominatim('in')
+    with profiler.step("query_postal_code", pincodes=len(pincodes)):
+        geo = nomi.query_postal_code([str(p) for p in pincodes])
+    lat = geo['latitude'].to_numpy(dtype=np.float64)
+    lon = geo['longitude'].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'Pincode': np.asarray(pincodes, dtype=np.int64),
+        'Latitude': lat,
+        'Longitude': lon,
+        'District': geo['county_name'].to_numpy(dtype=object),
+        'State': geo['state_name'].to_numpy(dtype=object),
+        'Fetched': _today(),
+        'Found': ~(np.isnan(lat) | np.isnan(lon)),
+    })
+
+
+def expired_mask(index, today=None):
+    today = _today() if today is None else today
+    age = today - index['Fetched'].to_numpy()
+    found = index['Found'].to_numpy()
+    return np.where(found, age > MAX_AGE_DAYS, age > MISS_TTL_DAYS)
+
+
+def lookup(pincodes, geo_dir=None, refresh=False):
+    """
+    Returns a DataFrame (Latitude, Longitude, District, State) aligned with `pincodes`.
+    Unknown/expired pincodes are fetched once and persisted; unresolvable ones are NaN.
+    """
+    geo_dir = geo_dir or GEO_DIR
+    pins = pd.to_numeric(pd.Series(pincodes), errors='coerce').to_numpy()
+    valid = ~np.isnan(pins)
+    pins_int = np.where(valid, pins, -1).astype(np.int64)
+
+    index = load_index(geo_dir)
+    if refresh and len(index):
+        print(f"     ♻️ Refresh requested. Dropping {len(index)} cached pincodes.")
+        index = index.iloc[0:0]
+
+    keys = index['Pincode'].to_numpy()
+    fresh = ~expired_mask(index) if len(index) else np.array([], dtype=bool)
+
+    # 1. Miss path: only pincodes never seen (or expired) go to pgeocode
+    wanted = np.unique(pins_int[valid])
+    if len(keys):
+        pos = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        known = (keys[pos] == wanted) & fresh[pos]
+    else:
+        known = np.zeros(len(wanted), dtype=bool)
+    misses = wanted[~known]
+    print(f"     🌍 Geocode cache: {len(wanted) - len(misses)} hits, {len(misses)} misses")
+
+    if len(misses):
+        fetched = _fetch(misses)
+        keep = index[~np.isin(keys, misses)].copy() # Copy out of the memmap before rewriting it
+        keep[TEXT_COLUMNS] = keep[TEXT_COLUMNS].astype(object)
+        merged = pd.concat([keep, fetched], ignore_index=True)
+        merged = merged.sort_values('Pincode', kind='stable').reset_index(drop=True)
+        index = keys = None # Release mapped files (Windows cannot replace them while open)
+        os.makedirs(geo_dir, exist_ok=True)
+        save_table(merged, _index_path(geo_dir))
+        index = load_index(geo_dir)
+        keys = index['Pincode'].to_numpy()
+
+    # 2. Vectorized lookup: one searchsorted over the full request
+    out = pd.DataFrame({'Latitude': np.nan, 'Longitude': np.nan, 'District': None, 'State': None}, index=range(len(pins_int)))
+    if len(keys) == 0:
+        return out
+    pos = np.minimum(np.searchsorted(keys, pins_int), len(keys) - 1)
+    hit = valid & (keys[pos] == pins_int)
+    rows = pos[hit]
+    out.loc[hit, 'Latitude'] = index['Latitude'].to_numpy()[rows]
+    out.loc[hit, 'Longitude'] = index['Longitude'].to_numpy()[rows]
+    for col in TEXT_COLUMNS:
+        out.loc[hit, col] = np.asarray(index[col].astype(object))[rows]
+    return out
@@ -1,113 +1,376 @@
 """
 Step 1: Ingestion & Aggregation (Engine 3: Ingestion Layer)
 Handles Real OGD Aggregated Data (Enrolment, Biometric, Demographic).
+Each CSV is parsed ONCE into a (date, pincode) cube; both master tables are
+marginals of that cube.
 Outputs:
 1. master_pincode_risk.csv -> For Map, Route Optimizer, Sankey.
 2. master_time_series.csv -> For ARIMA.
+3. master_cube.csv -> (date, pincode) counts for drill-downs.
+(Each also gets a memory-mapped column store, see store.py.)
+4. uli_cube/ -> (pincode x month x age band x feed) counts, see uli_cube.py.
+The cube keeps one column per (feed, age band) until the outputs are written,
+so the age-5/15 update signal is not summed away.
 """
 
 import pandas as pd
+import numpy as np
 import glob
+import json
+import multiprocessing
 import os
+import pickle
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import manifest as shard_manifest
+from pipeline import profiler, uli_cube
+from pipeline.store import save_table
+from pipeline.schema import BAND_COLUMNS, FEEDS, DATE_FORMAT, feed_of, plan_columns, parse_dates
+
 # CONFIG
 ROOT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar"
 OUT_DIR = os.path.join(ROOT_DIR, "data", "processed")
+STATE_DIR = os.path.join(ROOT_DIR, "data", "ingest_state") # Incremental manifest + per-shard partials
 os.makedirs(OUT_DIR, exist_ok=True)
 
-def aggregate_data():
+INGEST_MODE = "single_pass"   # "single_pass" | "streaming" | "parallel" | "incremental"
+CHUNK_ROWS = 250_000          # Rows per chunk in streaming mode
+MEMORY_BUDGET_MB = None       # If set, overrides CHUNK_ROWS (approx. RAM per chunk)
+WORKERS = None                # Parallel mode pool size (None = all cores)
+
+CUBE_COLS = ['enrol', 'update']
+
+def aggregate_data(mode=INGEST_MODE, chunk_rows=CHUNK_ROWS, memory_budget_mb=MEMORY_BUDGET_MB, workers=WORKERS):
     print("🚀 [Step 1] Starting Aggregated Data Ingestion...")
 
-    # Pattern Matching
-    enrol_files = glob.glob(os.path.join(ROOT_DIR, "api_data_aadhar_enrolment", "**", "*.csv"), recursive=True)
-    bio_files = glob.glob(os.path.join(ROOT_DIR, "api_data_aadhar_biometric", "**", "*.csv"), recursive=True)
-    demo_files = glob.glob(os.path.join(ROOT_DIR, "api_data_aadhar_demographic", "**", "*.csv"), recursive=True)
+    # Pattern Matching (one directory per feed, see schema.FEEDS)
+    shards = []
+    for feed, spec in FEEDS.items():
+        files = glob.glob(os.path.join(ROOT_DIR, spec['dir'], "**", "*.csv"), recursive=True)
+        print(f"   found {len(files)} {spec['label']} files")
+        shards += [(f, feed) for f in files]
+
+    report = {} # file -> schema drift issues
+
+    if mode == "incremental":
+        # --- Incremental: only new/changed shards are parsed, removed ones subtracted ---
+        print("   ⏳ Updating (Date x Pincode) Cube from shard manifest...")
+        df_cube = incremental_shards(shards, workers or 1, chunk_rows if memory_budget_mb is None else None, memory_budget_mb, report)
+    elif mode == "parallel":
+        # --- Parallel: one shard per task, partials combined by tree reduction ---
+        n = workers or os.cpu_count() or 1
+        print(f"   ⏳ Building (Date x Pincode) Cube across {n} worker processes...")
+        df_cube = parallel_shards(shards, n, chunk_rows if memory_budget_mb is None else None, memory_budget_mb, report)
+    elif mode == "streaming":
+        # --- Streaming: fixed-size chunks folded into a running cube ---
+        print(f"   ⏳ Streaming (Date x Pincode) Cube in {chunk_rows:,}-row chunks...")
+        df_cube = None
+        for f, feed in shards:
+            part, issues = ingest_shard(f, feed, chunk_rows, memory_budget_mb)
+            if issues: report[f] = issues
+            if part is not None:
+                df_cube = part if df_cube is None else add_cubes(df_cube, part)
+        df_cube = finalize_cube(df_cube)
+    else:
+        # --- Single Pass: one read per file feeds every aggregate ---
+        print("   ⏳ Building (Date x Pincode) Cube in a single pass...")
+        partials = collect_issues(shards, [ingest_shard(f, feed) for f, feed in shards], report)
+        with profiler.step("tree_reduce", partials=len(partials)):
+            df_cube = finalize_cube(tree_reduce([p for p in partials if p is not None]))
+
+    write_schema_report(report)
+    with profiler.step("write_outputs", cube_rows=len(df_cube)):
+        write_outputs(df_cube, uli=mode != "incremental") # Incremental mode updated the ULI cube in place
+
+
+def read_plan(f, feed):
+    """Reads only the header and resolves the feed's schema plan for this file."""
+    header = pd.read_csv(f, nrows=0).columns
+    return plan_columns(header, feed)
+
+
+def reduce_frame(df, plan, issues):
+    """Collapses a typed feed frame (or chunk) to (date, pincode) -> one count column per (feed, age band)."""
+    df = df.rename(columns=plan['rename'])
+
+    if 'date' in df.columns:
+        df['date'], n_bad = parse_dates(df['date'])
+        if n_bad:
+            issues.append({'level': 'warning', 'msg': f"{n_bad} rows with dates not in {DATE_FORMAT}"})
+    # A missing key still contributes to the other aggregate (NaN keys drop out of that one)
+    for key in ('date', 'pincode'):
+        if key not in df.columns: df[key] = np.nan
+
+    # Blank counts are read as NA (nullable dtype): report them, count them as 0, then narrow
+    counts = df[plan['counts']]
+    n_na = int(counts.isna().any(axis=1).sum())
+    if n_na:
+        issues.append({'level': 'warning', 'msg': f"{n_na} rows with blank/NA counts (counted as 0)"})
+    df[plan['counts']] = counts.fillna(0).astype('uint32')
+
+    # Keep NaN keys so date totals still see rows without a pincode (and vice versa)
+    grouped = df.groupby(['date', 'pincode'], dropna=False, observed=True)[plan['counts']].sum()
+    out = pd.DataFrame(index=grouped.index)
+    for col in plan['counts']:
+        band = plan['bands'][col] # Several unregistered columns can share "<feed>_other"
+        values = grouped[col].astype('int64')
+        out[band] = out[band] + values if band in out.columns else values
+    return out
+
+
+def rows_for_budget(f, plan, memory_budget_mb):
+    """Estimates how many rows of `f` fit in the memory budget (from a 1k-row sample)."""
+    sample = pd.read_csv(f, usecols=plan['usecols'], dtype=plan['dtype'], nrows=1000)
+    bytes_per_row = max(1, sample.memory_usage(index=True, deep=True).sum() / max(1, len(sample)))
+    # x3 headroom: parse buffers + groupby intermediates
+    return max(1000, int(memory_budget_mb * 1024 * 1024 / (bytes_per_row * 3)))
+
+
+def ingest_shard(f, feed, chunk_rows=None, memory_budget_mb=None):
+    """
+    Reduces one shard to a (date, pincode) frame with a single enrol/update column.
+    Whole-file read by default; fixed-size chunks when chunk_rows / memory_budget_mb is set,
+    so peak memory ~ one chunk + the shard's cube, not file size.
+    Returns (cube or None, schema issues).
+    """
+    issues = []
+    with profiler.step("parse", file=os.path.basename(f), feed=feed) as meta:
+        try:
+            plan, issues = read_plan(f, feed)
+            if plan is None:
+                return None, issues
+            read = dict(usecols=plan['usecols'], dtype=plan['dtype'])
+
+            if chunk_rows is None and memory_budget_mb is None:
+                with profiler.step("read_csv"):
+                    raw = pd.read_csv(f, **read)
+                meta['rows'] = len(raw)
+                with profiler.step("groupby"):
+                    part = reduce_frame(raw, plan, issues)
+                return part, issues
+
+            rows = rows_for_budget(f, plan, memory_budget_mb) if memory_budget_mb else chunk_rows
+            file_cube = None
+            meta['chunk_rows'] = rows
+            for chunk in pd.read_csv(f, chunksize=rows, **read):
+                meta['rows'] = meta.get('rows', 0) + len(chunk)
+                part = reduce_frame(chunk, plan, issues)
+                # Vectorized merge: align on (date, pincode) and add
+                file_cube = part if file_cube is None else add_cubes(file_cube, part)
+            # Only a fully-read file is returned (a bad chunk skips the whole file)
+            return file_cube, issues
+
+        except Exception as e:
+            # e.g. non-numeric pincode/count values that do not fit the registered dtype
+            issues.append({'level': 'error', 'msg': f"unreadable with registered schema: {e}"})
+            return None, issues
+
+
+def collect_issues(shards, results, report):
+    """Splits (cube, issues) results into the cube list and the drift report."""
+    for (f, _), (_, issues) in zip(shards, results):
+        if issues: report[f] = issues
+    return [cube for cube, _ in results]
+
+
+def write_schema_report(report):
+    """Prints a drift summary and writes schema_report.json (file -> issues)."""
+    path = os.path.join(OUT_DIR, "schema_report.json")
+    payload = {os.path.relpath(f, ROOT_DIR).replace('\\', '/'): issues for f, issues in sorted(report.items())}
+    with open(path, 'w') as fh:
+        json.dump(payload, fh, indent=2)
+
+    n_err = sum(any(i['level'] == 'error' for i in issues) for issues in report.values())
+    if report:
+        print(f"   ⚠️ Schema drift in {len(report)} files ({n_err} skipped). See schema_report.json")
+    for f, issues in sorted(report.items()):
+        for i in issues:
+            print(f"     [{i['level']}] {os.path.basename(f)}: {i['msg']}")
+
+
+def _ingest_shard_task(args):
+    # Top-level wrapper so the pool can pickle it (Windows uses spawn)
+    return ingest_shard(*args)
+
 
-    print(f"   found {len(enrol_files)} Enrolment files")
-    print(f"   found {len(bio_files)} Biometric files")
-    print(f"   found {len(demo_files)} Demographic files")
+def map_shards(shards, workers, chunk_rows=None, memory_budget_mb=None):
+    """Fans shards out to a process pool; each worker returns (compact partial cube or None, issues)."""
+    from concurrent.futures import ProcessPoolExecutor
 
+    tasks = [(f, feed, chunk_rows, memory_budget_mb) for f, feed in shards]
+    if workers <= 1 or len(tasks) <= 1:
+        return [_ingest_shard_task(t) for t in tasks]
+    # Per-file steps run inside the workers and are not collected; time the whole fan-out
+    with profiler.step("map_shards", shards=len(tasks), workers=workers), ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # map() keeps shard order, so the reduction is deterministic
+        return list(pool.map(_ingest_shard_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+
+def parallel_shards(shards, workers, chunk_rows=None, memory_budget_mb=None, report=None):
+    partials = collect_issues(shards, map_shards(shards, workers, chunk_rows, memory_budget_mb),
+                              report if report is not None else {})
+    with profiler.step("tree_reduce", partials=len(partials)):
+        return finalize_cube(tree_reduce([p for p in partials if p is not None]))
+
+
+def incremental_shards(shards, workers=1, chunk_rows=None, memory_budget_mb=None, report=None):
+    """
+    Updates the persisted total cube: + partials of new/changed shards, - partials of
+    changed/removed ones. Each partial carries an `n_shards` column so keys that no
+    shard contributes to anymore drop out exactly as in a full rebuild.
+    """
+    os.makedirs(STATE_DIR, exist_ok=True)
+    manifest = shard_manifest.load_manifest(STATE_DIR)
+    total_path = os.path.join(STATE_DIR, "cube_total.pkl")
+
+    total = _load_total(total_path) if manifest['shards'] else None
+    if total is None:
+        if manifest['shards']:
+            print("     ⚠️ Total cube missing. Rebuilding from scratch.")
+        _reset_state(manifest)
+    base_sig = _file_sig(total_path) if total is not None else None
+
+    unchanged, dirty, removed = shard_manifest.diff_shards(manifest, shards, ROOT_DIR)
+    # Every stale partial must be retractable, else its rows would stay in the total for good
+    stale = removed + [d[2] for d in dirty if d[2] in manifest['shards']]
+    olds = [shard_manifest.load_partial(STATE_DIR, manifest['shards'][rel]) for rel in stale]
+    if any(old is None for old in olds):
+        n_bad = sum(old is None for old in olds)
+        print(f"     ⚠️ {n_bad} partials to retract are missing/unreadable. Rebuilding from scratch.")
+        _reset_state(manifest)
+        total, base_sig, stale, olds = None, None, [], []
+        unchanged, dirty, removed = shard_manifest.diff_shards(manifest, shards, ROOT_DIR)
+    print(f"     {len(unchanged)} unchanged, {len(dirty)} new/changed, {len(removed)} removed shards")
+    if report is not None:
+        # Drift found when an unchanged shard was first parsed still belongs in the report
+        for f, _ in shards:
+            rel = os.path.relpath(f, ROOT_DIR).replace('\\', '/')
+            if rel in unchanged and manifest['shards'][rel].get('issues'):
+                report[f] = manifest['shards'][rel]['issues']
+
+    # 1. Retract stale partials (changed + removed)
+    retract = []
+    for rel, old in zip(stale, olds):
+        retract.append(-old)
+        shard_manifest.drop_partial(STATE_DIR, manifest['shards'].pop(rel))
+
+    # 2. Parse only the dirty shards
+    fresh = []
+    results = map_shards([(f, feed) for f, feed, _, _ in dirty], workers, chunk_rows, memory_budget_mb)
+    for (f, feed, rel, sig), (part, issues) in zip(dirty, results):
+        sig['issues'] = issues
+        if report is not None and issues:
+            report[f] = issues
+        if part is None:
+            continue # Unreadable: not recorded, so it is retried next run
+        part = part.copy()
+        part['n_shards'] = 1
+        sig['partial'] = shard_manifest.save_partial(STATE_DIR, rel, part)
+        manifest['shards'][rel] = sig
+        fresh.append(part)
+
+    # 3. Fold deltas into the running total
+    deltas = ([total] if total is not None else []) + retract + fresh
+    total = tree_reduce(deltas)
+    if total is not None:
+        total = total[total['n_shards'] > 0]
+        total.to_pickle(total_path + ".tmp")
+        os.replace(total_path + ".tmp", total_path)
+    elif os.path.exists(total_path):
+        os.remove(total_path)
+
+    # 4. Month x age-band cube: the same deltas, so unchanged shards are never re-read
+    with profiler.step("uli_cube") as meta:
+        meta['action'] = uli_cube.update(retract + fresh, total, base_sig, _file_sig(total_path), uli_cube.CUBE_DIR)
+
+    shard_manifest.save_manifest(STATE_DIR, manifest)
+    return finalize_cube(total)
+
+
+def _load_total(path):
+    try:
+        return pd.read_pickle(path)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def _reset_state(manifest):
+    """Forgets every shard (and its partial) so the next pass re-aggregates all of them."""
+    manifest['shards'] = {}
+    shard_manifest.clear_partials(STATE_DIR)
+
+
+def _file_sig(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime]
+
+
+def add_cubes(*cubes):
+    """Elementwise sum of (date, pincode) cubes (outer join on keys, missing = 0)."""
+    return pd.concat(cubes).groupby(level=['date', 'pincode'], dropna=False).sum()
+
+
+def tree_reduce(partials, fan_in=8):
+    """Combines partial cubes level by level (fan_in at a time) instead of one long left fold."""
+    if not partials:
+        return None
+    while len(partials) > 1:
+        partials = [add_cubes(*partials[i:i + fan_in]) for i in range(0, len(partials), fan_in)]
+    return partials[0]
+
+
+def finalize_cube(df_cube):
+    """
+    Normalizes a reduced cube to int64 (feed, age band) columns plus their enrol/update totals
+    (empty cube if nothing was read).
+    """
+    if df_cube is None:
+        return pd.DataFrame(columns=CUBE_COLS,
+                            index=pd.MultiIndex.from_tuples([], names=['date', 'pincode']))
+    bands = [c for c in BAND_COLUMNS if c in df_cube.columns]
+    df_cube = df_cube[bands].fillna(0).astype('int64')
+    for target in CUBE_COLS:
+        cols = [c for c in bands if FEEDS[feed_of(c)]['target'] == target]
+        df_cube[target] = df_cube[cols].sum(axis=1) if cols else np.int64(0)
+    return df_cube
+
+
+def write_outputs(df_cube, uli=True):
+    """Derives date and pincode totals from the cube and writes the master tables (+ the ULI cube)."""
     # --- 1. Time Series Aggregation (For ARIMA) ---
-    print("   ⏳ Building Time Series Data...")
-    
-    daily_stats = {} # date -> {enrol:0, update:0}
-
-    def process_time(file_list, type_key):
-        for f in file_list:
-            try:
-                # Read chunks, assuming 'date' column exists. Sum counts.
-                # Inspect columns dynamically
-                df = pd.read_csv(f, usecols=lambda c: 'date' in c.lower() or 'count' in c.lower() or 'age' in c.lower())
-                
-                # Normalize columns
-                df.columns = [c.lower() for c in df.columns]
-                
-                if 'date' not in df.columns: 
-                    # Try parsing filename date if inside? Unlikely. Skip.
-                    continue
-
-                # Identify Count Columns (all numeric except date/pincode)
-                count_cols = [c for c in df.columns if c not in ['date', 'pincode', 'state', 'district']]
-                
-                # Group by Date
-                grouped = df.groupby('date')[count_cols].sum().sum(axis=1) # Sum all age buckets
-                
-                for date, count in grouped.items():
-                    if date not in daily_stats: daily_stats[date] = {'enrol': 0, 'update': 0}
-                    key = 'enrol' if type_key == 'enrol' else 'update'
-                    daily_stats[date][key] += count
-                    
-            except Exception as e:
-                print(f"     Skipping {os.path.basename(f)}: {e}")
-
-    process_time(enrol_files, 'enrol')
-    process_time(bio_files, 'update') # Bio is update
-    process_time(demo_files, 'update') # Demo is update
-
-    ts_data = []
-    for date, val in daily_stats.items():
-        ts_data.append({'date': date, 'enrolment_count': val['enrol'], 'update_count': val['update']})
-    
-    df_ts = pd.DataFrame(ts_data)
-    df_ts.to_csv(os.path.join(OUT_DIR, "master_time_series.csv"), index=False)
+    daily = df_cube[CUBE_COLS].groupby(level='date').sum()
+    df_ts = pd.DataFrame({'date': daily.index.strftime(DATE_FORMAT),
+                          'enrolment_count': daily['enrol'].values,
+                          'update_count': daily['update'].values})
+    save_table(df_ts, os.path.join(OUT_DIR, "master_time_series.csv"))
     print("   ✅ Saved master_time_series.csv")
 
     # --- 2. Pincode Risk Aggregation (For Map/K-Means) ---
-    print("   🌍 Building Pincode Risk Data...")
-    
-    pin_stats = {} # pin -> {enrol:0, update:0}
-
-    def process_pin(file_list, type_key):
-        for f in file_list:
-            try:
-                df = pd.read_csv(f, usecols=lambda c: 'pincode' in c.lower() or 'count' in c.lower() or 'age' in c.lower())
-                df.columns = [c.lower() for c in df.columns]
-                
-                if 'pincode' not in df.columns: continue
-
-                count_cols = [c for c in df.columns if c not in ['date', 'pincode', 'state', 'district']]
-                
-                # Group by Pincode
-                grouped = df.groupby('pincode')[count_cols].sum().sum(axis=1)
-                
-                for pin, count in grouped.items():
-                    if pin not in pin_stats: pin_stats[pin] = {'enrol': 0, 'update': 0}
-                    key = 'enrol' if type_key == 'enrol' else 'update'
-                    pin_stats[pin][key] += count
-            except: pass
-
-    process_pin(enrol_files, 'enrol')
-    process_pin(bio_files, 'update')
-    process_pin(demo_files, 'update')
-
-    pin_data = []
-    for pin, val in pin_stats.items():
-        pin_data.append({'Pincode': pin, 'Enrolment_Count': val['enrol'], 'Update_Count': val['update']})
-        
-    df_pin = pd.DataFrame(pin_data)
-    df_pin.to_csv(os.path.join(OUT_DIR, "master_pincode_risk.csv"), index=False)
+    pins = df_cube[CUBE_COLS].groupby(level='pincode').sum()
+    df_pin = pd.DataFrame({'Pincode': pins.index.astype('int64'),
+                           'Enrolment_Count': pins['enrol'].values,
+                           'Update_Count': pins['update'].values})
+    save_table(df_pin, os.path.join(OUT_DIR, "master_pincode_risk.csv"))
     print("   ✅ Saved master_pincode_risk.csv")
 
+    # --- 3. Combined (Date x Pincode) Cube ---
+    cube = df_cube[CUBE_COLS].reset_index().dropna(subset=['date', 'pincode'])
+    cube['date'] = cube['date'].dt.strftime(DATE_FORMAT)
+    cube['pincode'] = cube['pincode'].astype('int64')
+    cube.columns = ['date', 'Pincode', 'enrolment_count', 'update_count']
+    save_table(cube, os.path.join(OUT_DIR, "master_cube.csv"))
+    print("   ✅ Saved master_cube.csv")
+
+    # --- 4. (Pincode x Month x Age Band x Feed) ULI Cube ---
+    if uli:
+        counts, axes = uli_cube.build(df_cube)
+        uli_cube.save(counts, axes, uli_cube.CUBE_DIR)
+        print(f"   ✅ Saved uli_cube ({counts.shape[0]} pincodes x {counts.shape[1]} months)")
+
 if __name__ == "__main__":
     aggregate_data()
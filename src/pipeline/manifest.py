@@ -0,0 +1,117 @@
+"""
+Shard Manifest (Incremental Ingestion State)
+Remembers which OGD shards were already aggregated, and keeps each shard's
+partial (date, pincode) cube on disk so reruns only touch new/changed files.
+Layout (under data/ingest_state/):
+1. manifest.json -> relpath -> {size, mtime, sha1, feed, partial, issues}
+2. cube_total.pkl -> running sum of all partials
+3. partials/*.pkl -> one partial cube per shard
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+import pandas as pd
+
+MANIFEST_VERSION = 3 # v3: partials keep one column per (feed, age band)
+
+
+def sha1_file(path, block_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(state_dir):
+    path = os.path.join(state_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'shards': {}}
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            print("     ⚠️ Manifest version changed. Rebuilding from scratch.")
+            return {'version': MANIFEST_VERSION, 'shards': {}}
+        return manifest
+    except (OSError, ValueError) as e:
+        print(f"     ⚠️ Unreadable manifest ({e}). Rebuilding from scratch.")
+        return {'version': MANIFEST_VERSION, 'shards': {}}
+
+
+def save_manifest(state_dir, manifest):
+    # Write-then-rename so a crash never leaves a half-written manifest
+    path = os.path.join(state_dir, "manifest.json")
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def diff_shards(manifest, shards, root_dir):
+    """
+    Classifies current shards against the manifest.
+    Size+mtime match -> unchanged (no hashing). Otherwise the content hash decides,
+    so a touched-but-identical file is not reprocessed.
+    Returns (unchanged, dirty, removed): dirty = [(f, feed, rel, sig)], removed = [rel].
+    """
+    known = manifest['shards']
+    unchanged, dirty = [], []
+    seen = set()
+
+    for f, feed in shards:
+        rel = os.path.relpath(f, root_dir).replace('\\', '/')
+        seen.add(rel)
+        st = os.stat(f)
+        sig = {'size': st.st_size, 'mtime': st.st_mtime, 'feed': feed}
+        entry = known.get(rel)
+
+        if entry and entry['feed'] == feed and entry['size'] == sig['size'] and entry['mtime'] == sig['mtime']:
+            unchanged.append(rel)
+            continue
+
+        sig['sha1'] = sha1_file(f)
+        if entry and entry['feed'] == feed and entry.get('sha1') == sig['sha1']:
+            entry['mtime'] = sig['mtime'] # Same bytes, just touched
+            unchanged.append(rel)
+        else:
+            dirty.append((f, feed, rel, sig))
+
+    removed = [rel for rel in known if rel not in seen]
+    return unchanged, dirty, removed
+
+
+def partial_path(state_dir, rel):
+    name = hashlib.sha1(rel.encode('utf-8')).hexdigest()[:16] + ".pkl"
+    return os.path.join(state_dir, "partials", name)
+
+
+def load_partial(state_dir, entry):
+    """A shard's stored partial cube, or None if it is missing or unreadable."""
+    path = os.path.join(state_dir, "partials", entry['partial'])
+    try:
+        return pd.read_pickle(path)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def save_partial(state_dir, rel, cube):
+    path = partial_path(state_dir, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cube.to_pickle(path)
+    return os.path.basename(path)
+
+
+def drop_partial(state_dir, entry):
+    path = os.path.join(state_dir, "partials", entry['partial'])
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def clear_partials(state_dir):
+    # Used when the running total is discarded: every partial is rebuilt, so none may linger
+    shutil.rmtree(os.path.join(state_dir, "partials"), ignore_errors=True)
@@ -0,0 +1,256 @@
+"""
+Pipeline Orchestrator (Single Entry Point)
+Runs every stage as one dependency DAG instead of separate __main__ scripts:
+    ingestion -> zero_day -> optimizer -> route_planner / visuals (figures + dashboard) / tile_pyramid (map)
+              \\-> time_machine (runs alongside zero_day -> optimizer)
+Each stage declares its inputs and outputs (read from the stage module's CONFIG paths).
+1. Skip: a stage whose code, kwargs and input contents are unchanged since its last
+   successful run (and whose outputs are still in place) is skipped. Code = the stage
+   module plus every in-repo module it imports, transitively (code_deps.py; 'code' adds
+   modules a stage imports dynamically). Fingerprints live in data/pipeline_state.json;
+   files are only re-hashed when their size/mtime moved.
+2. Parallel: stages whose dependencies are done run concurrently on a thread pool.
+   Stages that share a non-thread-safe resource (matplotlib) run one at a time.
+   Process pools inside stages use the 'spawn' start method (no fork() of this threaded process).
+3. In-memory: tables saved by one stage are served to later stages from memory
+   (store.share_frames) instead of being re-read from disk.
+4. Report: every run writes a per-stage / per-step timing report (see profiler.py);
+   --profile adds a cProfile per stage and tracemalloc peaks (stages then run one at a time).
+Usage: python orchestrator.py [stage ...] [--force] [--dry-run] [--profile]
+"""
+
+import functools
+import glob
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+os.environ.setdefault('MPLBACKEND', 'Agg') # Stages run off the main thread: no GUI backend
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.code_deps import SRC_DIR, code_files
+from pipeline.manifest import sha1_file
+from pipeline.schema import FEEDS
+from pipeline.store import share_frames
+
+# CONFIG
+STATE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\pipeline_state.json"
+WORKERS = 4                   # Stages running at once
+STATE_VERSION = 2            # v2: stage keys cover imported in-repo modules
+
+
+def _feed_files(m):
+    return sorted(f for spec in FEEDS.values()
+                  for f in glob.glob(os.path.join(m.ROOT_DIR, spec['dir'], "**", "*.csv"), recursive=True))
+
+
+def _in_dir(dir_attr, *names):
+    # dir_attr may be dotted ('uli_cube.CUBE_DIR') to follow a path owned by an imported module
+    return lambda m: [os.path.join(functools.reduce(getattr, dir_attr.split('.'), m), n) for n in names]
+
+
+# inputs / outputs: lists of module attribute names (CONFIG paths) or callables(module) -> [paths]
+# code (optional): callables(module) -> [module names] the stage imports at run time (importlib)
+STAGES = [
+    {'name': 'ingestion', 'module': 'pipeline.ingestion', 'func': 'aggregate_data', 'deps': [],
+     'inputs': [_feed_files],
+     'outputs': [_in_dir('OUT_DIR', 'master_time_series.csv', 'master_pincode_risk.csv', 'master_cube.csv'),
+                 _in_dir('uli_cube.CUBE_DIR', 'counts.npy', 'axes.json')]},
+    {'name': 'zero_day', 'module': 'pipeline.zero_day', 'func': 'zero_day_cleaner', 'deps': ['ingestion'],
+     'inputs': ['INPUT_FILE', _in_dir('uli_cube.CUBE_DIR', 'counts.npy')], 'outputs': ['OUTPUT_FILE']},
+    {'name': 'time_machine', 'module': 'engines.time_machine', 'func': 'run_time_machine', 'deps': ['ingestion'],
+     'inputs': ['INPUT_FILE'], 'outputs': ['OUTPUT_FILE']},
+    {'name': 'hierarchy_forecast', 'module': 'engines.time_machine', 'func': 'run_hierarchical_forecast',
+     'deps': ['ingestion', 'zero_day'], 'inputs': ['CUBE_FILE', 'TABLE_FILE'], 'outputs': ['HIERARCHY_FILE']},
+    {'name': 'optimizer', 'module': 'engines.optimizer', 'func': 'run_route_optimizer', 'deps': ['zero_day'],
+     'inputs': ['INPUT_FILE'], 'outputs': ['OUTPUT_FILE']},
+    {'name': 'route_planner', 'module': 'engines.route_planner', 'func': 'run_route_planner', 'deps': ['optimizer'],
+     'inputs': ['INPUT_FILE', lambda m: [sys.modules['engines.optimizer'].INPUT_FILE]], 'outputs': ['OUTPUT_FILE']},
+    {'name': 'spatial_index', 'module': 'engines.spatial_index', 'func': 'run_spatial_index', 'deps': ['zero_day'],
+     'inputs': ['MASTER_FILE'], 'outputs': [_in_dir('INDEX_DIR', 'spatial_index.json')]},
+    {'name': 'tile_pyramid', 'module': 'engines.tile_pyramid', 'func': 'run_tile_pyramid',
+     'deps': ['zero_day', 'optimizer'], 'inputs': ['MASTER_FILE', 'CLUSTERS_FILE'],
+     'outputs': [_in_dir('TILE_DIR', 'index.json', 'routes.geojson')]},
+    {'name': 'visuals', 'module': 'visuals.run_visuals', 'func': 'run_visuals', 'deps': ['zero_day', 'optimizer'],
+     'inputs': ['DATA_FILE', 'CLUSTERS_FILE', 'TEMPLATE_FILE'], 'code': [lambda m: [f['module'] for f in m.FIGURES]],
+     'outputs': [lambda m: [p for fig in m.FIGURES for p in m.output_paths(fig)]], 'resource': 'matplotlib'},
+]
+
+
+def _paths(spec, key, module):
+    out = []
+    for item in spec[key]:
+        out += item(module) if callable(item) else [getattr(module, item)]
+    return out
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {'version': STATE_VERSION, 'files': {}, 'stages': {}}
+    try:
+        with open(STATE_FILE, 'r') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    print("     ⚠️ Unreadable pipeline state. Running every stage.")
+    return {'version': STATE_VERSION, 'files': {}, 'stages': {}}
+
+
+def save_state(state):
+    # Write-then-rename so a crash never leaves a half-written state file
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE + ".tmp", 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+
+
+def content_hash(path, state):
+    """sha1 of a file, memoized on (size, mtime) so unchanged files are never re-read."""
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    memo = state['files'].get(path)
+    if memo and memo['size'] == st.st_size and memo['mtime'] == st.st_mtime:
+        return memo['sha1']
+    digest = sha1_file(path)
+    state['files'][path] = {'size': st.st_size, 'mtime': st.st_mtime, 'sha1': digest}
+    return digest
+
+
+def _output_sigs(paths):
+    return {p: [os.stat(p).st_size, os.stat(p).st_mtime] if os.path.exists(p) else None for p in paths}
+
+
+def stage_key(spec, module, kwargs, state):
+    """Fingerprint of everything that determines a stage's outputs: code, kwargs and input contents."""
+    h = hashlib.sha1()
+    extra = [n for item in spec.get('code', []) for n in item(module)]
+    for path in code_files([spec['module']] + extra):
+        h.update(f"{os.path.relpath(path, SRC_DIR)}={content_hash(path, state)}".encode())
+    h.update(json.dumps(kwargs, sort_keys=True, default=str).encode())
+    for path in _paths(spec, 'inputs', module):
+        h.update(f"{path}={content_hash(path, state)}".encode())
+    return h.hexdigest()
+
+
+def select_stages(targets=None):
+    """Targets plus everything upstream of them (all stages if None)."""
+    by_name = {s['name']: s for s in STAGES}
+    if not targets:
+        return list(by_name)
+    unknown = [t for t in targets if t not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {unknown}. Known: {list(by_name)}")
+    wanted, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack += by_name[name]['deps']
+    return [s['name'] for s in STAGES if s['name'] in wanted]
+
+
+def _run_stage(name, func, kwargs):
+    t0 = time.perf_counter()
+    with profiler.stage(name):
+        func(**kwargs)
+    return time.perf_counter() - t0
+
+
+def run_pipeline(targets=None, force=False, workers=WORKERS, stage_kwargs=None, dry_run=False, profile=False):
+    """
+    Runs the selected stages (and their upstream stages) in dependency order.
+    force: True or a list of stage names to run even if unchanged.
+    stage_kwargs: {stage: {kwarg: value}} passed to the stage functions (part of the fingerprint).
+    profile: dump a cProfile per stage and track Python-heap peaks (runs stages one at a time,
+    since cProfile and tracemalloc cannot tell concurrent stages apart).
+    Returns {stage: "ran" | "skipped" | "failed" | "blocked"}.
+    """
+    print("🚀 [Pipeline] Starting Orchestrated Run...")
+    names = select_stages(targets)
+    specs = {s['name']: s for s in STAGES if s['name'] in names}
+    stage_kwargs = stage_kwargs or {}
+    state = load_state()
+    modules = {n: importlib.import_module(specs[n]['module']) for n in names}
+    profiler.start_run(profile=profile)
+    if profile and workers > 1:
+        print("   🔬 Profile mode: running stages one at a time.")
+        workers = 1
+
+    status, busy, running = {}, set(), {}
+    pending = list(names)
+    with share_frames(), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            for name in list(pending):
+                spec = specs[name]
+                deps = [d for d in spec['deps'] if d in specs]
+                if any(status.get(d) in ("failed", "blocked") for d in deps):
+                    status[name] = "blocked"
+                    pending.remove(name)
+                    print(f"   ⛔ {name}: blocked by a failed upstream stage")
+                    continue
+                if not all(status.get(d) in ("ran", "skipped") for d in deps):
+                    continue
+                if spec.get('resource') in busy:
+                    continue
+
+                # Inputs are final now (all upstream stages are done): fingerprint them
+                module, kwargs = modules[name], stage_kwargs.get(name, {})
+                key = stage_key(spec, module, kwargs, state)
+                outputs = _paths(spec, 'outputs', module)
+                prev = state['stages'].get(name, {})
+                forced = force is True or (force and name in force)
+                if not forced and prev.get('key') == key and prev.get('outputs') == _output_sigs(outputs):
+                    status[name] = "skipped"
+                    pending.remove(name)
+                    print(f"   ⏭️ {name}: unchanged, skipped")
+                    continue
+                pending.remove(name)
+                if dry_run:
+                    status[name] = "ran"
+                    print(f"   📝 {name}: would run")
+                    continue
+                print(f"   ▶️ {name}: running")
+                if spec.get('resource'):
+                    busy.add(spec['resource'])
+                running[pool.submit(_run_stage, name, getattr(module, spec['func']), kwargs)] = (name, key, outputs)
+
+            if not running:
+                if pending: # Nothing runnable and nothing running: only a dependency cycle gets here
+                    raise RuntimeError(f"Stages cannot be scheduled: {pending}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, key, outputs = running.pop(fut)
+                busy.discard(specs[name].get('resource'))
+                try:
+                    seconds = fut.result()
+                except BaseException as e: # Stages sys.exit(1) on missing inputs
+                    status[name] = "failed"
+                    state['stages'].pop(name, None)
+                    print(f"   ❌ {name}: failed ({type(e).__name__}: {e})")
+                    continue
+                status[name] = "ran"
+                state['stages'][name] = {'key': key, 'outputs': _output_sigs(outputs), 'seconds': round(seconds, 2)}
+                save_state(state)
+                print(f"   ✅ {name}: done in {seconds:.1f}s")
+
+    save_state(state)
+    summary = ", ".join(f"{sum(v == k for v in status.values())} {k}" for k in ("ran", "skipped", "failed", "blocked"))
+    print(f"   🏁 Pipeline finished: {summary}")
+    if not dry_run:
+        profiler.write_report(status, {'targets': names, 'workers': workers, 'force': force, 'stage_kwargs': stage_kwargs})
+    return status
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    run_pipeline(targets=args or None, force="--force" in sys.argv, dry_run="--dry-run" in sys.argv,
+                 profile="--profile" in sys.argv)
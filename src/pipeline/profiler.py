@@ -0,0 +1,222 @@
+"""
+Run Profiler (Stage / Step Timers, Memory Peaks, Run Reports)
+Instrumentation shared by every stage:
+    with profiler.step("kmeans.fit", n=len(coord)) as meta:
+        ...
+        meta['iterations'] = model.n_iter_
+Each step records wall time, CPU time (of its own thread), the process peak RSS and,
+in profile mode, the extra Python heap the step needed at its peak (tracemalloc).
+Steps nest per thread, so a step opened inside a stage is reported as "optimizer/kmeans.fit".
+The orchestrator wraps every stage in profiler.stage() and writes one report per run
+under data/outputs/run_reports/:
+1. run_<id>.json -> run metadata, stage status, per-step totals and the raw step records.
+2. run_<id>.csv  -> one row per step call (for capacity dashboards / regression checks).
+Profile mode (start_run(profile=True)) also dumps a cProfile per stage
+(run_<id>/<stage>.prof + a top-N .txt) and turns on tracemalloc.
+Steps inside process-pool workers are not collected; the step around the pool is.
+"""
+
+import cProfile
+import csv
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# CONFIG
+REPORT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\run_reports"
+TOP_FUNCTIONS = 30            # Rows in each stage's cProfile text summary
+REPORT_VERSION = 1
+
+CSV_FIELDS = ['run_id', 'stage', 'path', 'step', 'depth', 'thread', 'status',
+              'start_s', 'wall_s', 'cpu_s', 'rss_peak_mb', 'py_peak_mb', 'meta']
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_RUN = {'id': None, 'started': None, 't0': time.perf_counter(), 'profile': False, 'records': []}
+
+
+def start_run(profile=False):
+    """Clears collected steps and starts a new run id. profile=True: cProfile + tracemalloc."""
+    with _LOCK:
+        _RUN.update(id=datetime.now().strftime("%Y%m%d_%H%M%S"), started=datetime.now().isoformat(timespec='seconds'),
+                    t0=time.perf_counter(), profile=profile, records=[])
+    if profile and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _RUN['own_tracing'] = True
+    elif not profile and _RUN.get('own_tracing'):
+        tracemalloc.stop() # Left on by an earlier profile run
+        _RUN['own_tracing'] = False
+    return _RUN['id']
+
+
+def _stack():
+    if not hasattr(_LOCAL, 'stack'):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+def rss_peak_mb():
+    """Peak resident set size of this process so far (None where the OS gives no cheap answer)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1) # bytes on macOS, KiB on Linux
+    except ImportError:
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                       [(n, ctypes.c_size_t) for n in ('PeakWorkingSetSize', 'WorkingSetSize',
+                                                        'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                                                        'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                                                        'PagefileUsage', 'PeakPagefileUsage')]
+        c = Counters()
+        c.cb = ctypes.sizeof(c)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(c), c.cb):
+            return round(c.PeakWorkingSetSize / (1024 * 1024), 1)
+    return None
+
+
+@contextmanager
+def step(name, **meta):
+    """Times the block as one step under whatever step/stage is open on this thread. Yields its meta dict."""
+    stack = _stack()
+    tracing = tracemalloc.is_tracing()
+    frame = {'name': name, 'peak': 0, 'base': 0}
+    if tracing:
+        # The peak so far belongs to the enclosing step; measure this one from here
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['base'] = current
+    stack.append(frame)
+    status = "ok"
+    t0, c0 = time.perf_counter(), time.thread_time()
+    try:
+        yield meta
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - t0, time.thread_time() - c0
+        path = "/".join(f['name'] for f in stack)
+        stack.pop()
+        py_peak = None
+        if tracing and tracemalloc.is_tracing():
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            py_peak = round((peak - frame['base']) / (1024 * 1024), 2)
+        record = {
+            'run_id': _RUN['id'],
+            'stage': path.split("/")[0],
+            'path': path,
+            'step': name,
+            'depth': len(stack),
+            'thread': threading.current_thread().name,
+            'status': status,
+            'start_s': round(t0 - _RUN['t0'], 4),
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'rss_peak_mb': rss_peak_mb(),
+            'py_peak_mb': py_peak,
+            'meta': meta,
+        }
+        with _LOCK:
+            _RUN['records'].append(record)
+
+
+@contextmanager
+def stage(name):
+    """A top-level step for one pipeline stage; in profile mode also dumps its cProfile."""
+    prof = cProfile.Profile() if _RUN['profile'] else None
+    with step(name) as meta:
+        if prof is None:
+            yield meta
+            return
+        prof.enable()
+        try:
+            yield meta
+        finally:
+            prof.disable()
+            meta['profile'] = _dump_profile(prof, name)
+
+
+def _dump_profile(prof, name):
+    out_dir = os.path.join(REPORT_DIR, f"run_{_RUN['id']}")
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{name}.prof")
+    prof.dump_stats(path)
+    with open(os.path.join(out_dir, f"{name}.txt"), 'w') as f:
+        pstats.Stats(prof, stream=f).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    return path
+
+
+def records():
+    with _LOCK:
+        return list(_RUN['records'])
+
+
+def summarize(rows=None):
+    """Per-path totals: calls, wall/cpu seconds, max RSS and Python-heap peaks (sorted by wall time)."""
+    totals = {}
+    for r in rows if rows is not None else records():
+        t = totals.setdefault(r['path'], {'path': r['path'], 'stage': r['stage'], 'depth': r['depth'],
+                                          'calls': 0, 'errors': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                          'rss_peak_mb': None, 'py_peak_mb': None})
+        t['calls'] += 1
+        t['errors'] += r['status'] != "ok"
+        t['wall_s'] = round(t['wall_s'] + r['wall_s'], 4)
+        t['cpu_s'] = round(t['cpu_s'] + r['cpu_s'], 4)
+        for key in ('rss_peak_mb', 'py_peak_mb'):
+            if r[key] is not None:
+                t[key] = r[key] if t[key] is None else max(t[key], r[key])
+    return sorted(totals.values(), key=lambda t: -t['wall_s'])
+
+
+def write_report(status=None, settings=None, report_dir=None):
+    """Writes run_<id>.json + run_<id>.csv for the current run and prints the slowest steps."""
+    report_dir = report_dir or REPORT_DIR
+    os.makedirs(report_dir, exist_ok=True)
+    rows = sorted(records(), key=lambda r: r['start_s'])
+    steps = summarize(rows)
+    report = {
+        'version': REPORT_VERSION,
+        'run_id': _RUN['id'],
+        'started': _RUN['started'],
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        'wall_s': round(time.perf_counter() - _RUN['t0'], 3),
+        'profile': _RUN['profile'],
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'settings': settings or {},
+        'stage_status': status or {},
+        'stages': [s for s in steps if s['depth'] == 0],
+        'steps': steps,
+        'records': rows,
+    }
+    base = os.path.join(report_dir, f"run_{_RUN['id']}")
+    with open(base + ".json", 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    with open(base + ".csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for r in rows:
+            writer.writerow({**r, 'meta': json.dumps(r['meta'], default=str) if r['meta'] else ""})
+
+    print(f"   📊 Run report: {base}.json ({len(rows)} step records)")
+    for s in [s for s in steps if s['depth'] > 0][:5]:
+        print(f"     {s['path']:<45} {s['wall_s']:>8.2f}s x{s['calls']}")
+    return base + ".json"
@@ -0,0 +1,131 @@
+"""
+Feed Schema Registry (Ingestion Layer)
+Declares the expected columns and compact dtypes of each OGD feed so that
+read_csv never has to infer types:
+    pincode -> Int32, counts -> UInt32 (nullable, so a blank cell is reported
+    and counted as 0 instead of failing the whole shard; narrowed to uint32 after),
+    date -> parsed once per distinct value with a fixed format.
+state/district are not read: every aggregate is keyed by (date, pincode).
+plan_columns() turns a file header into a read plan and lists any drift
+(missing/unknown columns) so it is reported instead of silently skipped.
+Each count column maps to an age band (AGE_BANDS); reduced frames keep one
+"<feed>_<band>" column per band instead of one summed count.
+"""
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = '%d-%m-%Y'
+COUNT_DTYPE = 'UInt32'  # Read dtype; reduce_frame() fills NA and narrows to uint32
+
+AGE_BANDS = ['0_5', '5_17', 'adult', 'other'] # 'other': unregistered age/count columns
+
+KEY_DTYPES = {
+    'date': 'category',       # Few distinct days per shard -> parse categories, not rows
+    'pincode': 'Int32',       # Nullable: rows without a pincode still count towards date totals
+}
+
+# Known non-count columns (never summed even if their names look like counts)
+TEXT_COLUMNS = ('state', 'district')
+
+FEEDS = {
+    'enrol': {
+        'label': 'Enrolment',
+        'dir': 'api_data_aadhar_enrolment',
+        'target': 'enrol',
+        'counts': ['age_0_5', 'age_5_17', 'age_18_greater'],
+        'bands': {'age_0_5': '0_5', 'age_5_17': '5_17', 'age_18_greater': 'adult'},
+    },
+    'bio': {
+        'label': 'Biometric',
+        'dir': 'api_data_aadhar_biometric',
+        'target': 'update',
+        'counts': ['bio_age_5_17', 'bio_age_17_'],
+        'bands': {'bio_age_5_17': '5_17', 'bio_age_17_': 'adult'},
+    },
+    'demo': {
+        'label': 'Demographic',
+        'dir': 'api_data_aadhar_demographic',
+        'target': 'update',
+        'counts': ['demo_age_5_17', 'demo_age_17_'],
+        'bands': {'demo_age_5_17': '5_17', 'demo_age_17_': 'adult'},
+    },
+}
+
+
+def is_count_column(c):
+    return 'age' in c or 'count' in c
+
+
+def band_column(feed, band):
+    return f"{feed}_{band}"
+
+
+# Every (feed, band) column a reduced frame can carry, in cube order
+BAND_COLUMNS = [band_column(feed, band) for feed in FEEDS for band in AGE_BANDS]
+
+
+def feed_of(column):
+    return column.split('_', 1)[0]
+
+
+def plan_columns(header, feed, keys=('date', 'pincode')):
+    """
+    Builds a read plan for one file from its header.
+    Returns (plan, issues): plan = {'usecols', 'dtype', 'rename', 'counts', 'bands', 'keys'} or None
+    if the file cannot be aggregated; issues = [{'level', 'msg'}].
+    """
+    spec = FEEDS[feed]
+    lower = {c.lower(): c for c in header}
+    issues = []
+
+    for key in keys:
+        if key not in lower:
+            issues.append({'level': 'warning', 'msg': f"missing key column '{key}'"})
+    present_keys = [k for k in keys if k in lower]
+    if not present_keys:
+        issues.append({'level': 'error', 'msg': "no usable key columns"})
+        return None, issues
+
+    counts = [c for c in spec['counts'] if c in lower]
+    missing = [c for c in spec['counts'] if c not in lower]
+    if missing:
+        issues.append({'level': 'warning', 'msg': f"missing count columns {missing}"})
+
+    # Unknown age/count-like columns are still summed (as before) but reported
+    extra = [c for c in lower if c not in spec['counts'] and c not in KEY_DTYPES
+             and c not in TEXT_COLUMNS and is_count_column(c)]
+    if extra:
+        issues.append({'level': 'warning', 'msg': f"unregistered count columns {extra} (included)"})
+        counts += extra
+
+    if not counts:
+        issues.append({'level': 'error', 'msg': "no count columns"})
+        return None, issues
+
+    cols = present_keys + counts
+    plan = {
+        'usecols': [lower[c] for c in cols],
+        'dtype': {lower[c]: (KEY_DTYPES[c] if c in KEY_DTYPES else COUNT_DTYPE) for c in cols},
+        'rename': {lower[c]: c for c in cols},
+        'counts': counts,
+        'bands': {c: band_column(feed, spec['bands'].get(c, 'other')) for c in counts},
+        'keys': present_keys,
+    }
+    return plan, issues
+
+
+def parse_dates(col):
+    """
+    Parses a categorical 'DD-MM-YYYY' column by converting only its categories.
+    Returns (datetime64 Series, number of non-empty values that failed to parse).
+    """
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        col = col.astype('category')
+    parsed = pd.to_datetime(col.cat.categories, format=DATE_FORMAT, errors='coerce').values
+    codes = col.cat.codes.to_numpy()
+    if len(parsed) == 0:
+        parsed = np.array(['NaT'], dtype='datetime64[ns]')
+    values = np.where(codes >= 0, parsed.take(np.maximum(codes, 0)), np.datetime64('NaT', 'ns'))
+    n_bad = int(((codes >= 0) & np.isnat(values)).sum())
+    return pd.Series(values, index=col.index, name=col.name), n_bad
@@ -0,0 +1,175 @@
+"""
+Columnar Cache for the Processed Master Tables (Shared Loader)
+Every table written to data/processed/ as CSV also gets a typed column store:
+    master_table.csv -> master_table.cols/{schema.json, <column>.npy}
+Numeric columns are raw .npy arrays (memory-mapped on read, zero-copy).
+String columns are stored as int32 codes + a category list (loaded as pandas Categorical).
+load_table() reads only the requested columns and falls back to the CSV if the
+store is missing or older than the CSV.
+Inside share_frames() (e.g. the orchestrator), tables saved by one stage are served
+to later stages in the same process straight from memory.
+"""
+
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from pipeline import profiler
+
+STORE_SUFFIX = ".cols"
+STORE_VERSION = 1
+
+_SHARED = None # abspath -> (csv size/mtime, DataFrame) while share_frames() is active
+_SHARED_LOCK = threading.Lock()
+
+
+def store_dir(csv_path):
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+def _csv_signature(csv_path):
+    if not os.path.exists(csv_path):
+        return None
+    st = os.stat(csv_path)
+    return (st.st_size, st.st_mtime)
+
+
+@contextmanager
+def share_frames():
+    """Keeps every table saved inside the block in memory for load_table() (same process only)."""
+    global _SHARED
+    with _SHARED_LOCK:
+        outer, _SHARED = _SHARED, ({} if _SHARED is None else _SHARED)
+    try:
+        yield
+    finally:
+        with _SHARED_LOCK:
+            _SHARED = outer
+
+
+def _shared_frame(csv_path, columns):
+    with _SHARED_LOCK:
+        entry = _SHARED.get(os.path.abspath(csv_path)) if _SHARED is not None else None
+    # Only valid while the CSV on disk is still the one this frame was saved as
+    if entry is None or entry[0] != _csv_signature(csv_path):
+        return None
+    df = entry[1]
+    wanted = list(df.columns) if columns is None else list(columns)
+    missing = [c for c in wanted if c not in df.columns]
+    if missing:
+        raise KeyError(f"{missing} not in {os.path.basename(csv_path)}")
+    out = df[wanted].copy()
+    # Same dtypes as the column store (strings come back categorical)
+    for c in out.columns:
+        if out[c].dtype == object:
+            out[c] = out[c].astype('category')
+    return out
+
+
+def save_table(df, csv_path, write_csv=True):
+    """Writes `df` as CSV (for humans/Excel) and as a memory-mappable column store."""
+    if write_csv:
+        with profiler.step("to_csv", table=os.path.basename(csv_path), rows=len(df)):
+            df.to_csv(csv_path, index=False)
+
+    target = store_dir(csv_path)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        fname = f"c{i:03d}.npy"
+        if isinstance(col.dtype, pd.CategoricalDtype) or not (
+                pd.api.types.is_numeric_dtype(col.dtype) or pd.api.types.is_bool_dtype(col.dtype)):
+            cat = col.astype('category')
+            np.save(os.path.join(tmp, fname), cat.cat.codes.to_numpy(dtype=np.int32))
+            columns.append({'name': str(name), 'kind': 'cat', 'file': fname,
+                            'categories': [str(c) for c in cat.cat.categories]})
+        else:
+            np.save(os.path.join(tmp, fname), col.to_numpy())
+            columns.append({'name': str(name), 'kind': 'num', 'file': fname, 'dtype': str(col.dtype)})
+
+    st = os.stat(csv_path) if os.path.exists(csv_path) else None
+    schema = {
+        'version': STORE_VERSION,
+        'rows': int(len(df)),
+        'columns': columns,
+        # Ties the store to the CSV it mirrors; a newer/different CSV wins on load
+        'source_size': st.st_size if st else None,
+        'source_mtime': st.st_mtime if st else None,
+    }
+    with open(os.path.join(tmp, "schema.json"), 'w') as f:
+        json.dump(schema, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+    with _SHARED_LOCK:
+        if _SHARED is not None:
+            _SHARED[os.path.abspath(csv_path)] = (_csv_signature(csv_path), df.copy())
+
+
+def _load_schema(csv_path):
+    path = os.path.join(store_dir(csv_path), "schema.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if schema.get('version') != STORE_VERSION:
+        return None
+    if os.path.exists(csv_path):
+        st = os.stat(csv_path)
+        if schema.get('source_size') != st.st_size or schema.get('source_mtime') != st.st_mtime:
+            return None # Stale: CSV was rewritten by something else
+    return schema
+
+
+def load_table(csv_path, columns=None, dtype=None):
+    """
+    Loads a processed table, preferring the column store.
+    columns: subset to read (None = all). Missing columns raise KeyError like read_csv's usecols.
+    dtype: optional {column: dtype} applied after load (e.g. {'Pincode': str}).
+    """
+    with profiler.step("load_table", table=os.path.basename(csv_path)) as info:
+        if _SHARED is not None:
+            df = _shared_frame(csv_path, columns)
+            if df is not None:
+                info['source'] = "memory"
+                return df.astype({k: v for k, v in dtype.items() if k in df.columns}) if dtype else df
+
+        schema = _load_schema(csv_path)
+        if schema is None:
+            info['source'] = "csv"
+            return pd.read_csv(csv_path, usecols=columns, dtype=dtype)
+
+        by_name = {c['name']: c for c in schema['columns']}
+        wanted = list(by_name) if columns is None else list(columns)
+        missing = [c for c in wanted if c not in by_name]
+        if missing:
+            raise KeyError(f"{missing} not in {os.path.basename(csv_path)}")
+
+        info['source'] = "column_store"
+        data = {}
+        base = store_dir(csv_path)
+        for name in wanted:
+            meta = by_name[name]
+            arr = np.load(os.path.join(base, meta['file']), mmap_mode='r')
+            if meta['kind'] == 'cat':
+                data[name] = pd.Categorical.from_codes(np.asarray(arr), categories=meta['categories'])
+            else:
+                data[name] = arr
+
+        df = pd.DataFrame(data, columns=wanted, copy=False)
+        if dtype:
+            df = df.astype({k: v for k, v in dtype.items() if k in df.columns})
+        return df
@@ -0,0 +1,47 @@
+"""
+Table Diff (Change Detection between two Master Table Snapshots)
+One keyed, vectorized outer merge of the previous and the new table (no per-row loops):
+1. added   -> keys only in the new table
+2. removed -> keys only in the previous table
+3. changed -> keys in both with any compared column different
+   (floats within `atol`, NaN == NaN, strings/categories compared as text)
+Used by the route optimizer to re-optimize only the routes whose pincodes moved.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _differs(old, new, atol):
+    if pd.api.types.is_numeric_dtype(old.dtype) and pd.api.types.is_numeric_dtype(new.dtype):
+        a, b = old.to_numpy(dtype=float), new.to_numpy(dtype=float)
+        both_nan = np.isnan(a) & np.isnan(b)
+        return ~(both_nan | (np.abs(a - b) <= atol))
+    a, b = old.astype(object), new.astype(object)
+    return ~((a.isna() & b.isna()) | (a.astype(str) == b.astype(str))).to_numpy()
+
+
+def diff_tables(old, new, key='Pincode', columns=None, atol=1e-9):
+    """
+    Diff of two tables keyed by `key` (duplicate keys keep their last row).
+    Returns {'added', 'removed', 'changed': sorted key arrays, 'merged': the outer merge
+    (<col>_old / <col>_new, '_merge') for callers that need before/after values}.
+    """
+    if columns is None:
+        columns = [c for c in new.columns if c != key and c in old.columns]
+    old = old[[key] + columns].drop_duplicates(key, keep='last')
+    new = new[[key] + columns].drop_duplicates(key, keep='last')
+
+    merged = old.merge(new, on=key, how='outer', suffixes=('_old', '_new'), indicator=True, sort=True)
+    both = (merged['_merge'] == 'both').to_numpy()
+    changed = np.zeros(len(merged), dtype=bool)
+    for c in columns:
+        changed |= _differs(merged[f"{c}_old"], merged[f"{c}_new"], atol)
+
+    keys = merged[key].to_numpy()
+    return {
+        'added': keys[(merged['_merge'] == 'right_only').to_numpy()],
+        'removed': keys[(merged['_merge'] == 'left_only').to_numpy()],
+        'changed': keys[both & changed],
+        'merged': merged,
+    }
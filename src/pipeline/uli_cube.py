@@ -0,0 +1,252 @@
+"""
+ULI Cube (Pincode x Month x Age Band x Feed)
+Compact array-backed aggregate written by ingestion next to the master tables:
+    data/processed/uli_cube/{counts.npy, pincodes.npy, axes.json}
+    counts[p, m, b, f] = records of feed f (enrol / bio / demo) in age band b, month m, pincode p
+Axes: sorted pincodes, a contiguous month range, schema.AGE_BANDS, schema.FEEDS.
+counts.npy is memory-mapped on load, so a query only pages in the months it slices.
+ULI and risk category are computed on demand, vectorized, for any month window and
+age slice (e.g. the 5-17 mandatory-update band over the last 6 months) without
+touching the raw shards. In incremental ingestion mode the cube is updated from the
+same shard deltas as the (date, pincode) total, so new months only add slices.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.schema import AGE_BANDS, BAND_COLUMNS, FEEDS, feed_of
+
+# CONFIG
+CUBE_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\uli_cube"
+CUBE_VERSION = 1
+CRITICAL_ULI = 0.6
+WARNING_ULI = 0.3
+
+FEED_AXIS = list(FEEDS)
+UPDATE_FEEDS = [f for f in FEEDS if FEEDS[f]['target'] == 'update']
+ENROL_FEEDS = [f for f in FEEDS if FEEDS[f]['target'] == 'enrol']
+
+
+def _cell(column):
+    """(band index, feed index) of a "<feed>_<band>" column."""
+    feed = feed_of(column)
+    return AGE_BANDS.index(column[len(feed) + 1:]), FEED_AXIS.index(feed)
+
+
+def empty():
+    axes = {'pincodes': np.array([], dtype=np.int64), 'months': np.array([], dtype='datetime64[M]'),
+            'bands': list(AGE_BANDS), 'feeds': list(FEED_AXIS), 'total_sig': None}
+    return np.zeros((0, 0, len(AGE_BANDS), len(FEED_AXIS)), dtype=np.int64), axes
+
+
+def monthly_totals(frames):
+    """
+    (date, pincode)-indexed band frames -> (pincodes, months, values[n, columns], columns),
+    one row per (pincode, month). Rows without a date or pincode cannot be placed and are dropped.
+    """
+    frames = [f for f in (frames if isinstance(frames, list) else [frames]) if f is not None and len(f)]
+    if not frames:
+        return np.array([], dtype=np.int64), np.array([], dtype='datetime64[M]'), np.zeros((0, 0)), []
+    df = pd.concat(frames)
+    columns = [c for c in BAND_COLUMNS if c in df.columns]
+    date = df.index.get_level_values('date')
+    pin = df.index.get_level_values('pincode')
+    ok = ~(pd.isna(date) | pd.isna(pin))
+    # Month starts as datetime64[ns] (pandas has no month unit to group on)
+    month = np.asarray(date[ok], dtype='datetime64[ns]').astype('datetime64[M]').astype('datetime64[ns]')
+    values = df.loc[ok, columns].fillna(0)
+    grouped = values.groupby([np.asarray(pin[ok], dtype=np.int64), month]).sum()
+    return (grouped.index.get_level_values(0).to_numpy(dtype=np.int64),
+            grouped.index.get_level_values(1).to_numpy(dtype='datetime64[ns]').astype('datetime64[M]'),
+            grouped.to_numpy(dtype=np.int64), columns)
+
+
+def add(counts, axes, pincodes, months, values, columns):
+    """Adds monthly band totals (possibly negative deltas) into the cube, growing its axes as needed."""
+    if len(pincodes) == 0:
+        return counts, axes
+    pin_axis = np.union1d(axes['pincodes'], pincodes)
+    lo = min(months.min(), axes['months'][0]) if len(axes['months']) else months.min()
+    hi = max(months.max(), axes['months'][-1]) if len(axes['months']) else months.max()
+    month_axis = np.arange(lo, hi + 1)
+
+    if len(pin_axis) != counts.shape[0] or len(month_axis) != counts.shape[1]:
+        grown = np.zeros((len(pin_axis), len(month_axis)) + counts.shape[2:], dtype=np.int64)
+        if counts.size:
+            p_old = np.searchsorted(pin_axis, axes['pincodes'])
+            m0 = int((axes['months'][0] - lo).astype(int))
+            grown[p_old, m0:m0 + counts.shape[1]] = counts
+        counts = grown
+    else:
+        counts = np.array(counts, dtype=np.int64) # Writable copy of a memory-mapped cube
+
+    p_idx = np.searchsorted(pin_axis, pincodes)
+    m_idx = (months - lo).astype(int)
+    for j, col in enumerate(columns):
+        b, f = _cell(col)
+        counts[p_idx, m_idx, b, f] += values[:, j] # (pincode, month) pairs are unique after grouping
+    return counts, dict(axes, pincodes=pin_axis, months=month_axis)
+
+
+def build(df_cube):
+    """Full cube from a finalized (date, pincode) band cube."""
+    counts, axes = empty()
+    return add(counts, axes, *monthly_totals(df_cube))
+
+
+def save(counts, axes, cube_dir=None):
+    # Write-then-rename so readers never see half a cube
+    if counts.size and counts.min() < 0:
+        raise ValueError("ULI cube has negative counts (delta does not match the stored cube)")
+    cube_dir = cube_dir or CUBE_DIR
+    tmp = cube_dir + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "counts.npy"), counts.astype(np.uint32))
+    np.save(os.path.join(tmp, "pincodes.npy"), axes['pincodes'].astype(np.int64))
+    meta = {
+        'version': CUBE_VERSION,
+        'month_start': str(axes['months'][0]) if len(axes['months']) else None,
+        'n_months': int(len(axes['months'])),
+        'bands': axes['bands'],
+        'feeds': axes['feeds'],
+        'total_sig': axes.get('total_sig'),
+    }
+    with open(os.path.join(tmp, "axes.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(cube_dir, ignore_errors=True)
+    os.replace(tmp, cube_dir)
+
+
+def load(cube_dir=None):
+    """(counts [memory-mapped uint32], axes) or (None, None) if the cube is missing / from another layout."""
+    cube_dir = cube_dir or CUBE_DIR
+    path = os.path.join(cube_dir, "axes.json")
+    if not os.path.exists(path):
+        return None, None
+    try:
+        with open(path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != CUBE_VERSION or meta['bands'] != AGE_BANDS or meta['feeds'] != FEED_AXIS:
+            return None, None
+        counts = np.load(os.path.join(cube_dir, "counts.npy"), mmap_mode='r')
+        pincodes = np.load(os.path.join(cube_dir, "pincodes.npy"))
+    except (OSError, ValueError, KeyError):
+        return None, None
+    start = np.datetime64(meta['month_start'], 'M') if meta['month_start'] else np.datetime64('1970-01', 'M')
+    months = np.arange(start, start + meta['n_months']) if meta['n_months'] else np.array([], dtype='datetime64[M]')
+    return counts, {'pincodes': pincodes, 'months': months, 'bands': meta['bands'], 'feeds': meta['feeds'],
+                    'total_sig': meta.get('total_sig')}
+
+
+def update(deltas, total, base_sig, new_sig, cube_dir=None):
+    """
+    Incremental ingestion hook: folds shard deltas (+ fresh / - retracted partials) into the stored cube.
+    Rebuilds from `total` instead when the stored cube does not belong to the previous total (base_sig).
+    """
+    counts, axes = load(cube_dir)
+    if counts is not None:
+        counts = np.array(counts, dtype=np.int64) # Drop the file mapping before the cube is rewritten
+    if counts is None or base_sig is None or axes['total_sig'] != base_sig:
+        counts, axes = build(total)
+        action = "rebuilt"
+    else:
+        counts, axes = add(counts, axes, *monthly_totals(deltas))
+        action = "updated"
+    axes['total_sig'] = new_sig
+    save(counts, axes, cube_dir)
+    return action
+
+
+def month_window(axes, months=None, start=None, end=None):
+    """Month slice: the last `months` months, or [start, end] given as 'YYYY-MM' (inclusive)."""
+    axis = axes['months']
+    if months:
+        return slice(max(0, len(axis) - int(months)), len(axis))
+    lo = 0 if start is None else int(np.searchsorted(axis, np.datetime64(start, 'M')))
+    hi = len(axis) if end is None else int(np.searchsorted(axis, np.datetime64(end, 'M'), side='right'))
+    return slice(lo, hi)
+
+
+def _band_index(bands):
+    if not bands:
+        return slice(None)
+    unknown = [b for b in bands if b not in AGE_BANDS]
+    if unknown:
+        raise ValueError(f"Unknown age band(s) {unknown}. Known: {AGE_BANDS}")
+    return [AGE_BANDS.index(b) for b in bands]
+
+
+def totals(counts, axes, months=None, start=None, end=None, bands=None):
+    """(enrolments, updates) per pincode over a month window and age slice."""
+    window = np.asarray(counts[:, month_window(axes, months, start, end)], dtype=np.int64)
+    window = window[:, :, _band_index(bands)].sum(axis=(1, 2)) # -> (pincodes, feeds)
+    enrol = window[:, [FEED_AXIS.index(f) for f in ENROL_FEEDS]].sum(axis=1)
+    update = window[:, [FEED_AXIS.index(f) for f in UPDATE_FEEDS]].sum(axis=1)
+    return enrol, update
+
+
+def uli(enrol, update):
+    """ULI = (enrolled - updated) / enrolled, clipped to [0, 1]; NaN where nobody enrolled."""
+    enrol = np.asarray(enrol, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (enrol - np.asarray(update, dtype=float)) / enrol
+    return np.where(enrol > 0, np.clip(ratio, 0, 1), np.nan)
+
+
+def risk_category(uli_values):
+    uli_values = np.asarray(uli_values, dtype=float)
+    return np.where(uli_values > CRITICAL_ULI, 'CRITICAL', np.where(uli_values > WARNING_ULI, 'WARNING', 'SAFE'))
+
+
+def window_table(months=None, start=None, end=None, bands=None, cube_dir=None):
+    """
+    master_pincode_risk-shaped totals (Pincode | Enrolment_Count | Update_Count) for a window / age slice,
+    for pincodes with any activity in it.
+    """
+    counts, axes = load(cube_dir)
+    if counts is None:
+        raise FileNotFoundError(f"No ULI cube in {cube_dir or CUBE_DIR}. Run ingestion first.")
+    enrol, update = totals(counts, axes, months, start, end, bands)
+    active = (enrol > 0) | (update > 0)
+    return pd.DataFrame({'Pincode': axes['pincodes'][active], 'Enrolment_Count': enrol[active],
+                         'Update_Count': update[active]})
+
+
+def rolling_uli(counts, axes, window, bands=None):
+    """
+    ULI over every trailing `window`-month window: (pincodes x months) array where column m
+    covers months (m - window, m]. One cumulative sum, so all windows cost one pass.
+    """
+    per_month = np.asarray(counts, dtype=np.int64)[:, :, _band_index(bands)].sum(axis=2) # (p, m, feeds)
+    cum = np.concatenate([np.zeros_like(per_month[:, :1]), per_month.cumsum(axis=1)], axis=1)
+    lagged = np.concatenate([np.zeros_like(cum[:, :window]), cum[:, :-window]], axis=1)[:, :cum.shape[1]]
+    span = (cum - lagged)[:, 1:]
+    enrol = span[:, :, [FEED_AXIS.index(f) for f in ENROL_FEEDS]].sum(axis=2)
+    update = span[:, :, [FEED_AXIS.index(f) for f in UPDATE_FEEDS]].sum(axis=2)
+    return uli(enrol, update)
+
+if __name__ == "__main__":
+    def arg(flag):
+        return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv else None
+
+    months = int(arg("--months")) if arg("--months") else None
+    bands = arg("--bands").split(",") if arg("--bands") else None
+    counts, axes = load()
+    if counts is None:
+        print("❌ Error: ULI cube not found. Run ingestion first.")
+        sys.exit(1)
+    w = month_window(axes, months)
+    print(f"🧊 ULI cube: {counts.shape[0]} pincodes x {counts.shape[1]} months "
+          f"({axes['months'][0]} .. {axes['months'][-1]}) x {len(AGE_BANDS)} bands x {len(FEED_AXIS)} feeds")
+    enrol, update = totals(counts, axes, months=months, bands=bands)
+    values = uli(enrol, update)
+    cats, n = np.unique(risk_category(values[~np.isnan(values)]), return_counts=True)
+    print(f"   Window {axes['months'][w][0]} .. {axes['months'][w][-1]}, bands {bands or 'all'}: "
+          + ", ".join(f"{c} {k}" for c, k in zip(cats, n)))
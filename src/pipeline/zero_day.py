@@ -2,27 +2,39 @@
 Step 2: Risk Calculation & Geocoding (Aggregated Engine)
 Reads 'master_pincode_risk.csv'.
 Calculates ULI based on Exclusion Ratio (Enrolment vs Updates).
-Geocodes Pincodes.
+Lifetime / all ages by default; with window_months or age_bands the counts come
+from the (pincode x month x age band) cube instead (see uli_cube.py).
+Geocodes Pincodes (via the persistent index in geocode_cache.py).
 """
 
 import pandas as pd
-import pgeocode
 import os
 import sys
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.store import load_table, save_table
+from pipeline import geocode_cache, uli_cube
+
 # CONFIG
 INPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_pincode_risk.csv"
 OUTPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+WINDOW_MONTHS = None          # ULI over the last N months only (None = lifetime)
+AGE_BANDS = None              # e.g. ['5_17'] for the mandatory biometric update ages (None = all bands)
 
-def zero_day_cleaner():
+def zero_day_cleaner(refresh_geocode=False, window_months=WINDOW_MONTHS, age_bands=AGE_BANDS):
     print("🚀 [Step 2] Starting Risk Calculation (Aggregated)...")
 
     if not os.path.exists(INPUT_FILE):
         print(f"❌ Error: {INPUT_FILE} not found. Run ingestion first.")
         sys.exit(1)
 
-    df = pd.read_csv(INPUT_FILE, dtype={'Pincode': str})
+    if window_months or age_bands:
+        print(f"   🧊 ULI over {f'the last {window_months} months' if window_months else 'all months'}, "
+              f"age bands {age_bands or 'all'}")
+        df = uli_cube.window_table(months=window_months, bands=age_bands)
+    else:
+        df = load_table(INPUT_FILE, dtype={'Pincode': str})
     
     # 1. Feature Engineering (The Risk Engine)
     # ULI = (Enrolled - Updated) / Enrolled
@@ -39,29 +51,23 @@ def zero_day_cleaner():
     df['ULI'] = df['Lag_Ratio'].clip(0, 1)
     
     # Classification
-    df['Risk_Category'] = np.where(df['ULI'] > 0.6, 'CRITICAL', 
-                                   np.where(df['ULI'] > 0.3, 'WARNING', 'SAFE'))
+    df['Risk_Category'] = uli_cube.risk_category(df['ULI']) # > 0.6 CRITICAL, > 0.3 WARNING
     
-    # 2. Geocoding (Bulk)
+    # 2. Geocoding (Bulk, one vectorized lookup; pgeocode only for unseen pincodes)
     print(f"   🌍 Geocoding {len(df)} Pincodes...")
-    nomi = pgeocode.Nominatim('in')
-    
-    unique_pins = df['Pincode'].unique()
-    geo_data = nomi.query_postal_code(unique_pins)
-    
-    pin_lat = dict(zip(unique_pins, geo_data.latitude))
-    pin_lon = dict(zip(unique_pins, geo_data.longitude))
-    pin_dist = dict(zip(unique_pins, geo_data.county_name)) # District
-    
-    df['Latitude'] = df['Pincode'].map(pin_lat)
-    df['Longitude'] = df['Pincode'].map(pin_lon)
-    df['District'] = df['Pincode'].map(pin_dist)
+    geo_data = geocode_cache.lookup(df['Pincode'].to_numpy(), refresh=refresh_geocode)
+
+    df['Latitude'] = geo_data['Latitude'].to_numpy()
+    df['Longitude'] = geo_data['Longitude'].to_numpy()
+    df['District'] = geo_data['District'].to_numpy()
+    df['State'] = geo_data['State'].to_numpy()
     
     # Drop where Geocoding failed (NaN)
     df.dropna(subset=['Latitude', 'Longitude'], inplace=True)
     
     print(f"   ✅ Processed {len(df)} valid geospatial points.")
-    df.to_csv(OUTPUT_FILE, index=False)
+    df['Pincode'] = df['Pincode'].astype('int64') # Same CSV text; numeric in the column store
+    save_table(df, OUTPUT_FILE)
 
 if __name__ == "__main__":
     zero_day_cleaner()
@@ -1,18 +1,25 @@
 """
 MANDATORY STATISTICAL ANALYSIS (Compliance Requirement)
 Generates Univariate and Bivariate charts.
-Input: Aggregated Pincode Data.
+Input: Aggregated Pincode Data, pre-binned by bins.py (draw cost follows the bin count,
+not the pincode count, and no pincode is sampled away).
 """
 
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.colors import LogNorm
 import os
 import sys
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from visuals import bins
+
 # CONFIG
 INPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
 OUTPUT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals"
+DPI = 300
+RISK_COLORS = {'CRITICAL': '#D32F2F', 'WARNING': '#FFA000', 'SAFE': '#388E3C'}
 
 def generate_stats():
     print("🚀 Generating Stats (Aggregated)...")
@@ -21,7 +28,6 @@ def generate_stats():
         print(f"❌ Error: processed data not found.")
         sys.exit(1)
 
-    df = pd.read_csv(INPUT_FILE)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     plt.style.use('seaborn-v0_8-whitegrid')
@@ -29,31 +35,48 @@ def generate_stats():
     
     # 1. UNIVARIATE: Distribution of Lag Index (ULI)
     # Answers: "How many pincodes are in Critcal Zone?"
+    hist = bins.grid('uli_hist', INPUT_FILE)
     plt.figure(figsize=(10, 6))
-    sns.histplot(data=df, x='ULI', bins=20, color='#003366', edgecolor='black')
+    edges = hist['edges']
+    plt.bar(edges[:-1], hist['counts'].sum(axis=0), width=np.diff(edges), align='edge',
+            color='#003366', edgecolor='black')
     plt.title('Univariate Analysis: Distribution of Update Lag Index (ULI)', fontsize=14, fontweight='bold')
     plt.xlabel('ULI (0.0 = Perfect, 1.0 = High Exclusion)', fontsize=12)
     plt.ylabel('Frequency (Number of Pincodes)', fontsize=12)
     plt.axvline(x=0.6, color='red', linestyle='--', label='Critical Threshold (0.6)')
     plt.legend()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'fig1_univariate_uli.png'), dpi=300, bbox_inches='tight')
+    with profiler.step("savefig", figure='fig1_univariate_uli.png'):
+        plt.savefig(os.path.join(OUTPUT_DIR, 'fig1_univariate_uli.png'), dpi=DPI, bbox_inches='tight')
+    plt.close()
     print("   ✅ Generated Fig 1 (ULI Hist)")
 
     # 2. BIVARIATE: Enrolment Density vs ULI
     # Answers: "Do big cities have more exclusion?"
+    # Every pincode is counted: density cells for all of them, risk markers on every cell holding one
+    grid = bins.grid('enrol_uli', INPUT_FILE)
+    x_edges, y_edges, counts = grid['x_edges'], grid['y_edges'], grid['counts']
     plt.figure(figsize=(10, 6))
-    plot_df = df.sample(min(5000, len(df))) if len(df) > 5000 else df
-    
-    sns.scatterplot(data=plot_df, x='Enrolment_Count', y='ULI', hue='Risk_Category', 
-                    palette={'CRITICAL': '#D32F2F', 'WARNING': '#FFA000', 'SAFE': '#388E3C'}, alpha=0.6)
+    total = counts.sum(axis=0)
+    mesh = plt.pcolormesh(x_edges, y_edges, np.ma.masked_equal(total, 0), cmap='Greys',
+                          norm=LogNorm(vmin=1, vmax=max(total.max(), 1)))
+    plt.colorbar(mesh, label='Pincodes per cell')
+    cx, cy = np.meshgrid(bins.centers(x_edges), bins.centers(y_edges))
+    for layer, risk in enumerate(bins.RISK_LAYERS):
+        n = counts[layer]
+        hit = n > 0
+        if risk == 'SAFE' or not hit.any():
+            continue # SAFE cells are the grey density underneath
+        plt.scatter(cx[hit], cy[hit], s=4 + 4 * np.log1p(n[hit]), c=RISK_COLORS[risk], alpha=0.6,
+                    edgecolors='none', label=risk)
     
     plt.title('Bivariate Analysis: Population Density vs. Exclusion Risk', fontsize=14, fontweight='bold')
     plt.xlabel('Enrolment Volume (Density)', fontsize=12)
     plt.ylabel('Update Lag Index (ULI)', fontsize=12)
-    # Log scale if density varies wildy? 
-    # plt.xscale('log') 
+    plt.xscale('symlog', linthresh=1) # Bins are log-spaced
     plt.legend(title='Risk Category')
-    plt.savefig(os.path.join(OUTPUT_DIR, 'fig2_bivariate_density.png'), dpi=300, bbox_inches='tight')
+    with profiler.step("savefig", figure='fig2_bivariate_density.png'):
+        plt.savefig(os.path.join(OUTPUT_DIR, 'fig2_bivariate_density.png'), dpi=DPI, bbox_inches='tight')
+    plt.close()
     print("   ✅ Generated Fig 2 (Density vs Risk)")
 
 if __name__ == "__main__":
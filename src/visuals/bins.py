@@ -0,0 +1,140 @@
+"""
+Binned Aggregates for the Statistical Charts (Render Bins, not Rows)
+Charts draw precomputed grids instead of one artist per pincode, so rendering cost
+depends on the number of bins, not rows, and sparse critical cells stay visible
+(nothing is sampled away). Each grid is one vectorized bincount per layer, cached under
+data/visuals/bins/<name>.npz and keyed by the master_table signature + the bin spec,
+so figure variants and reruns on unchanged data skip the table entirely.
+Grids (layers are stacked on axis 0):
+1. uli_hist  -> ULI histogram on [0, 1], one layer per risk category.
+2. enrol_uli -> Enrolment_Count (log-spaced bins) x ULI, one layer per risk category.
+3. geo_gap   -> Latitude x Longitude raster: pincodes, Gap sum, CRITICAL Gap sum.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.store import load_table
+
+# CONFIG
+SOURCE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+BIN_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals\bins"
+
+BIN_VERSION = 1
+RISK_LAYERS = ['SAFE', 'WARNING', 'CRITICAL']
+GRIDS = {
+    'uli_hist': {'uli_bins': 20},
+    'enrol_uli': {'enrol_bins': 60, 'uli_bins': 50},
+    'geo_gap': {'lat_bins': 320, 'lng_bins': 300, 'extent': [6.0, 38.0, 68.0, 98.0]}, # lat/lng box around India
+}
+
+
+def _signature(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime]
+
+
+def bin_index(values, edges):
+    """Bin of each value (last edge inclusive); -1 for NaN or out of range."""
+    values = np.asarray(values, dtype=float)
+    idx = np.searchsorted(edges, values, side='right') - 1
+    idx[values == edges[-1]] = len(edges) - 2
+    idx[~((values >= edges[0]) & (values <= edges[-1]))] = -1
+    return idx
+
+
+def hist2d(x, y, x_edges, y_edges, weights=None, layer=None, n_layers=1):
+    """(n_layers, len(y_edges) - 1, len(x_edges) - 1) sums of `weights` (counts if None) in one bincount."""
+    nx, ny = len(x_edges) - 1, len(y_edges) - 1
+    ix, iy = bin_index(x, x_edges), bin_index(y, y_edges)
+    layer = np.zeros(len(ix), dtype=np.int64) if layer is None else np.asarray(layer, dtype=np.int64)
+    ok = (ix >= 0) & (iy >= 0) & (layer >= 0) & (layer < n_layers)
+    flat = (layer[ok] * ny + iy[ok]) * nx + ix[ok]
+    w = None if weights is None else np.asarray(weights, dtype=float)[ok]
+    return np.bincount(flat, weights=w, minlength=n_layers * ny * nx).reshape(n_layers, ny, nx)
+
+
+def log_edges(max_value, n):
+    """n log-spaced bins over [0, max_value] (log1p scale, so zero counts have a bin)."""
+    return np.expm1(np.linspace(0.0, np.log1p(max(float(max_value), 1.0)), n + 1))
+
+
+def _risk_layer(risk):
+    return pd.Categorical(np.asarray(risk).astype(str), categories=RISK_LAYERS).codes
+
+
+def _build_uli_hist(source, spec):
+    df = load_table(source, columns=['ULI', 'Risk_Category'])
+    edges = np.linspace(0.0, 1.0, spec['uli_bins'] + 1)
+    counts = hist2d(df['ULI'], np.zeros(len(df)), edges, np.array([0.0, 1.0]),
+                    layer=_risk_layer(df['Risk_Category']), n_layers=len(RISK_LAYERS))[:, 0]
+    return len(df), {'edges': edges, 'counts': counts}
+
+
+def _build_enrol_uli(source, spec):
+    df = load_table(source, columns=['Enrolment_Count', 'ULI', 'Risk_Category'])
+    x_edges = log_edges(df['Enrolment_Count'].max() if len(df) else 1, spec['enrol_bins'])
+    y_edges = np.linspace(0.0, 1.0, spec['uli_bins'] + 1)
+    counts = hist2d(df['Enrolment_Count'], df['ULI'], x_edges, y_edges,
+                    layer=_risk_layer(df['Risk_Category']), n_layers=len(RISK_LAYERS))
+    return len(df), {'x_edges': x_edges, 'y_edges': y_edges, 'counts': counts}
+
+
+def _build_geo_gap(source, spec):
+    df = load_table(source, columns=['Latitude', 'Longitude', 'Enrolment_Count', 'Update_Count',
+                                    'Risk_Category'])
+    lat0, lat1, lng0, lng1 = spec['extent']
+    x_edges = np.linspace(lng0, lng1, spec['lng_bins'] + 1)
+    y_edges = np.linspace(lat0, lat1, spec['lat_bins'] + 1)
+    gap = (df['Enrolment_Count'] - df['Update_Count']).clip(lower=0).to_numpy(dtype=float)
+    critical = (df['Risk_Category'].astype(str) == 'CRITICAL').to_numpy()
+    lng, lat = df['Longitude'].to_numpy(dtype=float), df['Latitude'].to_numpy(dtype=float)
+    # Layers: 0 pincodes, 1 gap, 2 critical gap (three weighted passes over the same cell index)
+    layers = np.concatenate([hist2d(lng, lat, x_edges, y_edges, weights=w)
+                             for w in (None, gap, np.where(critical, gap, 0.0))])
+    return len(df), {'x_edges': x_edges, 'y_edges': y_edges, 'counts': layers}
+
+
+BUILDERS = {'uli_hist': _build_uli_hist, 'enrol_uli': _build_enrol_uli, 'geo_gap': _build_geo_gap}
+
+
+def grid(name, source=None, bin_dir=None):
+    """
+    Cached grid `name` as a dict of arrays (edges + counts). Rebuilt only when master_table
+    or the spec in GRIDS changed.
+    """
+    source = source or SOURCE_FILE
+    bin_dir = bin_dir or BIN_DIR
+    spec = GRIDS[name]
+    key = json.dumps({'version': BIN_VERSION, 'spec': spec, 'source': _signature(source),
+                      'layers': RISK_LAYERS}, sort_keys=True)
+    path = os.path.join(bin_dir, f"{name}.npz")
+    if os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as cached:
+                if str(cached['key']) == key:
+                    return {k: cached[k] for k in cached.files if k != 'key'}
+        except (OSError, ValueError, KeyError):
+            pass # Unreadable: rebuild
+
+    with profiler.step("bins", grid=name) as meta:
+        rows, arrays = BUILDERS[name](source, spec)
+        meta['rows'] = rows
+    os.makedirs(bin_dir, exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, key=np.array(key), **arrays)
+    os.replace(tmp, path)
+    print(f"   🧮 Binned {rows:,} rows into '{name}' ({arrays['counts'].size:,} cells)")
+    return arrays
+
+
+def centers(edges):
+    return (edges[:-1] + edges[1:]) / 2
@@ -2,19 +2,238 @@
 VISUAL 4: Dynamic Dashboard Renderer
 Stitches REAL Data into the HTML Template.
 Consumes Aggregated Pincode Data.
+1. The template is compiled once ({{ name }} placeholders split out) and each
+   dashboard is rendered with a single join.
+2. Metrics for the national view and every (State, District) come from one
+   grouped pass over master_table (precompute_metrics).
+3. District dashboards (--districts) are only re-rendered when the hash of their
+   input slice (pincode rows + route membership + template) changed, and are
+   written across a process pool in batches. A full (unfiltered) run deletes the
+   pages and state of districts no longer in master_table.
 """
 
 import pandas as pd
+import numpy as np
+import glob
+import hashlib
 import json
+import multiprocessing
 import os
+import re
 import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.store import load_table
+
 # CONFIG
 DATA_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
 CLUSTERS_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
 TEMPLATE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\src\visuals\dashboard_template.html"
 OUTPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\src\visuals\dashboard_index.html"
+DISTRICT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\src\visuals\dashboards"
+
+RENDER_VERSION = 2            # v2: district file names carry a (State, District) hash
+TOP_ROUTES = 3                # Zone rows in the Priority Alerts table
+WORKERS = None                # Process pool size for district batches (None = all cores)
+RENDER_BATCH = 50             # Dashboards per pool task
+
+PLACEHOLDER = re.compile(r"(\{\{\s*(\w+)\s*\}\})")
+HASH_COLUMNS = ['Pincode', 'Enrolment_Count', 'Update_Count', 'ULI', 'Risk_Category', 'Route']
+
+_COMPILED = {} # template path -> (size, mtime, tokens)
+
+
+def compile_template(text):
+    """[literal, (placeholder text, name), literal, ...] - parsed once, rendered by render()."""
+    parts = PLACEHOLDER.split(text)
+    tokens = []
+    for i in range(0, len(parts), 3):
+        tokens.append(parts[i])
+        if i + 2 < len(parts):
+            tokens.append((parts[i + 1], parts[i + 2]))
+    return tokens
+
+
+def load_template(path=None):
+    path = path or TEMPLATE_FILE
+    st = os.stat(path)
+    cached = _COMPILED.get(path)
+    if cached is None or cached[:2] != (st.st_size, st.st_mtime):
+        with open(path, 'r', encoding='utf-8') as t:
+            cached = (st.st_size, st.st_mtime, compile_template(t.read()))
+        _COMPILED[path] = cached
+    return cached[2]
+
+
+def render(tokens, values):
+    """One join over the compiled template; unknown placeholders are left as written."""
+    return "".join(t if isinstance(t, str) else str(values.get(t[1], t[0])) for t in tokens)
+
+
+def cluster_rows(routes):
+    return "".join(f"""
+        <tr>
+            <td>C-{r['cluster_id']}</td>
+            <td>{r['demand_size']} Families</td>
+            <td style="color:#D32F2F; font-weight:bold;">PENDING</td>
+        </tr>
+        """ for r in routes)
+
+
+def dashboard_values(total_pending, critical_count, avg_uli, active_vans, routes, scope, asset_root=""):
+    """Placeholder values for one dashboard."""
+    # Inclusion Score: 0 = Bad (High Lag), 100 = Perfect (No Lag), from the average ULI (already clipped 0-1)
+    inclusion_score = 0 if pd.isna(avg_uli) else max(0, min(100, int((1 - avg_uli) * 100)))
+    return {
+        'inclusion_score': inclusion_score,
+        'score_color_class': "metric-red" if inclusion_score < 70 else "metric-green",
+        'total_pending': f"{int(total_pending):,}",
+        'critical_count': f"{int(critical_count):,}",
+        'active_vans': active_vans,
+        'cluster_rows': cluster_rows(routes),
+        'scope': scope,
+        'asset_root': asset_root,
+    }
+
+
+def load_inputs():
+    """master_table (with Gap and the serving Route per pincode) + route_clusters payload."""
+    try:
+        df = load_table(DATA_FILE, columns=['Pincode', 'Enrolment_Count', 'Update_Count', 'ULI',
+                                            'Risk_Category', 'District', 'State'])
+    except (KeyError, ValueError):
+        # Tables written before zero_day kept the State column
+        df = load_table(DATA_FILE, columns=['Pincode', 'Enrolment_Count', 'Update_Count', 'ULI',
+                                            'Risk_Category', 'District'])
+        df['State'] = 'Unknown'
+    with open(CLUSTERS_FILE, 'r') as f:
+        cluster_data = json.load(f)
+
+    # Gap = Enrolment - Update
+    df['Gap'] = (df['Enrolment_Count'] - df['Update_Count']).clip(lower=0)
+    for col in ('State', 'District'):
+        df[col] = df[col].astype(str).replace({'nan': 'Unknown'})
+    member = {int(p): r['cluster_id'] for r in cluster_data.get('routes', []) for p in r.get('pincodes', [])}
+    df['Route'] = pd.Series(df['Pincode'].astype(np.int64).map(member), dtype='Int64').to_numpy()
+    return df, cluster_data
+
+
+def precompute_metrics(df):
+    """
+    One grouped pass: per (State, District) pending gap, critical gap, mean ULI, routes serving it
+    and the gap each of those routes covers there (highest first).
+    """
+    df = df.assign(Critical_Gap=df['Gap'].where(df['Risk_Category'] == 'CRITICAL', 0))
+    keys = ['State', 'District']
+    metrics = df.groupby(keys, sort=True).agg(total_pending=('Gap', 'sum'),
+                                              critical_count=('Critical_Gap', 'sum'),
+                                              avg_uli=('ULI', 'mean'),
+                                              pincodes=('Pincode', 'size'))
+    by_route = df.dropna(subset=['Route']).groupby(keys + ['Route'])['Gap'].sum().reset_index()
+    by_route = by_route.sort_values(keys + ['Gap', 'Route'], ascending=[True, True, False, True])
+    metrics['active_vans'] = by_route.groupby(keys).size().reindex(metrics.index, fill_value=0)
+    top = {k: [{'cluster_id': int(r), 'demand_size': int(g)} for r, g in zip(v['Route'], v['Gap'])]
+           for k, v in by_route.groupby(keys, sort=False).head(TOP_ROUTES).groupby(keys, sort=False)}
+    return metrics, top
+
+
+def slice_hashes(df, template_path=None):
+    """Order-independent hash of each district's input rows, salted with the template."""
+    salt = hashlib.sha1(json.dumps([RENDER_VERSION, TOP_ROUTES, str(load_template(template_path))]).encode()).hexdigest()
+    # Rounded, so CSV vs column-store float round trips do not count as changes
+    rows = pd.util.hash_pandas_object(df[HASH_COLUMNS].round(9), index=False)
+    # Sum of row hashes (mod 2^64) + row count: unchanged slice -> same pair, in any row order
+    grouped = rows.groupby([df['State'].to_numpy(), df['District'].to_numpy()])
+    sums, counts = grouped.sum(), grouped.size()
+    return {k: hashlib.sha1(f"{salt}:{s}:{n}".encode()).hexdigest()
+            for k, s, n in zip(sums.index, sums.to_numpy(), counts.to_numpy())}
+
+
+def district_file(state, district):
+    # The slug is lossy ("A & B" and "A-B" -> A_B); the hash of the raw pair keeps names unique
+    slug = lambda s: re.sub(r"[^A-Za-z0-9]+", "_", s).strip("_") or "Unknown"
+    key = hashlib.sha1(json.dumps([state, district]).encode()).hexdigest()[:8]
+    return f"dashboard_{slug(state)}__{slug(district)}_{key}.html"
+
+
+def _render_batch(task):
+    """Pool task: renders and writes a batch of (path, values) with the compiled template."""
+    tokens, jobs = task
+    for path, values in jobs:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render(tokens, values))
+    return len(jobs)
+
+
+def render_district_dashboards(districts=None, workers=WORKERS, force=False, out_dir=None):
+    """
+    One dashboard per (State, District) under DISTRICT_DIR (districts: optional list of names to limit to).
+    Unchanged slices are skipped; the rest render in RENDER_BATCH-sized pool tasks.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    print("🚀 Rendering District Dashboards (compiled template, changed slices only)...")
+    if not os.path.exists(DATA_FILE) or not os.path.exists(CLUSTERS_FILE):
+        print(f"❌ Error: Data missing. Run pipeline first.")
+        sys.exit(1)
+
+    out_dir = out_dir or DISTRICT_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, "render_state.json")
+    state = {}
+    if os.path.exists(state_path) and not force:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if state.get('version') != RENDER_VERSION:
+            state = {}
+    rendered = state.get('districts', {})
+
+    df, _ = load_inputs()
+    if districts:
+        wanted = {d.lower() for d in districts}
+        df = df[df['District'].str.lower().isin(wanted)]
+    tokens = load_template()
+    metrics, top = precompute_metrics(df)
+    hashes = slice_hashes(df)
+
+    jobs, current = [], {}
+    for (st, dist), m in metrics.iterrows():
+        name = district_file(st, dist)
+        current[name] = hashes[(st, dist)]
+        if rendered.get(name) == current[name] and os.path.exists(os.path.join(out_dir, name)):
+            continue
+        values = dashboard_values(m['total_pending'], m['critical_count'], m['avg_uli'], int(m['active_vans']),
+                                  top.get((st, dist), []), f"{dist}, {st}", asset_root="../")
+        values['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+        jobs.append((os.path.join(out_dir, name), values))
+    print(f"   🧮 {len(metrics)} districts: {len(jobs)} changed, {len(metrics) - len(jobs)} unchanged.")
+
+    tasks = [(tokens, jobs[i:i + RENDER_BATCH]) for i in range(0, len(jobs), RENDER_BATCH)]
+    n = workers or os.cpu_count() or 1
+    if n <= 1 or len(tasks) <= 1:
+        written = sum(_render_batch(t) for t in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=min(n, len(tasks)),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            written = sum(pool.map(_render_batch, tasks))
+
+    rendered.update(current)
+    if not districts:
+        # Full run: districts gone from master_table must not keep serving stale pages
+        stale = {os.path.basename(p) for p in glob.glob(os.path.join(out_dir, "dashboard_*.html"))}
+        stale = (stale | set(rendered)) - set(current)
+        for name in stale:
+            rendered.pop(name, None)
+            if os.path.exists(os.path.join(out_dir, name)):
+                os.remove(os.path.join(out_dir, name))
+        if stale:
+            print(f"   🧹 Removed {len(stale)} dashboards of districts no longer in master_table.")
+    with open(state_path, 'w') as f:
+        json.dump({'version': RENDER_VERSION, 'districts': rendered}, f, indent=2)
+    print(f"   ✅ {written} District Dashboards Rendered to: {out_dir}")
+    return written
+
 
 def render_dashboard():
     print("🚀 Rendering Dynamic Dashboard (Real Data Injection)...")
@@ -24,61 +243,22 @@ def render_dashboard():
         sys.exit(1)
 
     # 1. Load Real Data
-    df = pd.read_csv(DATA_FILE)
-    with open(CLUSTERS_FILE, 'r') as f:
-        cluster_data = json.load(f)
+    df, cluster_data = load_inputs()
 
     # 2. Calculate Real Metrics (Population Level)
-    # Gap = Enrolment - Update
-    df['Gap'] = (df['Enrolment_Count'] - df['Update_Count']).clip(lower=0)
-    
-    total_pending = int(df['Gap'].sum())
-    
     # Critical Count = Gap in Pincodes marked as CRITICAL
-    critical_df = df[df['Risk_Category'] == 'CRITICAL']
-    critical_count = int(critical_df['Gap'].sum())
-    
-    # Inclusion Score Logic (Fixed)
-    # 0 = Bad (High Lag), 100 = Perfect (No Lag)
-    # We use the average ULI (Update Lag Index) from the pincodes.
-    # ULI is already clipped 0-1 in the pipeline.
-    avg_uli = df['ULI'].mean()
-    inclusion_score = int((1 - avg_uli) * 100)
-    
-    # Safety cap just in case
-    inclusion_score = max(0, min(100, inclusion_score))
-        
-    score_color = "metric-red" if inclusion_score < 70 else "metric-green"
-
+    critical_count = df.loc[df['Risk_Category'] == 'CRITICAL', 'Gap'].sum()
     active_vans = cluster_data.get('deployed_vans', 0)
-    
-    # 3. Generate Cluster Table Rows
+
+    # 3. Top Clusters by demand
     routes = cluster_data.get('routes', [])
-    sorted_routes = sorted(routes, key=lambda x: x['demand_size'], reverse=True)[:3]
-    
-    table_html = ""
-    for r in sorted_routes:
-        table_html += f"""
-        <tr>
-            <td>C-{r['cluster_id']}</td>
-            <td>{r['demand_size']} Families</td>
-            <td style="color:#D32F2F; font-weight:bold;">PENDING</td>
-        </tr>
-        """
-
-    # 4. Inject into Template (Using Regex for robustness against newlines/spaces)
-    with open(TEMPLATE_FILE, 'r', encoding='utf-8') as t:
-        html_content = t.read()
-
-    import re
-    html_content = re.sub(r'\{\{\s*timestamp\s*\}\}', datetime.now().strftime('%Y-%m-%d %H:%M'), html_content)
-    html_content = re.sub(r'\{\{\s*inclusion_score\s*\}\}', str(inclusion_score), html_content)
-    html_content = re.sub(r'\{\{\s*score_color_class\s*\}\}', score_color, html_content)
-    html_content = re.sub(r'\{\{\s*total_pending\s*\}\}', f"{total_pending:,}", html_content)
-    html_content = re.sub(r'\{\{\s*critical_count\s*\}\}', f"{critical_count:,}", html_content)
-    # Regex replaces ALL occurrences, so the Alert Box will also be updated automatically.
-    html_content = re.sub(r'\{\{\s*active_vans\s*\}\}', str(active_vans), html_content)
-    html_content = re.sub(r'\{\{\s*cluster_rows\s*\}\}', table_html, html_content)
+    sorted_routes = sorted(routes, key=lambda x: x['demand_size'], reverse=True)[:TOP_ROUTES]
+
+    # 4. Render the compiled template (Regex replaced ALL occurrences, so does the join)
+    values = dashboard_values(df['Gap'].sum(), critical_count, df['ULI'].mean(), active_vans,
+                              sorted_routes, "District")
+    values['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+    html_content = render(load_template(), values)
 
     with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
         f.write(html_content)
@@ -86,4 +266,7 @@ def render_dashboard():
     print(f"   ✅ Dashboard Rendered to: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    render_dashboard()
+    if "--districts" in sys.argv:
+        render_district_dashboards(force="--force" in sys.argv)
+    else:
+        render_dashboard()
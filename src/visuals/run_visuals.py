@@ -0,0 +1,208 @@
+"""
+Visuals Runner (All Figures, One Process Pool, Cached Outputs)
+Replaces five separate interpreters (basic_stats, viz_sankey, viz_kmeans, viz_cycle,
+render_dashboard) with one call:
+1. Inputs are read once here: master_table (only the columns any figure uses) is
+   hashed column by column; route_clusters.json / the template by content.
+2. Each figure's key = its code (the module + every in-repo module it imports,
+   found by code_deps.code_files) + the hashes of the columns and
+   files it reads. A figure whose key is unchanged and whose outputs exist is skipped,
+   so e.g. fig5_vicious_cycle.html (no inputs) is rendered once and never again.
+3. The rest render concurrently in a process pool (non-interactive Agg backend).
+   Workers read master_table through the memory-mapped column store (store.py).
+State: data/visuals/visuals_state.json
+Usage: python run_visuals.py [figure ...] [--force] [--workers N]
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.code_deps import SRC_DIR, code_files
+from pipeline.store import load_table
+
+# CONFIG
+DATA_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
+CLUSTERS_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
+TEMPLATE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\src\visuals\dashboard_template.html"
+OUTPUT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals"
+DASHBOARD_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\src\visuals\dashboard_index.html"
+STATE_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals\visuals_state.json"
+BIN_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals\bins"
+
+RUNNER_VERSION = 3            # v3: code = static import scan of the figure module
+WORKERS = None                # Process pool size (None = one per figure, capped at the core count)
+
+# columns: master_table columns the figure reads; files: other inputs;
+# set: module CONFIG ("bins.X" = a helper module's) -> runner CONFIG
+FIGURES = [
+    {'name': 'basic_stats', 'module': 'visuals.basic_stats', 'func': 'generate_stats',
+     'columns': ['Enrolment_Count', 'ULI', 'Risk_Category'], 'files': [],
+     'set': {'INPUT_FILE': 'DATA_FILE', 'OUTPUT_DIR': 'OUTPUT_DIR', 'bins.BIN_DIR': 'BIN_DIR'},
+     'outputs': ['fig1_univariate_uli.png', 'fig2_bivariate_density.png']},
+    {'name': 'viz_sankey', 'module': 'visuals.viz_sankey', 'func': 'generate_sankey',
+     'columns': ['Enrolment_Count', 'Update_Count'], 'files': [],
+     'set': {'INPUT_FILE': 'DATA_FILE', 'OUTPUT_DIR': 'OUTPUT_DIR'},
+     'outputs': ['fig3_sankey.html']},
+    {'name': 'viz_kmeans', 'module': 'visuals.viz_kmeans', 'func': 'generate_map',
+     'columns': ['Latitude', 'Longitude', 'Enrolment_Count', 'Update_Count', 'Risk_Category'],
+     'files': ['CLUSTERS_FILE'], 'set': {'DATA_FILE': 'DATA_FILE', 'CLUSTERS_FILE': 'CLUSTERS_FILE',
+                                         'OUTPUT_DIR': 'OUTPUT_DIR', 'bins.BIN_DIR': 'BIN_DIR'},
+     'outputs': ['fig4_route_map.png']},
+    {'name': 'viz_cycle', 'module': 'visuals.viz_cycle', 'func': 'generate_cycle',
+     'columns': [], 'files': [], 'set': {'OUTPUT_DIR': 'OUTPUT_DIR'},
+     'outputs': ['fig5_vicious_cycle.html']},
+    {'name': 'dashboard', 'module': 'visuals.render_dashboard', 'func': 'render_dashboard',
+     'columns': ['Pincode', 'Enrolment_Count', 'Update_Count', 'ULI', 'Risk_Category', 'District', 'State'],
+     'files': ['CLUSTERS_FILE', 'TEMPLATE_FILE'],
+     'set': {'DATA_FILE': 'DATA_FILE', 'CLUSTERS_FILE': 'CLUSTERS_FILE', 'TEMPLATE_FILE': 'TEMPLATE_FILE',
+             'OUTPUT_FILE': 'DASHBOARD_FILE'},
+     'outputs': ['DASHBOARD_FILE']},
+]
+
+
+def _config():
+    return {k: v for k, v in globals().items() if k.isupper() and isinstance(v, str)}
+
+
+def output_paths(fig):
+    cfg = _config()
+    return [cfg[o] if o in cfg else os.path.join(OUTPUT_DIR, o) for o in fig['outputs']]
+
+
+def _file_hash(path):
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def column_hashes(columns):
+    """sha1 per master_table column (one load for every figure). Missing columns hash as None."""
+    if not columns or not os.path.exists(DATA_FILE):
+        return {}
+    df = load_table(DATA_FILE) # Memory-mapped: only the hashed columns are paged in
+    out = {}
+    for c in columns:
+        if c in df.columns:
+            out[c] = hashlib.sha1(pd.util.hash_pandas_object(df[c], index=False).to_numpy().tobytes()).hexdigest()
+        else:
+            out[c] = None
+    return out
+
+
+def figure_keys(figures):
+    """Input + code fingerprint per figure."""
+    cfg = _config()
+    columns = column_hashes(sorted({c for fig in figures for c in fig['columns']}))
+    files = {}
+    keys = {}
+    for fig in figures:
+        parts = {'version': RUNNER_VERSION,
+                 'code': {os.path.relpath(p, SRC_DIR): _file_hash(p) for p in code_files([fig['module']])},
+                 'columns': {c: columns.get(c) for c in fig['columns']},
+                 'files': {}}
+        for name in fig['files']:
+            if name not in files:
+                files[name] = _file_hash(cfg[name])
+            parts['files'][name] = files[name]
+        keys[fig['name']] = hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return keys
+
+
+def _render_figure(task):
+    """Pool task: imports one figure module, points its CONFIG at the runner's paths and renders it."""
+    import importlib
+    import matplotlib
+    matplotlib.use('Agg')
+
+    name, module_name, func, settings = task
+    t0 = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        for attr, value in settings.items():
+            target = module
+            for part in attr.split(".")[:-1]:
+                target = getattr(target, part)
+            setattr(target, attr.split(".")[-1], value)
+        getattr(module, func)()
+        return name, "ok", round(time.perf_counter() - t0, 3), None
+    except BaseException as e: # Figures sys.exit() on missing data; report it, keep the others going
+        return name, "error", round(time.perf_counter() - t0, 3), f"{type(e).__name__}: {e}"
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, 'r') as f:
+                state = json.load(f)
+            if state.get('version') == RUNNER_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+    return {'version': RUNNER_VERSION, 'figures': {}}
+
+
+def run_visuals(figures=None, force=False, workers=WORKERS):
+    print("🚀 Rendering Visuals (one pool, cached outputs)...")
+    from concurrent.futures import ProcessPoolExecutor
+
+    wanted = [f for f in FIGURES if not figures or f['name'] in figures]
+    state = load_state()
+    with profiler.step("hash_inputs", figures=len(wanted)):
+        keys = figure_keys(wanted)
+
+    cfg = _config()
+    todo = []
+    for fig in wanted:
+        done = state['figures'].get(fig['name'], {}).get('key') == keys[fig['name']]
+        if done and not force and all(os.path.exists(p) for p in output_paths(fig)):
+            print(f"   ⏭️ {fig['name']}: unchanged")
+            continue
+        settings = {attr: cfg[value] for attr, value in fig['set'].items()}
+        todo.append((fig['name'], fig['module'], fig['func'], settings))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    n = min(workers or os.cpu_count() or 1, len(todo))
+    with profiler.step("render_figures", figures=len(todo), workers=max(n, 1)):
+        if n <= 1:
+            results = [_render_figure(t) for t in todo]
+        else:
+            with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(_render_figure, todo))
+
+    status = {f['name']: "skipped" for f in wanted}
+    for name, result, seconds, error in results:
+        status[name] = result
+        if result == "ok":
+            state['figures'][name] = {'key': keys[name], 'seconds': seconds}
+            print(f"   ✅ {name}: {seconds:.2f}s")
+        else:
+            state['figures'].pop(name, None)
+            print(f"   ❌ {name}: {error}")
+
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE + ".tmp", 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+    if any(s == "error" for s in status.values()):
+        raise RuntimeError(f"Figures failed: {[k for k, s in status.items() if s == 'error']}")
+    return status
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    n_workers = int(args[args.index("--workers") + 1]) if "--workers" in args else WORKERS
+    names = [a for i, a in enumerate(args) if not a.startswith("--") and (i == 0 or args[i - 1] != "--workers")]
+    run_visuals(names or None, force="--force" in args, workers=n_workers)
@@ -1,20 +1,27 @@
 """
 VISUAL 4: Geospatial Route Optimization Map
 Model: Plotly/Matplotlib Overlay.
-Visual: High-Risk Pincodes (Red Bubbles) + Optimized Van Stops (Black Xs).
-Size of Bubble = Enrolment Density.
+Visual: Gap Raster (pincodes binned on a lat/lng grid, weighted by the update gap)
++ Critical Hotspot cells (Red) + Optimized Van Stops (Black Xs).
+The raster comes from bins.py, so draw cost follows the grid size, not the pincode count.
 """
 
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
 import json
 import os
 import sys
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from visuals import bins
+
 # CONFIG
 DATA_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
 CLUSTERS_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\outputs\route_clusters.json"
 OUTPUT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals"
+DPI = 300
 
 def generate_map():
     print("🚀 Generating Route Map (Aggregated)...")
@@ -23,27 +30,32 @@ def generate_map():
         print(f"❌ Error: processed data not found.")
         return # Soft fail
 
-    df = pd.read_csv(DATA_FILE)
+    raster = bins.grid('geo_gap', DATA_FILE)
     with open(CLUSTERS_FILE, 'r') as f:
         cluster_data = json.load(f)
         
     routes = cluster_data['routes']
+    x_edges, y_edges = raster['x_edges'], raster['y_edges']
+    pincodes, gap, critical_gap = raster['counts']
+    extent = [x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]]
     
     plt.figure(figsize=(10, 8))
     
-    # 1. Plot Background (All Pincodes)
-    # Scale bubble size
-    s = df['Enrolment_Count'] / df['Enrolment_Count'].max() * 100
+    # 1. Plot Background (every pincode cell, grey)
+    plt.imshow(np.where(pincodes > 0, 1.0, np.nan), extent=extent, origin='lower', aspect='auto',
+               cmap='Greys', vmin=0, vmax=4, alpha=0.5, interpolation='nearest')
     
-    plt.scatter(df['Longitude'], df['Latitude'], 
-                c='#90A4AE', alpha=0.3, s=s, label='Safe Zones')
-                
-    # 2. Plot Critical Zones (Red)
-    crit = df[df['Risk_Category'] == 'CRITICAL']
-    if not crit.empty:
-        s_crit = crit['Enrolment_Count'] / df['Enrolment_Count'].max() * 100
-        plt.scatter(crit['Longitude'], crit['Latitude'], 
-                    c='#D32F2F', alpha=0.7, s=s_crit, label='Critical Hotspots')
+    # 2. Gap raster (families pending per cell) + Critical Zones (Red)
+    if gap.max() > 0:
+        img = plt.imshow(np.ma.masked_equal(gap, 0), extent=extent, origin='lower', aspect='auto',
+                         cmap='YlOrRd', norm=LogNorm(vmin=1, vmax=gap.max()), interpolation='nearest')
+        plt.colorbar(img, label='Pending updates (Gap) per cell', shrink=0.7)
+    hot = critical_gap > 0
+    if hot.any():
+        # Outline of the cells holding CRITICAL pincodes (one contour over the grid, not per pincode)
+        plt.contour(bins.centers(x_edges), bins.centers(y_edges), hot.astype(float), levels=[0.5],
+                    colors='#D32F2F', linewidths=0.8)
+        plt.plot([], [], color='#D32F2F', label='Critical Hotspots')
     
     # 3. Plot Optimized Routes (X)
     rx = [r['lng'] for r in routes]
@@ -62,7 +74,9 @@ def generate_map():
     plt.grid(True, linestyle='--', alpha=0.5)
     
     out_path = os.path.join(OUTPUT_DIR, 'fig4_route_map.png')
-    plt.savefig(out_path, dpi=300, bbox_inches='tight')
+    with profiler.step("savefig", figure=os.path.basename(out_path)):
+        plt.savefig(out_path, dpi=DPI, bbox_inches='tight')
+    plt.close()
     print(f"   ✅ Saved Route Map to: {out_path}")
 
 if __name__ == "__main__":
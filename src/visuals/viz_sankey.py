@@ -8,6 +8,10 @@ import plotly.graph_objects as go
 import os
 import sys
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import profiler
+from pipeline.store import load_table
+
 # CONFIG
 INPUT_FILE = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\processed\master_table.csv"
 OUTPUT_DIR = r"C:\Users\SachinGupta\Downloads\SatatAadhar\data\visuals"
@@ -19,7 +23,7 @@ def generate_sankey():
         print(f"❌ Error: processed data not found.")
         sys.exit(1)
 
-    df = pd.read_csv(INPUT_FILE)
+    df = load_table(INPUT_FILE, columns=['Enrolment_Count', 'Update_Count'])
     
     # Calculate Totals
     total_enrol = df['Enrolment_Count'].sum()
@@ -49,7 +53,8 @@ def generate_sankey():
     fig.update_layout(title_text="Attrition Funnel: Enrolment Compliance Gap", font_size=12)
     
     out_path = os.path.join(OUTPUT_DIR, 'fig3_sankey.html')
-    fig.write_html(out_path)
+    with profiler.step("write_html", figure=os.path.basename(out_path)):
+        fig.write_html(out_path)
     print(f"   ✅ Saved Sankey Diagram to: {out_path}")
 
 if __name__ == "__main__":